@@ -0,0 +1,100 @@
+"""Batched basket edits for POST /basket/{order_id}/ops."""
+
+
+class OrderNotFound(Exception):
+    pass
+
+
+class OrderNotEditable(Exception):
+    """Only 'bucket' and 'pi' orders can change."""
+
+
+class UnknownProducts(Exception):
+    def __init__(self, product_ids):
+        super().__init__(f"Unknown product(s): {', '.join(product_ids)}")
+        self.product_ids = product_ids
+
+
+def _apply(state, ops):
+    """Apply ops in order to {product_id: quantity}; quantities <= 0 drop the line."""
+    for op in ops:
+        pid = str(op.product_id)
+        if op.op == "add":
+            state[pid] = state.get(pid, 0) + op.qty
+        elif op.op == "set_qty":
+            state[pid] = op.qty
+        else:
+            state.pop(pid, None)
+        if state.get(pid, 1) <= 0:
+            del state[pid]
+    return state
+
+
+def apply_ops(cur, order_id, ops, total_sql):
+    """Apply an ordered list of add/set_qty/remove ops to one order atomically.
+
+    Locks the order, resolves every product involved in one query, writes
+    only the lines that changed, recomputes the total once with `total_sql`
+    (ORDER_TOTAL_SQL) and returns the resulting basket. Runs in the caller's
+    transaction.
+    """
+    cur.execute("""
+        SELECT o.status, o.discount_percent, oi.product_id, oi.quantity, oi.unit_price
+        FROM orders o
+        LEFT JOIN order_items oi ON oi.order_id = o.id
+        WHERE o.id = %s
+        FOR UPDATE OF o
+    """, (order_id,))
+    rows = cur.fetchall()
+    if not rows:
+        raise OrderNotFound(order_id)
+    status, discount = rows[0]["status"], rows[0]["discount_percent"]
+    if status not in ("bucket", "pi"):
+        raise OrderNotEditable(status)
+
+    current = {str(r["product_id"]): r["quantity"] for r in rows if r["product_id"] is not None}
+    unit_prices = {str(r["product_id"]): r["unit_price"] for r in rows if r["product_id"] is not None}
+
+    product_ids = sorted(set(current) | {str(op.product_id) for op in ops})
+    cur.execute("SELECT id, item_code, selling_price FROM products WHERE id = ANY(%s::uuid[])", (product_ids,))
+    products = {str(r["id"]): r for r in cur.fetchall()}
+    missing = [pid for pid in {str(op.product_id) for op in ops} if pid not in products]
+    if missing:
+        raise UnknownProducts(sorted(missing))
+
+    state = _apply(dict(current), ops)
+    removed = [pid for pid in current if pid not in state]
+    changed = [pid for pid, qty in state.items() if current.get(pid) != qty]
+    for pid in changed:
+        unit_prices.setdefault(pid, products[pid]["selling_price"])
+
+    # Deletes, upserts and the total in one round trip
+    cur.execute("""
+        DELETE FROM order_items
+        WHERE order_id = %(order_id)s AND product_id = ANY(%(removed)s::uuid[]);
+        INSERT INTO order_items (order_id, product_id, quantity, unit_price)
+        SELECT %(order_id)s, u.product_id, u.quantity, u.unit_price
+        FROM unnest(%(pids)s::uuid[], %(qtys)s::int[], %(prices)s::numeric[])
+             AS u(product_id, quantity, unit_price)
+        ON CONFLICT (order_id, product_id) DO UPDATE SET quantity = EXCLUDED.quantity;
+    """ + total_sql, {
+        "order_id": order_id,
+        "removed": removed,
+        "pids": changed,
+        "qtys": [state[pid] for pid in changed],
+        "prices": [unit_prices[pid] for pid in changed],
+    })
+    final_total = cur.fetchone()["final_total"]
+
+    return {
+        "order_items": [
+            {"product_id": pid, "quantity": qty, "unit_price": unit_prices[pid],
+             "item_code": products[pid]["item_code"] if pid in products else None}
+            for pid, qty in state.items()
+        ],
+        "status": status,
+        "discount_percent": discount,
+        "final_total": float(final_total),
+        # {product_id: [old_qty, new_qty]}, 0 meaning not in the basket
+        "changes": {pid: [current.get(pid, 0), state.get(pid, 0)] for pid in removed + changed},
+    }
@@ -0,0 +1,92 @@
+"""Rows-per-second benchmark: executemany INSERT vs the COPY import pipeline.
+
+Needs a database with the schema applied (see data-create.sql and
+migrations/). Each path imports into its own throwaway shop inside a
+transaction that is rolled back, so the database is left unchanged:
+
+    BENCH_DSN=postgresql://postgres@localhost/invt python bench/bulk_import.py --rows 50000
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import psycopg2
+from psycopg2.extras import RealDictCursor
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from bulk_import import CHUNK_ROWS, ProductImporter  # noqa: E402
+
+
+def make_rows(n, shop_id, category_id):
+    return [{
+        "shop_id": shop_id, "category_id": category_id, "item_code": f"SKU-{i:07d}",
+        "image_url": "", "cost_price": 100 + i % 900, "overhead": 5, "unit_price": 150 + i % 900,
+        "vendor_name": f"Vendor {i % 40}", "display_qty": i % 3, "godown_qty": i % 25,
+    } for i in range(n)]
+
+
+def setup_shop(cur):
+    cur.execute("INSERT INTO shops (name) VALUES ('bench import') RETURNING id")
+    shop_id = str(cur.fetchone()["id"])
+    cur.execute("INSERT INTO categories (shop_id, name) VALUES (%s, 'bench') RETURNING id", (shop_id,))
+    return shop_id, str(cur.fetchone()["id"])
+
+
+def run_executemany(conn, n):
+    with conn.cursor() as cur:
+        shop_id, category_id = setup_shop(cur)
+        rows = make_rows(n, shop_id, category_id)
+        t0 = time.perf_counter()
+        cur.executemany("""
+            INSERT INTO products (
+                shop_id, category_id, item_code, photo_url,
+                cost_price, overhead_expense, selling_price,
+                vendor_name, qty_display, qty_godown, created_at
+            ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, NOW())
+        """, [(r["shop_id"], r["category_id"], r["item_code"], r["image_url"], r["cost_price"],
+               r["overhead"], r["unit_price"], r["vendor_name"], r["display_qty"], r["godown_qty"])
+              for r in rows])
+        elapsed = time.perf_counter() - t0
+    conn.rollback()
+    return elapsed
+
+
+def run_copy(conn, n):
+    with conn.cursor() as cur:
+        shop_id, category_id = setup_shop(cur)
+        rows = make_rows(n, shop_id, category_id)
+        t0 = time.perf_counter()
+        importer = ProductImporter(cur, shop_id)
+        for start in range(0, n, CHUNK_ROWS):
+            importer.load(enumerate(rows[start:start + CHUNK_ROWS], start + 1))
+        report = importer.finish()
+        elapsed = time.perf_counter() - t0
+    conn.rollback()
+    assert report["inserted"] == n, report
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--dsn", default=os.getenv("BENCH_DSN"))
+    args = parser.parse_args()
+    if not args.dsn:
+        parser.error("pass --dsn or set BENCH_DSN")
+
+    conn = psycopg2.connect(args.dsn, cursor_factory=RealDictCursor)
+    try:
+        result = {"rows": args.rows}
+        for name, fn in (("executemany", run_executemany), ("copy_pipeline", run_copy)):
+            elapsed = fn(conn, args.rows)
+            result[name] = {"seconds": round(elapsed, 3), "rows_per_second": round(args.rows / elapsed)}
+        result["speedup"] = round(result["executemany"]["seconds"] / result["copy_pipeline"]["seconds"], 1)
+        print(json.dumps(result, indent=2))
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,412 @@
+"""Reproducible load test for the backend against a local Postgres.
+
+    # 1. fresh schema: data-create.sql + migrations/ (drops the public schema!)
+    python bench/harness.py --dsn postgresql://postgres@localhost/invt_bench setup --reset
+    # 2. synthetic data
+    python bench/harness.py --dsn ... seed --shops 5 --products 200000 --clients 5000 --orders 50000
+    # 3. scenarios; results go to a JSON file for comparing runs
+    python bench/harness.py --dsn ... run --concurrency 16 --iterations 200 --out results/after.json
+
+By default `run` drives the app in-process over ASGI; pass --base-url to hit
+a running server instead. Query counts come from the Server-Timing header.
+
+Scenarios: search, inventory browse, basket build-up, PI conversion and
+concurrent finalize of baskets that all contain the same few hot SKUs.
+Each endpoint is reported with p50/p95/p99 latency, throughput, error count
+and queries per request.
+"""
+import argparse
+import asyncio
+import datetime
+import glob
+import json
+import os
+import platform
+import random
+import re
+import sys
+import threading
+import time
+import urllib.parse
+from collections import defaultdict
+
+import httpx
+import psycopg2
+from psycopg2.extras import RealDictCursor, execute_values
+
+from concurrency import percentile
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+# Supabase provides these; a plain Postgres needs them before data-create.sql
+PRELUDE_SQL = """
+    CREATE EXTENSION IF NOT EXISTS "uuid-ossp";
+    CREATE SCHEMA IF NOT EXISTS auth;
+    CREATE TABLE IF NOT EXISTS auth.users (id UUID PRIMARY KEY DEFAULT uuid_generate_v4());
+"""
+SAMPLE_DATA_MARKER = "---DELETE LATER"
+
+WORDS = ["light", "lamp", "crystal", "brass", "modern", "royal", "star", "glow", "nova", "aura",
+         "classic", "decor", "home", "lumen", "shine", "galaxy", "pearl", "ember", "zen", "urban"]
+CATEGORY_NAMES = ["chandelier", "wall light", "hanging", "big hanging", "stick to ceiling",
+                  "mirror light", "outdoor", "fan", "lamp", "bulb"]
+
+
+# -- schema --------------------------------------------------------------------
+
+def split_sql(text):
+    """Split a SQL script into statements, respecting quotes, $$ bodies and comments."""
+    statements, buf = [], []
+    i, n = 0, len(text)
+    quote = None
+    while i < n:
+        ch = text[i]
+        if quote:
+            if text.startswith(quote, i):
+                buf.append(quote)
+                i += len(quote)
+                quote = None
+                continue
+            buf.append(ch)
+        elif text.startswith("--", i):
+            end = text.find("\n", i)
+            i = n if end < 0 else end
+            continue
+        elif text.startswith("$$", i):
+            quote = "$$"
+            buf.append("$$")
+            i += 2
+            continue
+        elif ch in ("'", '"'):
+            quote = ch
+            buf.append(ch)
+        elif ch == ";":
+            stmt = "".join(buf).strip()
+            if stmt:
+                statements.append(stmt)
+            buf = []
+        else:
+            buf.append(ch)
+        i += 1
+    stmt = "".join(buf).strip()
+    if stmt:
+        statements.append(stmt)
+    return statements
+
+
+def apply_sql(conn, text):
+    # Statement by statement in autocommit, so CREATE INDEX CONCURRENTLY works
+    with conn.cursor() as cur:
+        for stmt in split_sql(text):
+            cur.execute(stmt)
+
+
+def setup(conn, reset):
+    conn.autocommit = True
+    with conn.cursor() as cur:
+        if reset:
+            cur.execute("DROP SCHEMA IF EXISTS public CASCADE; CREATE SCHEMA public;")
+            cur.execute("DROP SCHEMA IF EXISTS auth CASCADE;")
+    apply_sql(conn, PRELUDE_SQL)
+    with open(os.path.join(BACKEND_DIR, "data-create.sql")) as f:
+        schema = f.read().split(SAMPLE_DATA_MARKER)[0]
+    apply_sql(conn, schema)
+    for path in sorted(glob.glob(os.path.join(BACKEND_DIR, "migrations", "*.sql"))):
+        print(f"applying {os.path.basename(path)}")
+        with open(path) as f:
+            apply_sql(conn, f.read())
+
+
+# -- synthetic data ------------------------------------------------------------
+
+def seed(conn, shops, products, clients, orders, rng):
+    conn.autocommit = False
+    with conn.cursor() as cur:
+        names = [f"{rng.choice(WORDS).title()} {rng.choice(WORDS).title()} {i}" for i in range(shops)]
+        shop_ids = [r["id"] for r in execute_values(
+            cur, "INSERT INTO shops (name) VALUES %s RETURNING id", [(n,) for n in names], fetch=True)]
+        execute_values(cur, "INSERT INTO categories (shop_id, name) VALUES %s",
+                       [(s, c) for s in shop_ids for c in CATEGORY_NAMES])
+
+        per_shop = max(1, products // shops)
+        for shop_id in shop_ids:
+            # Generated server side: fast even for hundreds of thousands of rows
+            cur.execute("""
+                INSERT INTO products (shop_id, category_id, item_code, cost_price, overhead_expense,
+                                      selling_price, vendor_name, qty_display, qty_godown, created_at)
+                SELECT %(shop)s, cats.ids[1 + (g %% array_length(cats.ids, 1))],
+                       'SKU-' || lpad(g::text, 7, '0'),
+                       100 + (g * 37) %% 9000, (g * 7) %% 50,
+                       150 + (g * 37) %% 9000 * 1.3,
+                       'Vendor ' || (g %% 150), g %% 4, (g * 13) %% 40,
+                       NOW() - (g || ' minutes')::interval
+                FROM generate_series(1, %(n)s) g,
+                     (SELECT array_agg(id) AS ids FROM categories WHERE shop_id = %(shop)s) cats
+            """, {"shop": shop_id, "n": per_shop})
+            cur.execute("""
+                INSERT INTO clients (shop_id, name, phone)
+                SELECT %(shop)s, 'Client ' || g, '98' || lpad(g::text, 8, '0')
+                FROM generate_series(1, %(n)s) g
+            """, {"shop": shop_id, "n": max(1, clients // shops)})
+            # Historical orders: mostly sold, some open; 1-6 lines each
+            cur.execute("""
+                WITH c AS (SELECT array_agg(id) AS ids FROM clients WHERE shop_id = %(shop)s),
+                ins AS (
+                    INSERT INTO orders (shop_id, client_id, status, discount_percent, created_at, sold_at)
+                    SELECT %(shop)s, c.ids[1 + (g %% array_length(c.ids, 1))],
+                           (ARRAY['sold','sold','sold','sold','pi','bucket','cancelled'])[1 + g %% 7],
+                           (g %% 4) * 2.5,
+                           NOW() - ((g %% 365) || ' days')::interval,
+                           CASE WHEN g %% 7 < 4 THEN NOW() - ((g %% 365) || ' days')::interval END
+                    FROM generate_series(1, %(n)s) g, c
+                    RETURNING id
+                ),
+                numbered AS (SELECT id, row_number() OVER () AS rn FROM ins),
+                p AS (SELECT array_agg(id) AS ids, count(*) AS cnt FROM products WHERE shop_id = %(shop)s)
+                INSERT INTO order_items (order_id, product_id, quantity, unit_price)
+                SELECT DISTINCT ON (o.id, pid) o.id, pid, 1 + (o.rn + k) %% 3, 250
+                FROM numbered o, p, generate_series(1, 1 + (o.rn %% 6)::int) k,
+                     LATERAL (SELECT p.ids[1 + ((o.rn * 31 + k * 17) %% p.cnt)] AS pid) x
+            """, {"shop": shop_id, "n": max(1, orders // shops)})
+            cur.execute("""
+                UPDATE orders o SET final_total = ROUND(s.subtotal * (1 - o.discount_percent / 100), 2)
+                FROM (SELECT order_id, SUM(total_price) AS subtotal FROM order_items GROUP BY order_id) s
+                WHERE o.id = s.order_id AND o.shop_id = %s
+            """, (shop_id,))
+            conn.commit()
+            print(f"seeded shop {shop_id}")
+    conn.autocommit = True
+    with conn.cursor() as cur:
+        cur.execute("ANALYZE")
+
+
+# -- query counts ------------------------------------------------------------------
+
+# instrumentation.py reports them in every response's Server-Timing header
+SERVER_TIMING_QUERIES = re.compile(r'db;[^,]*desc="(\d+) queries')
+
+
+def queries_from(resp):
+    match = SERVER_TIMING_QUERIES.search(resp.headers.get("server-timing", "")) if resp is not None else None
+    return int(match.group(1)) if match else None
+
+
+def in_process_client(dsn):
+    """httpx client bound to main.app over ASGI, configured for `dsn`."""
+    parts = urllib.parse.urlparse(dsn)
+    os.environ.update({
+        "DB_USER": urllib.parse.unquote(parts.username or "postgres"),
+        "DB_PASS": urllib.parse.unquote(parts.password or ""),
+        "DB_HOST": parts.hostname or "localhost",
+        "DB_PORT": str(parts.port or 5432),
+        "DB_NAME": parts.path.lstrip("/"),
+        "DB_SSLMODE": "disable",
+        "FRONTEND_URL": "http://localhost",
+    })
+    sys.path.insert(0, BACKEND_DIR)
+    import main
+
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://bench", timeout=120)
+
+
+# -- scenarios -------------------------------------------------------------------
+
+class Recorder:
+    def __init__(self):
+        self.samples = defaultdict(list)     # endpoint -> [(ms, queries or None, ok)]
+        self._lock = threading.Lock()
+
+    async def call(self, client, endpoint, method, url, **kwargs):
+        t0 = time.perf_counter()
+        try:
+            resp = await client.request(method, url, **kwargs)
+            ok = resp.status_code < 400
+        except httpx.HTTPError:
+            resp, ok = None, False
+        ms = (time.perf_counter() - t0) * 1000
+        with self._lock:
+            self.samples[endpoint].append((ms, queries_from(resp), ok))
+        return resp
+
+    def report(self, elapsed):
+        out = {}
+        for endpoint, samples in sorted(self.samples.items()):
+            lat = [s[0] for s in samples]
+            counted = [s[1] for s in samples if s[1] is not None]
+            out[endpoint] = {
+                "requests": len(samples),
+                "errors": sum(1 for s in samples if not s[2]),
+                "throughput_rps": round(len(samples) / elapsed, 1) if elapsed else None,
+                "latency_ms": {p: round(percentile(lat, int(p[1:])), 2) for p in ("p50", "p95", "p99")},
+                "queries_per_request": round(sum(counted) / len(counted), 2) if counted else None,
+            }
+        return out
+
+
+async def load_fixtures(client, rec, rng):
+    resp = await rec.call(client, "GET /search", "GET", "/search", params={"name": rng.choice(WORDS)})
+    shops = resp.json()["results"] if resp is not None and resp.status_code == 200 else []
+    if not shops:
+        raise SystemExit("no shops found - run `seed` first")
+    shop_id = shops[0]["id"]
+    resp = await client.get(f"/inventory/{shop_id}", params={"limit": 1000, "fields": "id,item_code"})
+    products = resp.json()
+    return shop_id, products
+
+
+async def scenario_search(client, rec, rng, shop_id, products):
+    await rec.call(client, "GET /search", "GET", "/search", params={"name": rng.choice(WORDS)[:4]})
+    term = rng.choice(products)["item_code"][-5:]
+    await rec.call(client, "GET /search/products/{shop_id}", "GET", f"/search/products/{shop_id}", params={"q": term})
+
+
+async def scenario_browse(client, rec, rng, shop_id, products):
+    resp = await rec.call(client, "GET /inventory/{shop_id}", "GET", f"/inventory/{shop_id}", params={"limit": 100})
+    for _ in range(2):
+        cursor = resp.headers.get("X-Next-Cursor") if resp is not None else None
+        if not cursor:
+            break
+        resp = await rec.call(client, "GET /inventory/{shop_id}", "GET", f"/inventory/{shop_id}",
+                              params={"limit": 100, "cursor": cursor})
+    await rec.call(client, "GET /orders/list/{shop_id}", "GET", f"/orders/list/{shop_id}")
+
+
+async def build_basket(client, rec, rng, shop_id, items):
+    resp = await rec.call(client, "POST /basket/create", "POST", "/basket/create",
+                          json={"shop_id": shop_id, "client_name": f"bench {rng.randint(1, 10 ** 6)}"})
+    if resp is None or resp.status_code != 200:
+        return None
+    order_id = resp.json()["order_id"]
+    for p in items:
+        await rec.call(client, "POST /basket/add", "POST", "/basket/add",
+                       json={"order_id": order_id, "product_id": p["id"], "qty": 1})
+    await rec.call(client, "GET /basket/details/{order_id}", "GET", f"/basket/details/{order_id}")
+    return order_id
+
+
+async def scenario_basket(client, rec, rng, shop_id, products):
+    await build_basket(client, rec, rng, shop_id, rng.sample(products, min(8, len(products))))
+
+
+async def scenario_pi(client, rec, rng, shop_id, products):
+    order_id = await build_basket(client, rec, rng, shop_id, rng.sample(products, min(5, len(products))))
+    if order_id:
+        await rec.call(client, "POST /order/convert-to-pi", "POST", "/order/convert-to-pi",
+                       json={"order_id": order_id, "discount_percent": 5})
+
+
+SCENARIOS = {
+    "search": scenario_search,
+    "browse": scenario_browse,
+    "basket": scenario_basket,
+    "pi": scenario_pi,
+}
+
+
+async def scenario_hot_finalize(client, rec, rng, shop_id, products, baskets, concurrency):
+    """Many baskets holding the same 3 SKUs, finalized at once."""
+    hot = products[:3]
+    order_ids = []
+    for _ in range(baskets):
+        order_id = await build_basket(client, Recorder(), rng, shop_id, hot)
+        if order_id:
+            order_ids.append(order_id)
+    sem = asyncio.Semaphore(concurrency)
+
+    async def finalize(order_id):
+        async with sem:
+            await rec.call(client, "POST /order/finalize-sale", "POST", "/order/finalize-sale",
+                           params={"order_id": order_id})
+
+    await asyncio.gather(*(finalize(o) for o in order_ids))
+
+
+async def run(client, scenarios, concurrency, iterations, hot_baskets, seed_value):
+    rng = random.Random(seed_value)
+    async with client:
+        shop_id, products = await load_fixtures(client, Recorder(), rng)
+        results = {}
+        for name in scenarios:
+            rec = Recorder()
+            started = time.perf_counter()
+            if name == "hot_finalize":
+                await scenario_hot_finalize(client, rec, rng, shop_id, products, hot_baskets, concurrency)
+            else:
+                todo = iter(range(iterations))
+
+                async def worker():
+                    for _ in todo:
+                        await SCENARIOS[name](client, rec, rng, shop_id, products)
+
+                await asyncio.gather(*(worker() for _ in range(concurrency)))
+            elapsed = time.perf_counter() - started
+            results[name] = {"seconds": round(elapsed, 3), "endpoints": rec.report(elapsed)}
+            print(f"{name}: {elapsed:.1f}s")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dsn", default=os.getenv("BENCH_DSN"), required=os.getenv("BENCH_DSN") is None)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("setup", help="apply data-create.sql and migrations/")
+    p.add_argument("--reset", action="store_true", help="drop and recreate the public schema first")
+
+    p = sub.add_parser("seed", help="generate a synthetic dataset")
+    p.add_argument("--shops", type=int, default=3)
+    p.add_argument("--products", type=int, default=60000)
+    p.add_argument("--clients", type=int, default=3000)
+    p.add_argument("--orders", type=int, default=30000)
+    p.add_argument("--seed", type=int, default=42)
+
+    p = sub.add_parser("run", help="drive the scenarios and write a JSON report")
+    p.add_argument("--base-url", help="hit a running server instead of the in-process app")
+    p.add_argument("--scenarios", default="search,browse,basket,pi,hot_finalize")
+    p.add_argument("--concurrency", type=int, default=16)
+    p.add_argument("--iterations", type=int, default=200, help="scenario runs per scenario")
+    p.add_argument("--hot-baskets", type=int, default=50)
+    p.add_argument("--seed", type=int, default=42)
+    p.add_argument("--label", default="run")
+    p.add_argument("--out", default="bench-results.json")
+    args = parser.parse_args()
+
+    if args.command in ("setup", "seed"):
+        conn = psycopg2.connect(args.dsn, cursor_factory=RealDictCursor)
+        try:
+            if args.command == "setup":
+                setup(conn, args.reset)
+            else:
+                seed(conn, args.shops, args.products, args.clients, args.orders, random.Random(args.seed))
+        finally:
+            conn.close()
+        return
+
+    scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    unknown = [s for s in scenarios if s not in SCENARIOS and s != "hot_finalize"]
+    if unknown:
+        parser.error(f"unknown scenario(s): {', '.join(unknown)}")
+    if args.base_url:
+        client = httpx.AsyncClient(base_url=args.base_url, timeout=120)
+    else:
+        client = in_process_client(args.dsn)
+
+    results = asyncio.run(run(client, scenarios, args.concurrency, args.iterations,
+                              args.hot_baskets, args.seed))
+    report = {
+        "label": args.label,
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "mode": "http" if args.base_url else "in-process",
+        "concurrency": args.concurrency,
+        "iterations": args.iterations,
+        "scenarios": results,
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"wrote {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Rows-per-second benchmark: list-response serialization before and after rowjson.
+
+No database needed. Synthetic /inventory/{shop_id} pages are encoded the
+old way (RealDictCursor-style dicts of Decimal/UUID/datetime through
+FastAPI's jsonable_encoder and json.dumps, as JSONResponse does) and the new
+way (tuple rows with SQL-cast numbers, zipped onto the column list and
+encoded by rowjson.dumps):
+
+    python bench/serialization.py --rows 20000 --repeat 5
+"""
+import argparse
+import datetime
+import decimal
+import json
+import os
+import sys
+import time
+import uuid
+
+from fastapi.encoders import jsonable_encoder
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+import rowjson  # noqa: E402
+from inventory import DEFAULT_FIELDS  # noqa: E402
+
+
+def make_rows(n):
+    """(dict rows as RealDictCursor returns them, tuple rows as the fast path gets them)."""
+    now = datetime.datetime.now(datetime.timezone.utc)
+    dict_rows, tuple_rows = [], []
+    for i in range(n):
+        row = {
+            "id": uuid.uuid4(), "item_code": f"SKU-{i:07d}",
+            "selling_price": decimal.Decimal(150 + i % 9000) + decimal.Decimal("0.50"),
+            "vendor_name": f"Vendor {i % 150}", "photo_url": f"https://cdn.example.com/p/{i}.jpg",
+            "qty_display": i % 4, "qty_godown": i % 40, "category_name": "chandelier",
+            "created_at": now - datetime.timedelta(minutes=i),
+        }
+        dict_rows.append(row)
+        # psycopg2 returns uuid as str and a ::float8 cast as float
+        tuple_rows.append(tuple(
+            str(row[f]) if f == "id" else float(row[f]) if f == "selling_price" else row[f]
+            for f in DEFAULT_FIELDS
+        ))
+    return dict_rows, tuple_rows
+
+
+def before(dict_rows):
+    return json.dumps(jsonable_encoder(dict_rows), ensure_ascii=False, allow_nan=False,
+                      indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def after(tuple_rows):
+    columns = DEFAULT_FIELDS
+    return rowjson.dumps([dict(zip(columns, row)) for row in tuple_rows])
+
+
+def best_of(fn, arg, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        body = fn(arg)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, len(body)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    dict_rows, tuple_rows = make_rows(args.rows)
+    report = {"rows": args.rows, "encoder": "orjson" if rowjson.orjson else "json"}
+    for name, fn, rows in (("before", before, dict_rows), ("after", after, tuple_rows)):
+        seconds, size = best_of(fn, rows, args.repeat)
+        report[name] = {"seconds": round(seconds, 4), "rows_per_sec": round(args.rows / seconds), "bytes": size}
+    report["speedup"] = round(report["before"]["seconds"] / report["after"]["seconds"], 1)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
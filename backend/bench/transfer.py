@@ -0,0 +1,171 @@
+"""Bytes on the wire and modelled time-to-interactive for the frontend and API.
+
+Fetches the page, every local asset it references and the first API pages
+the app loads, once per Accept-Encoding (identity, gzip, br), and counts the
+raw (still compressed) response bytes. A repeat visit is measured too:
+index.html revalidated with If-None-Match, hashed assets served from cache.
+
+    # in-process against a local database (see harness.py for setup/seed)
+    python bench/transfer.py --dsn postgresql://postgres@localhost/invt_bench --shop-id <uuid>
+    # or against a running server
+    python bench/transfer.py --base-url http://127.0.0.1:8000 --shop-id <uuid> --out results/transfer.json
+
+Time-to-interactive is modelled, not measured in a browser, for throttled
+links like the DevTools presets: connection setup (TCP + TLS), then the
+page, then app.js, then the first inventory page, each one round trip plus
+its bytes over the link's bandwidth. Third-party scripts (CDN) are left out:
+they cost the same before and after.
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import re
+import sys
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(__file__))
+from harness import in_process_client  # noqa: E402
+
+ENCODINGS = ("identity", "gzip", "br")
+
+# name -> (download kbit/s, round trip ms)
+LINKS = {
+    "slow-3g": (400, 400),
+    "fast-3g": (1600, 150),
+    "4g": (9000, 60),
+}
+
+LOCAL_REF_RE = re.compile(r'\b(?:src|href)="([^"#:]+)"')
+
+
+async def fetch(client, path, encoding, headers=None):
+    """(status, raw bytes received, response headers) for one request."""
+    request_headers = {"Accept-Encoding": encoding}
+    request_headers.update(headers or {})
+    async with client.stream("GET", path, headers=request_headers) as response:
+        raw = 0
+        async for chunk in response.aiter_raw():
+            raw += len(chunk)
+        return response.status_code, raw, response.headers
+
+
+async def page_assets(client):
+    """Local assets referenced by the page (hashed names when served by the backend)."""
+    response = await client.get("/", headers={"Accept-Encoding": "identity"})
+    response.raise_for_status()
+    refs = [r for r in LOCAL_REF_RE.findall(response.text) if not r.startswith("//")]
+    return ["/" + r.split("?")[0].lstrip("/") for r in refs if r.split("?")[0].endswith((".js", ".css"))]
+
+
+async def measure(client, shop_id):
+    assets = await page_assets(client)
+    api = []
+    if shop_id:
+        api = [f"/inventory/{shop_id}?limit=200", f"/orders/list/{shop_id}?limit=50"]
+
+    results = {}
+    for encoding in ENCODINGS:
+        rows = {}
+        for path in ["/"] + assets + api:
+            status, raw, headers = await fetch(client, path, encoding)
+            rows[path] = {
+                "status": status,
+                "bytes": raw,
+                "content_encoding": headers.get("content-encoding", "identity"),
+                "cache_control": headers.get("cache-control"),
+                "etag": headers.get("etag"),
+            }
+        # Repeat visit: revalidate the page; immutable assets come from cache
+        page = rows["/"]
+        repeat = {}
+        if page["etag"]:
+            status, raw, _ = await fetch(client, "/", encoding, {"If-None-Match": page["etag"]})
+            repeat["/"] = {"status": status, "bytes": raw}
+        for path in assets:
+            cached = "immutable" in (rows[path]["cache_control"] or "")
+            repeat[path] = {"status": "cache" if cached else rows[path]["status"],
+                            "bytes": 0 if cached else rows[path]["bytes"]}
+        results[encoding] = {"first_visit": rows, "repeat_visit": repeat}
+    return assets, api, results
+
+
+def model_tti(first, repeat, assets, api):
+    """Seconds to interactive per link: setup + page -> scripts -> first API page."""
+    out = {}
+    for link, (kbps, rtt_ms) in LINKS.items():
+        rtt = rtt_ms / 1000
+        bytes_per_s = kbps * 1000 / 8
+
+        def fetch_time(nbytes):
+            return rtt + nbytes / bytes_per_s
+
+        def visit(rows):
+            t = 2 * rtt                                    # TCP + TLS
+            t += fetch_time(rows["/"]["bytes"])
+            # the page's own scripts load in parallel: the largest decides
+            t += max((fetch_time(rows[a]["bytes"]) for a in assets if rows[a]["bytes"]), default=0)
+            if api:
+                t += fetch_time(first[api[0]]["bytes"])
+            return round(t, 3)
+
+        out[link] = {"first_visit": visit(first), "repeat_visit": visit({**first, **repeat})}
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Transfer size and modelled TTI for the frontend/API")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--base-url", help="running server, e.g. http://127.0.0.1:8000")
+    target.add_argument("--dsn", help="run the app in-process against this database")
+    parser.add_argument("--shop-id", help="shop whose inventory/orders pages are measured")
+    parser.add_argument("--out", help="write the report here as JSON (default: stdout)")
+    args = parser.parse_args()
+
+    if args.base_url:
+        client = httpx.AsyncClient(base_url=args.base_url, timeout=120)
+    else:
+        client = in_process_client(args.dsn)
+        # ASGITransport runs no startup hooks
+        import main as app_main
+        app_main.frontend.load()
+
+    async def run():
+        async with client:
+            return await measure(client, args.shop_id)
+
+    assets, api, results = asyncio.run(run())
+    report = {
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "mode": "http" if args.base_url else "in-process",
+        "assets": assets,
+        "api": api,
+        "encodings": {},
+    }
+    for encoding, r in results.items():
+        first, repeat = r["first_visit"], r["repeat_visit"]
+        report["encodings"][encoding] = {
+            "first_visit_bytes": sum(row["bytes"] for row in first.values()),
+            "repeat_visit_bytes": sum(row["bytes"] for row in repeat.values()),
+            "tti_seconds": model_tti(first, repeat, assets, api),
+            "first_visit": first,
+            "repeat_visit": repeat,
+        }
+
+    text = json.dumps(report, indent=2)
+    if args.out:
+        os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+        with open(args.out, "w") as f:
+            f.write(text)
+        print(f"wrote {args.out}")
+    else:
+        print(text)
+    for encoding, r in report["encodings"].items():
+        print(f"{encoding:>8}: first visit {r['first_visit_bytes']:>8} B, repeat {r['repeat_visit_bytes']:>8} B, "
+              f"slow-3g TTI {r['tti_seconds']['slow-3g']['first_visit']}s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,395 @@
+"""High-throughput catalog import: validate in chunks, COPY into a staging
+table, then upsert into products with one statement.
+
+Uploads are first spooled (memory, then a temp file) by stage_upload(), so
+the database connection and its transaction are only taken once the client
+has sent everything.
+
+Rows that fail validation, repeat an item_code within the upload, point at an
+unknown category or (with on_conflict="skip") already exist are rejected
+individually and reported back instead of aborting the whole import.
+"""
+import asyncio
+import codecs
+import csv
+import decimal
+import io
+import json
+import re
+import tempfile
+import uuid
+
+from ledger import DISPLAY_SQL, GODOWN_SQL, PENDING_JOIN
+
+CHUNK_ROWS = 5000
+MAX_REPORTED_REJECTIONS = 1000
+# Longest single record accepted from an upload; anything longer is most
+# likely an unterminated quote that would otherwise buffer the whole file
+MAX_RECORD_CHARS = 1 << 20
+# Uploads are spooled in memory up to this size, then to a temp file
+SPOOL_MEMORY_BYTES = 8 << 20
+READ_BYTES = 1 << 16
+
+# Staging/products column -> accepted input names (BulkProductAdd names first)
+COLUMNS = {
+    "shop_id": ("shop_id",),
+    "item_code": ("item_code",),
+    "category_id": ("category_id",),
+    "vendor_name": ("vendor_name",),
+    "photo_url": ("image_url", "photo_url"),
+    "cost_price": ("cost_price",),
+    "overhead_expense": ("overhead", "overhead_expense"),
+    "selling_price": ("unit_price", "selling_price"),
+    "qty_display": ("display_qty", "qty_display"),
+    "qty_godown": ("godown_qty", "qty_godown"),
+    "remark": ("remark",),
+}
+MONEY_COLUMNS = ("cost_price", "overhead_expense", "selling_price")
+QTY_COLUMNS = ("qty_display", "qty_godown")
+UUID_COLUMNS = ("shop_id", "category_id")
+
+STAGING_DDL = """
+    CREATE TEMP TABLE product_import (
+        row_no INT NOT NULL,
+        shop_id UUID NOT NULL,
+        item_code TEXT NOT NULL,
+        category_id UUID,
+        vendor_name TEXT,
+        photo_url TEXT,
+        cost_price NUMERIC(12, 2),
+        overhead_expense NUMERIC(12, 2),
+        selling_price NUMERIC(12, 2),
+        qty_display INT,
+        qty_godown INT,
+        remark TEXT
+    ) ON COMMIT DROP
+"""
+STAGING_COLUMNS = ["row_no"] + list(COLUMNS)
+DATA_COLUMNS = list(COLUMNS)
+
+_QUOTE_OR_NEWLINE = re.compile(r'["\n]')
+
+
+class ImportFormatError(ValueError):
+    """The upload could not be parsed at all (as opposed to a bad row)."""
+
+
+class UploadLimitError(ValueError):
+    """The upload was too large (413) or too slow (408) to be staged."""
+
+    def __init__(self, message, status_code):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def _pick(raw, names):
+    for name in names:
+        value = raw.get(name)
+        if value is not None and value != "":
+            return value
+    return None
+
+
+def validate_row(raw, shop_id=None):
+    """Return (clean_dict, None) or (None, error message) for one input row."""
+    if not isinstance(raw, dict):
+        return None, "row is not an object"
+    row = {col: _pick(raw, names) for col, names in COLUMNS.items()}
+    if shop_id is not None:
+        row["shop_id"] = shop_id
+    for col in UUID_COLUMNS:
+        if row[col] is not None:
+            try:
+                row[col] = str(uuid.UUID(str(row[col])))
+            except ValueError:
+                return None, f"{col} is not a valid id"
+    if row["shop_id"] is None:
+        return None, "shop_id is required"
+    if row["item_code"] is None or not str(row["item_code"]).strip():
+        return None, "item_code is required"
+    row["item_code"] = str(row["item_code"]).strip()
+    for col in MONEY_COLUMNS:
+        try:
+            value = decimal.Decimal(str(row[col]).strip()) if row[col] is not None else decimal.Decimal(0)
+        except decimal.InvalidOperation:
+            return None, f"{col} is not a number"
+        if not value.is_finite() or value < 0 or value >= 10 ** 10:
+            return None, f"{col} out of range"
+        row[col] = value.quantize(decimal.Decimal("0.01"))
+    for col in QTY_COLUMNS:
+        try:
+            value = int(str(row[col]).strip()) if row[col] is not None else 0
+        except ValueError:
+            return None, f"{col} is not a whole number"
+        if not -2 ** 31 <= value < 2 ** 31:
+            return None, f"{col} out of range"
+        row[col] = value
+    return row, None
+
+
+class ProductImporter:
+    """Stages validated rows with COPY and merges them into products.
+
+    Works on a cursor inside the caller's transaction: call load() for each
+    chunk of (row_no, raw_dict) pairs, then finish(), then commit.
+    """
+
+    def __init__(self, cur, shop_id=None, on_conflict="update"):
+        if on_conflict not in ("update", "skip"):
+            raise ValueError("on_conflict must be 'update' or 'skip'")
+        self.cur = cur
+        self.shop_id = shop_id
+        self.on_conflict = on_conflict
+        self.received = 0
+        self.rejected_count = 0
+        self.rejected = []
+        cur.execute(STAGING_DDL)
+
+    def _reject(self, row_no, item_code, reason):
+        self.rejected_count += 1
+        if len(self.rejected) < MAX_REPORTED_REJECTIONS:
+            self.rejected.append({"row": row_no, "item_code": item_code, "reason": reason})
+
+    def load(self, rows):
+        buf = io.StringIO()
+        writer = csv.writer(buf)
+        staged = 0
+        for row_no, raw in rows:
+            self.received += 1
+            row, error = validate_row(raw, self.shop_id)
+            if error:
+                self._reject(row_no, raw.get("item_code") if isinstance(raw, dict) else None, error)
+                continue
+            # csv writes None as an empty unquoted field, which COPY reads as NULL
+            writer.writerow([row_no] + [row[c] for c in DATA_COLUMNS])
+            staged += 1
+        if staged:
+            buf.seek(0)
+            self.cur.copy_expert(
+                f"COPY product_import ({', '.join(STAGING_COLUMNS)}) FROM STDIN WITH (FORMAT csv)", buf)
+
+    def finish(self):
+        cur = self.cur
+        # Last occurrence of an item_code in the upload wins
+        cur.execute("""
+            DELETE FROM product_import s
+            USING product_import t
+            WHERE s.shop_id = t.shop_id AND s.item_code = t.item_code AND s.row_no < t.row_no
+            RETURNING s.row_no, s.item_code
+        """)
+        for r in cur.fetchall():
+            self._reject(r["row_no"], r["item_code"], "duplicate item_code later in upload")
+
+        cur.execute("""
+            DELETE FROM product_import s
+            WHERE s.category_id IS NOT NULL
+              AND NOT EXISTS (SELECT 1 FROM categories c WHERE c.id = s.category_id)
+            RETURNING s.row_no, s.item_code
+        """)
+        for r in cur.fetchall():
+            self._reject(r["row_no"], r["item_code"], "unknown category_id")
+
+        if self.on_conflict == "skip":
+            cur.execute("""
+                DELETE FROM product_import s
+                USING products p
+                WHERE p.shop_id = s.shop_id AND p.item_code = s.item_code
+                RETURNING s.row_no, s.item_code
+            """)
+            for r in cur.fetchall():
+                self._reject(r["row_no"], r["item_code"], "item_code already exists")
+            conflict = "DO NOTHING"
+        else:
+            # Stock of existing products is set through the ledger: lock them,
+            # then record the difference to the uploaded counts as an adjustment
+            cur.execute(f"""
+                SELECT pg_advisory_xact_lock(hashtextextended(l.id::text, 0))
+                FROM (
+                    SELECT DISTINCT p.id FROM product_import s
+                    JOIN products p ON p.shop_id = s.shop_id AND p.item_code = s.item_code
+                    ORDER BY 1
+                ) l;
+                INSERT INTO stock_movements (shop_id, product_id, kind, delta_display, delta_godown, note)
+                SELECT p.shop_id, p.id, 'adjust',
+                       COALESCE(s.qty_display, 0) - {DISPLAY_SQL},
+                       COALESCE(s.qty_godown, 0) - {GODOWN_SQL},
+                       'import'
+                FROM product_import s
+                JOIN products p ON p.shop_id = s.shop_id AND p.item_code = s.item_code
+                {PENDING_JOIN}
+                WHERE COALESCE(s.qty_display, 0) <> {DISPLAY_SQL}
+                   OR COALESCE(s.qty_godown, 0) <> {GODOWN_SQL}
+            """)
+            conflict = """DO UPDATE SET
+                category_id = EXCLUDED.category_id,
+                vendor_name = EXCLUDED.vendor_name,
+                photo_url = EXCLUDED.photo_url,
+                cost_price = EXCLUDED.cost_price,
+                overhead_expense = EXCLUDED.overhead_expense,
+                selling_price = EXCLUDED.selling_price,
+                remark = COALESCE(EXCLUDED.remark, products.remark)"""
+
+        columns = ", ".join(DATA_COLUMNS)
+        cur.execute(f"""
+            WITH merged AS (
+                INSERT INTO products ({columns}, created_at)
+                SELECT {columns}, NOW() FROM product_import
+                ON CONFLICT (shop_id, item_code) {conflict}
+                RETURNING id, shop_id, qty_display, qty_godown, (xmax = 0) AS inserted
+            ),
+            opening AS (
+                -- New products start their ledger already compacted into the snapshot
+                INSERT INTO stock_movements (shop_id, product_id, kind, delta_display, delta_godown, note, compacted)
+                SELECT shop_id, id, 'opening', COALESCE(qty_display, 0), COALESCE(qty_godown, 0), 'import', true
+                FROM merged
+                WHERE inserted
+            )
+            SELECT COUNT(*) FILTER (WHERE inserted) AS inserted,
+                   COUNT(*) FILTER (WHERE NOT inserted) AS updated
+            FROM merged
+        """)
+        counts = cur.fetchone()
+        self.rejected.sort(key=lambda r: r["row"])
+        return {
+            "status": "success",
+            "received": self.received,
+            "inserted": counts["inserted"],
+            "updated": counts["updated"],
+            "rejected_count": self.rejected_count,
+            "rejected": self.rejected,
+        }
+
+
+async def stage_upload(chunks, max_bytes, timeout):
+    """Read a whole streamed upload into a spooled temp file, positioned at its start.
+
+    Raises UploadLimitError past `max_bytes` or if the client takes longer
+    than `timeout` seconds. The caller closes the file.
+    """
+    spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MEMORY_BYTES)
+    size = 0
+
+    async def read():
+        nonlocal size
+        async for data in chunks:
+            size += len(data)
+            if size > max_bytes:
+                raise UploadLimitError(f"Upload is larger than {max_bytes} bytes", 413)
+            spool.write(data)
+
+    try:
+        await asyncio.wait_for(read(), timeout)
+    except asyncio.TimeoutError:
+        spool.close()
+        raise UploadLimitError(f"Upload not received within {timeout} seconds", 408)
+    except BaseException:
+        spool.close()
+        raise
+    spool.seek(0)
+    return spool
+
+
+async def iter_file(f, size=READ_BYTES):
+    """Async iterator of bytes over a staged upload, for iter_upload_rows()."""
+    while True:
+        data = f.read(size)
+        if not data:
+            return
+        yield data
+
+
+async def iter_upload_rows(chunks, fmt, chunk_rows=CHUNK_ROWS):
+    """Parse a streamed CSV (with header) or NDJSON upload into lists of (row_no, dict).
+
+    `chunks` is an async iterator of bytes, e.g. request.stream(). Only one
+    chunk of rows is held at a time.
+    """
+    # Plain utf-8 (the BOM is dropped below) so error offsets count every byte
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    pending = ""
+    header = None
+    row_no = 0
+    batch = []
+
+    def parse(text):
+        nonlocal header, row_no
+        if fmt == "csv":
+            for values in csv.reader(io.StringIO(text)):
+                if not values:
+                    continue
+                if header is None:
+                    header = [h.strip() for h in values]
+                    continue
+                row_no += 1
+                yield row_no, dict(zip(header, values))
+        else:
+            for line in text.splitlines():
+                if not line.strip():
+                    continue
+                row_no += 1
+                try:
+                    yield row_no, json.loads(line)
+                except ValueError:
+                    yield row_no, None
+
+    received = 0
+    decoded = False
+
+    def decode(data, final=False):
+        nonlocal received, decoded
+        # Bytes before `data` the decoder has not turned into text yet
+        start = received - len(decoder.buffer)
+        received += len(data)
+        try:
+            text = decoder.decode(data, final)
+        except UnicodeDecodeError as e:
+            raise ImportFormatError(f"Upload is not valid UTF-8: bad byte at offset {start + e.start}")
+        if text and not decoded:
+            decoded = True
+            text = text.removeprefix("\ufeff")
+        return text
+
+    scanned = 0              # pending[:scanned] was already searched for a boundary
+    quoted = False           # CSV quote state at the end of pending
+    async for data in chunks:
+        pending += decode(data)
+        # Only cut at a newline outside quotes, so quoted multi-line CSV
+        # fields stay in one piece
+        if fmt == "csv":
+            cut, quoted = _last_record_boundary(pending, scanned, quoted)
+        else:
+            cut = pending.rfind("\n", scanned)
+        if cut >= 0:
+            complete, pending = pending[:cut + 1], pending[cut + 1:]
+            for item in parse(complete):
+                batch.append(item)
+                if len(batch) >= chunk_rows:
+                    yield batch
+                    batch = []
+        scanned = len(pending)
+        if scanned > MAX_RECORD_CHARS:
+            raise ImportFormatError(f"Row {row_no + 1} is longer than {MAX_RECORD_CHARS} characters"
+                                    + (" (unterminated quote?)" if quoted else ""))
+
+    pending += decode(b"", final=True)
+    for item in parse(pending):
+        batch.append(item)
+    if batch:
+        yield batch
+    if fmt == "csv" and header is None:
+        raise ImportFormatError("CSV upload has no header row")
+
+
+def _last_record_boundary(text, start=0, quoted=False):
+    """(index of the last newline ending a CSV record, or -1; quote state at the end of text).
+
+    Scans text[start:] only, from quote state `quoted`, so a buffer that grows
+    chunk by chunk is scanned once.
+    """
+    last = -1
+    for match in _QUOTE_OR_NEWLINE.finditer(text, start):
+        if match.group() == '"':
+            quoted = not quoted
+        elif not quoted:
+            last = match.start()
+    return last, quoted
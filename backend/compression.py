@@ -0,0 +1,187 @@
+"""Response compression: brotli/gzip helpers and the API compression middleware.
+
+CompressionMiddleware compresses JSON, NDJSON and CSV responses of at least
+`minimum_size` bytes for clients that accept it, preferring brotli when the
+`brotli` package is installed. Streaming bodies (NDJSON pages, exports) are
+compressed chunk by chunk with a flush after each, so the client still
+receives rows as they are produced. Responses that are already encoded (the
+precompressed frontend, see frontend_assets.py) and everything else, SSE in
+particular, pass through untouched.
+
+A compressed body is a different representation, so a strong ETag gets the
+encoding's suffix ("<tag>-gz", as the frontend does). On the way in,
+If-None-Match also gets each suffixed tag without its suffix, so the
+handlers keep comparing against their own, identity ETags.
+"""
+import gzip
+import zlib
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+COMPRESSIBLE_TYPES = (b"application/json", b"application/x-ndjson", b"text/csv")
+
+ENCODING_SUFFIX = {"br": b"-br", "gzip": b"-gz"}
+
+
+def accepted_encodings(headers):
+    """Encodings from the request's Accept-Encoding we can produce, best first."""
+    accept = b""
+    for name, value in headers:
+        if name == b"accept-encoding":
+            accept = value.lower()
+            break
+    offered = set()
+    for part in accept.split(b","):
+        token, _, params = part.strip().partition(b";")
+        if params.strip().replace(b" ", b"") in (b"q=0", b"q=0.0", b"q=0.00", b"q=0.000"):
+            continue
+        offered.add(token.strip())
+    encodings = []
+    if brotli is not None and b"br" in offered:
+        encodings.append("br")
+    if b"gzip" in offered:
+        encodings.append("gzip")
+    return encodings
+
+
+def encoded_etag(etag, encoding):
+    """ETag of the `encoding` representation; weak ETags already allow any encoding."""
+    if etag.startswith(b"W/") or not etag.endswith(b'"'):
+        return etag
+    return etag[:-1] + ENCODING_SUFFIX[encoding] + b'"'
+
+
+def _if_none_match(scope, encoding):
+    """(scope whose If-None-Match also lists its tags without this encoding's suffix, the tags as sent).
+
+    The suffixed tags stay too: the frontend compares its own per-encoding ETags.
+    """
+    headers = scope.get("headers", ())
+    value = next((v for k, v in headers if k == b"if-none-match"), None)
+    if value is None:
+        return scope, ()
+    suffix = ENCODING_SUFFIX[encoding] + b'"'
+    sent = [t.strip() for t in value.split(b",")]
+    plain = [t[:-len(suffix)] + b'"' for t in sent if t.endswith(suffix) and not t.startswith(b"W/")]
+    if not plain:
+        return scope, sent
+    headers = [(k, b", ".join(sent + plain) if k == b"if-none-match" else v) for k, v in headers]
+    return dict(scope, headers=headers), sent
+
+
+def _set_etag(headers, encoding):
+    return [(k, encoded_etag(v, encoding) if k == b"etag" else v) for k, v in headers]
+
+
+def compress(data, encoding, level=None):
+    """One-shot compression (deterministic: gzip carries no timestamp)."""
+    if encoding == "br":
+        return brotli.compress(data, quality=11 if level is None else level)
+    return gzip.compress(data, compresslevel=9 if level is None else level, mtime=0)
+
+
+class _StreamCompressor:
+    def __init__(self, encoding, level):
+        self.encoding = encoding
+        if encoding == "br":
+            self._c = brotli.Compressor(quality=level)
+        else:
+            self._c = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def chunk(self, data):
+        if self.encoding == "br":
+            return self._c.process(data) + self._c.flush()
+        return self._c.compress(data) + self._c.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self, data=b""):
+        if self.encoding == "br":
+            return self._c.process(data) + self._c.finish()
+        return self._c.compress(data) + self._c.flush()
+
+
+class CompressionMiddleware:
+    """ASGI middleware compressing large API responses (see module docstring)."""
+
+    def __init__(self, app, minimum_size=1024, gzip_level=6, brotli_quality=4):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.levels = {"gzip": gzip_level, "br": brotli_quality}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        encodings = accepted_encodings(scope.get("headers", ()))
+        if not encodings:
+            return await self.app(scope, receive, send)
+        encoding = encodings[0]
+        scope, sent_etags = _if_none_match(scope, encoding)
+
+        start = None            # held back until we know whether to compress
+        compressor = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start, compressor, passthrough
+            if passthrough:
+                return await send(message)
+
+            if message["type"] == "http.response.start":
+                if message["status"] == 304:
+                    # Revalidated a compressed copy: answer with the ETag it was sent with
+                    headers = message.get("headers", [])
+                    etag = dict(headers).get(b"etag")
+                    if etag is not None and encoded_etag(etag, encoding) in sent_etags:
+                        headers = _set_etag(headers, encoding)
+                    message["headers"] = _with_vary(headers)
+                    passthrough = True
+                    return await send(message)
+                headers = dict(message.get("headers", []))
+                content_type = headers.get(b"content-type", b"").split(b";")[0].strip()
+                if b"content-encoding" in headers or content_type not in COMPRESSIBLE_TYPES:
+                    passthrough = True
+                    return await send(message)
+                start = message
+                return
+
+            if message["type"] != "http.response.body":
+                return await send(message)
+
+            body = message.get("body", b"")
+            more = message.get("more_body", False)
+            if compressor is None:
+                if not more and len(body) < self.minimum_size:
+                    # Small, complete body: not worth it
+                    passthrough = True
+                    start["headers"] = _with_vary(start.get("headers", []))
+                    await send(start)
+                    return await send(message)
+                compressor = _StreamCompressor(encoding, self.levels[encoding])
+                headers = [(k, v) for k, v in _set_etag(start.get("headers", []), encoding) if k != b"content-length"]
+                headers.append((b"content-encoding", encoding.encode()))
+                if not more:
+                    body = compressor.finish(body)
+                    headers.append((b"content-length", str(len(body)).encode()))
+                    start["headers"] = _with_vary(headers)
+                    await send(start)
+                    return await send({"type": "http.response.body", "body": body})
+                start["headers"] = _with_vary(headers)
+                await send(start)
+
+            body = compressor.chunk(body) if more else compressor.finish(body)
+            await send({"type": "http.response.body", "body": body, "more_body": more})
+
+        await self.app(scope, receive, send_wrapper)
+
+
+def _with_vary(headers):
+    headers = list(headers)
+    for i, (name, value) in enumerate(headers):
+        if name == b"vary":
+            if b"accept-encoding" not in value.lower():
+                headers[i] = (name, value + b", Accept-Encoding")
+            return headers
+    headers.append((b"vary", b"Accept-Encoding"))
+    return headers
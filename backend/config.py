@@ -1,7 +1,10 @@
-import psycopg2
+import threading
 import urllib.parse
-from psycopg2.extras import RealDictCursor
+from typing import Literal
 from pydantic_settings import BaseSettings, SettingsConfigDict
+from db import ConnectionPool, PoolExhausted
+from instrumentation import QueryCursor
+from replicas import ReplicaRouter
 
 class Settings(BaseSettings):
     DB_USER: str
@@ -10,11 +13,154 @@ class Settings(BaseSettings):
     DB_PORT: str
     DB_NAME: str
     FRONTEND_URL: str
+    DB_SSLMODE: str = "require"       # "disable" for a local Postgres (e.g. the benchmarks)
+    # Connection pool sizing and recycling
+    DB_POOL_MIN: int = 1
+    DB_POOL_MAX: int = 10
+    DB_POOL_TIMEOUT: float = 5.0      # seconds to wait for a free connection
+    DB_POOL_MAX_AGE: int = 1800       # seconds before a connection is recycled
+    DB_POOL_CHECK_IDLE: int = 30      # ping connections idle longer than this
+    # Worker threads running the (blocking) handlers; 0 means DB_POOL_MAX
+    DB_THREADPOOL_SIZE: int = 0
+    # Minimum pg_trgm word similarity for a fuzzy search match (0..1)
+    SEARCH_SIMILARITY: float = 0.4
+    # /inventory/changes re-sends rows this many seconds older than the token
+    SYNC_OVERLAP_SECONDS: int = 60
+    # In-process item_code -> product index used by barcode lookups
+    PRODUCT_INDEX_MAX_ENTRIES: int = 50000
+    PRODUCT_INDEX_TTL: int = 300
+    # Seconds categories / shop lookups are served from memory
+    REF_CACHE_TTL: int = 600
+    # Sales are attributed to days in this time zone for rollups/analytics
+    REPORT_TIMEZONE: str = "Asia/Kolkata"
+    # Money in the list endpoints: "float", "string" (exact) or "cents" (see rowjson.py)
+    MONEY_FORMAT: Literal["float", "string", "cents"] = "float"
+    # Seconds between folds of the stock ledger into products.qty_* (see ledger.py); 0 disables
+    STOCK_COMPACT_SECONDS: int = 30
+    STOCK_COMPACT_BATCH: int = 5000
+    # GET /events/{shop_id} push channel (see live.py). LISTEN needs a session:
+    # point LIVE_EVENTS_DSN at a direct connection if DB_HOST is a transaction pooler
+    LIVE_EVENTS: bool = True
+    LIVE_EVENTS_DSN: str = ""
+    SSE_HEARTBEAT_SECONDS: float = 15.0
+    # Read replicas for the read-only endpoints (see replicas.py): comma-separated
+    # DSNs, empty for none. Replicas lagging more than REPLICA_MAX_LAG_SECONDS
+    # leave the rotation; a client's reads stay on the primary for
+    # READ_YOUR_WRITES_SECONDS after each of its writes.
+    DB_REPLICA_DSNS: str = ""
+    REPLICA_CHECK_SECONDS: float = 5.0
+    REPLICA_MAX_LAG_SECONDS: float = 2.0
+    READ_YOUR_WRITES_SECONDS: float = 5.0
+    # Write-behind order_history capture (see history.py): queue bound, rows per
+    # INSERT and the longest an entry waits before it is flushed
+    ORDER_HISTORY: bool = True
+    ORDER_HISTORY_QUEUE: int = 10000
+    ORDER_HISTORY_BATCH: int = 500
+    ORDER_HISTORY_FLUSH_SECONDS: float = 1.0
+    # Reorder suggestions (see reorder.py), recomputed every REORDER_INTERVAL_SECONDS
+    # (0 disables): velocity over REORDER_WINDOW_DAYS of sales, enough stock
+    # for REORDER_LEAD_DAYS of supplier lead time plus REORDER_COVER_DAYS
+    REORDER_INTERVAL_SECONDS: int = 900
+    REORDER_WINDOW_DAYS: int = 30
+    REORDER_LEAD_DAYS: int = 7
+    REORDER_COVER_DAYS: int = 14
+    # Frontend served by the backend (see frontend_assets.py); relative paths are
+    # resolved against backend/. API responses from COMPRESS_MIN_BYTES up are
+    # gzip/brotli compressed (see compression.py).
+    SERVE_FRONTEND: bool = True
+    FRONTEND_DIR: str = "../frontend"
+    COMPRESS_MIN_BYTES: int = 1024
+    # Catalog uploads (POST /inventory/import) are read in full before a
+    # database connection is taken: largest accepted body and longest read
+    IMPORT_MAX_BYTES: int = 100 * 1024 * 1024
+    IMPORT_READ_SECONDS: float = 300.0
+    # Statements slower than this are logged (see instrumentation.py)
+    SLOW_QUERY_MS: int = 200
+    SERVER_TIMING: bool = True        # add a Server-Timing header with DB time per response
     model_config = SettingsConfigDict(env_file=".env", extra="ignore")
 
 settings = Settings()
 
-def get_db_conn():
+def get_dsn():
     encoded_pass = urllib.parse.quote_plus(settings.DB_PASS)
-    conn_str = f"postgresql://{settings.DB_USER}:{encoded_pass}@{settings.DB_HOST}:{settings.DB_PORT}/{settings.DB_NAME}?sslmode=require"
-    return psycopg2.connect(conn_str, cursor_factory=RealDictCursor, connect_timeout=10)
+    return f"postgresql://{settings.DB_USER}:{encoded_pass}@{settings.DB_HOST}:{settings.DB_PORT}/{settings.DB_NAME}?sslmode={settings.DB_SSLMODE}"
+
+_pool = None
+_pool_lock = threading.Lock()
+_pool_closed = False     # set by close_pool(): shutting down, never reopen
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool_closed:
+                raise PoolExhausted("Connection pool is closed")
+            if _pool is None:
+                _pool = ConnectionPool(
+                    get_dsn(),
+                    minconn=settings.DB_POOL_MIN,
+                    maxconn=settings.DB_POOL_MAX,
+                    timeout=settings.DB_POOL_TIMEOUT,
+                    max_age=settings.DB_POOL_MAX_AGE,
+                    check_idle=settings.DB_POOL_CHECK_IDLE,
+                    # RealDictCursor that counts and times queries per request
+                    cursor_factory=QueryCursor,
+                )
+    return _pool
+
+def _replica_name(dsn, index):
+    parts = urllib.parse.urlsplit(dsn)
+    return f"{parts.hostname}:{parts.port or 5432}" if parts.hostname else f"replica{index}"
+
+_replicas = None
+
+def get_replicas():
+    """The ReplicaRouter for DB_REPLICA_DSNS (with no replicas it always reads from the primary)."""
+    global _replicas
+    if _replicas is None:
+        with _pool_lock:
+            if _replicas is None:
+                dsns = [d.strip() for d in settings.DB_REPLICA_DSNS.split(",") if d.strip()]
+                pools = {
+                    _replica_name(dsn, i): ConnectionPool(
+                        dsn,
+                        minconn=0,
+                        maxconn=settings.DB_POOL_MAX,
+                        timeout=settings.DB_POOL_TIMEOUT,
+                        max_age=settings.DB_POOL_MAX_AGE,
+                        check_idle=settings.DB_POOL_CHECK_IDLE,
+                        cursor_factory=QueryCursor,
+                    )
+                    for i, dsn in enumerate(dsns)
+                }
+                _replicas = ReplicaRouter(
+                    get_db_conn,
+                    pools,
+                    check_interval=settings.REPLICA_CHECK_SECONDS,
+                    max_lag=settings.REPLICA_MAX_LAG_SECONDS,
+                )
+    return _replicas
+
+def close_pool():
+    global _pool, _replicas, _pool_closed
+    with _pool_lock:
+        _pool_closed = True
+        if _replicas is not None:
+            _replicas.close()
+            _replicas = None
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+
+def get_db_conn():
+    """Borrow a pooled connection: `with get_db_conn() as conn: ...`.
+
+    The connection is committed on success, rolled back on error and returned
+    to the pool (not closed) when the block exits.
+    """
+    return get_pool().connection()
+
+def get_read_conn():
+    """Borrow a connection for a read-only handler: a replica when one is healthy
+    and the client has not just written, otherwise the primary (see replicas.py)."""
+    return get_replicas().connection()
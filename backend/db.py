@@ -0,0 +1,226 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+import psycopg2
+from psycopg2 import extensions
+from psycopg2.extras import RealDictCursor
+
+logger = logging.getLogger(__name__)
+
+
+class PoolExhausted(Exception):
+    """Raised when no connection could be borrowed within the pool timeout."""
+
+
+class ConnectionPool:
+    """Thread-safe pool of psycopg2 connections.
+
+    Connections are checked when borrowed (closed/broken ones are replaced and
+    ones idle longer than ``check_idle`` seconds are pinged), recycled once they
+    are older than ``max_age`` seconds, and handed back to the pool by
+    ``connection()`` instead of being closed.
+    """
+
+    def __init__(self, dsn, minconn=1, maxconn=10, timeout=5.0, max_age=1800, check_idle=30,
+                 cursor_factory=RealDictCursor, connect_timeout=10):
+        if minconn < 0 or maxconn < 1 or minconn > maxconn:
+            raise ValueError("Invalid pool size: min=%s max=%s" % (minconn, maxconn))
+        self.dsn = dsn
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.max_age = max_age
+        self.check_idle = check_idle
+        self.cursor_factory = cursor_factory
+        self.connect_timeout = connect_timeout
+
+        self._cond = threading.Condition()
+        self._idle = []          # [(conn, returned_at)], most recently returned last
+        self._born = {}          # conn -> creation time, for every open connection
+        self._size = 0           # open connections + connections being opened
+        self._in_use = 0
+        self._closed = False
+
+        self._waits = 0
+        self._wait_seconds = 0.0
+        self._wait_max = 0.0
+        self._exhausted = 0
+        self._created = 0
+        self._recycled = 0
+        self._failed_checks = 0
+
+    # -- connection lifecycle -------------------------------------------------
+
+    def _connect(self):
+        conn = psycopg2.connect(self.dsn, cursor_factory=self.cursor_factory,
+                                connect_timeout=self.connect_timeout)
+        with self._cond:
+            self._born[conn] = time.monotonic()
+            self._created += 1
+        return conn
+
+    def _discard(self, conn):
+        with self._cond:
+            self._born.pop(conn, None)
+            self._size -= 1
+            self._cond.notify()
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _is_stale(self, conn):
+        born = self._born.get(conn)
+        return born is None or time.monotonic() - born > self.max_age
+
+    def _healthy(self, conn, idle_for):
+        if conn.closed:
+            return False
+        if conn.info.transaction_status != extensions.TRANSACTION_STATUS_IDLE:
+            return False
+        if idle_for < self.check_idle:
+            return True
+        try:
+            # Plain cursor: the ping is not one of the caller's queries
+            with conn.cursor(cursor_factory=extensions.cursor) as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    def warm(self):
+        """Open connections until ``minconn`` are available."""
+        while True:
+            with self._cond:
+                if self._closed or self._size >= self.minconn:
+                    return
+                self._size += 1
+            try:
+                conn = self._connect()
+            except Exception:
+                with self._cond:
+                    self._size -= 1
+                raise
+            with self._cond:
+                self._idle.append((conn, time.monotonic()))
+                self._cond.notify()
+
+    def getconn(self, timeout=None):
+        timeout = self.timeout if timeout is None else timeout
+        started = time.monotonic()
+        waited = False
+        while True:
+            conn = None
+            with self._cond:
+                while True:
+                    if self._closed:
+                        raise PoolExhausted("Connection pool is closed")
+                    if self._idle:
+                        conn, returned_at = self._idle.pop()
+                        break
+                    if self._size < self.maxconn:
+                        self._size += 1
+                        break
+                    remaining = timeout - (time.monotonic() - started)
+                    if remaining <= 0:
+                        self._exhausted += 1
+                        raise PoolExhausted(
+                            "No database connection available after %.1fs (max=%d)" % (timeout, self.maxconn))
+                    waited = True
+                    self._cond.wait(remaining)
+                self._in_use += 1
+
+            if conn is None:
+                try:
+                    conn = self._connect()
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                        self._in_use -= 1
+                        self._cond.notify()
+                    raise
+            elif self._is_stale(conn):
+                with self._cond:
+                    self._recycled += 1
+                    self._in_use -= 1
+                self._discard(conn)
+                continue
+            elif not self._healthy(conn, time.monotonic() - returned_at):
+                with self._cond:
+                    self._failed_checks += 1
+                    self._in_use -= 1
+                logger.warning("Discarding unhealthy pooled connection")
+                self._discard(conn)
+                continue
+
+            if waited:
+                elapsed = time.monotonic() - started
+                with self._cond:
+                    self._waits += 1
+                    self._wait_seconds += elapsed
+                    self._wait_max = max(self._wait_max, elapsed)
+            return conn
+
+    def putconn(self, conn, discard=False):
+        with self._cond:
+            self._in_use -= 1
+        if not discard and not conn.closed:
+            try:
+                if conn.info.transaction_status != extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except Exception:
+                discard = True
+        if discard or conn.closed or self._closed or self._is_stale(conn):
+            self._discard(conn)
+            return
+        with self._cond:
+            self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection; commit on success, roll back on error, then return it."""
+        conn = self.getconn()
+        discard = False
+        try:
+            yield conn
+            if not conn.closed and conn.info.transaction_status != extensions.TRANSACTION_STATUS_IDLE:
+                conn.commit()
+        except BaseException as e:
+            discard = conn.closed or isinstance(e, (psycopg2.OperationalError, psycopg2.InterfaceError))
+            if not discard:
+                try:
+                    conn.rollback()
+                except Exception:
+                    discard = True
+            raise
+        finally:
+            self.putconn(conn, discard=discard)
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._cond.notify_all()
+        for conn, _ in idle:
+            self._discard(conn)
+
+    def stats(self):
+        with self._cond:
+            return {
+                "size": self._size,
+                "in_use": self._in_use,
+                "idle": len(self._idle),
+                "min": self.minconn,
+                "max": self.maxconn,
+                "waits_total": self._waits,
+                "wait_seconds_total": round(self._wait_seconds, 6),
+                "wait_seconds_max": round(self._wait_max, 6),
+                "exhausted_total": self._exhausted,
+                "created_total": self._created,
+                "recycled_total": self._recycled,
+                "failed_checks_total": self._failed_checks,
+            }
@@ -0,0 +1,166 @@
+"""Serves the frontend/ directory with precompressed, content-hashed assets.
+
+Everything is read once at startup (load()): each file gets a content hash,
+plus gzip and, with the `brotli` package, brotli variants at maximum
+compression, kept only when smaller. Requests then cost a dict lookup.
+
+Assets referenced from the HTML pages (app.js, ...) are also served under a
+hashed name, app.<hash>.js, and the pages are rewritten to point at it.
+Hashed URLs never change content, so they are sent with a one-year
+`immutable` Cache-Control; a deploy changes the hash and with it the URL.
+Pages and the files that need a stable URL (the manifest, the service
+worker) are sent with `no-cache` and an ETag, so browsers revalidate them
+with a cheap 304.
+"""
+import hashlib
+import logging
+import mimetypes
+import os
+import re
+
+from compression import accepted_encodings, brotli, compress, encoded_etag
+
+logger = logging.getLogger(__name__)
+
+# Served under their own name only, with revalidation
+STABLE_NAMES = {"manifest.json", "sw.js"}
+PAGE_EXTENSIONS = (".html",)
+# Already compressed formats: variants would not be smaller
+SKIP_COMPRESSION = (".png", ".jpg", ".jpeg", ".gif", ".webp", ".ico", ".woff", ".woff2", ".gz", ".br", ".zip")
+
+IMMUTABLE = b"public, max-age=31536000, immutable"
+REVALIDATE = b"no-cache"
+
+# src="app.js?v=20260102" / href="style.css": local references in the pages
+REFERENCE_RE = re.compile(r'(?P<attr>\b(?:src|href)=")(?P<path>[^"#?:]+)(?:\?[^"]*)?"')
+
+
+class Asset:
+    __slots__ = ("body", "variants", "content_type", "etag", "cache_control")
+
+    def __init__(self, body, content_type, cache_control):
+        self.body = body
+        self.content_type = content_type
+        self.etag = f'"{hashlib.sha256(body).hexdigest()[:20]}"'.encode()
+        self.cache_control = cache_control
+        self.variants = {}       # encoding -> compressed body
+
+    def etag_for(self, encoding=None):
+        """Strong ETag of one representation: each encoding gets its own suffix."""
+        return self.etag if encoding is None else encoded_etag(self.etag, encoding)
+
+    def precompress(self):
+        for encoding in ("br", "gzip"):
+            if encoding == "br" and brotli is None:
+                continue
+            data = compress(self.body, encoding)
+            if len(data) < len(self.body):
+                self.variants[encoding] = data
+
+
+class FrontendAssets:
+    """ASGI app for the frontend; mount it last, after every API route."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.assets = {}         # URL path -> Asset
+
+    def load(self):
+        assets, hashed = {}, {}
+        if not os.path.isdir(self.directory):
+            logger.warning(f"Frontend directory {self.directory} not found; not serving the frontend")
+            self.assets = assets
+            return
+        files = {}
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                full = os.path.join(root, name)
+                rel = os.path.relpath(full, self.directory).replace(os.sep, "/")
+                if name.startswith(".") or name == "Dockerfile":
+                    continue
+                with open(full, "rb") as f:
+                    files[rel] = f.read()
+
+        # Hashed names first, so the pages can be rewritten to use them
+        for rel, body in files.items():
+            if rel.endswith(PAGE_EXTENSIONS) or os.path.basename(rel) in STABLE_NAMES:
+                continue
+            stem, ext = os.path.splitext(rel)
+            hashed[rel] = f"{stem}.{hashlib.sha256(body).hexdigest()[:10]}{ext}"
+
+        for rel, body in files.items():
+            content_type = (mimetypes.guess_type(rel)[0] or "application/octet-stream")
+            if content_type.startswith("text/") or content_type in ("application/javascript", "application/json",
+                                                                    "application/manifest+json"):
+                content_type += "; charset=utf-8"
+            if rel.endswith(PAGE_EXTENSIONS):
+                body = self._rewrite(body, rel, hashed)
+            stable = Asset(body, content_type.encode(), REVALIDATE)
+            if not rel.endswith(SKIP_COMPRESSION):
+                stable.precompress()
+            assets["/" + rel] = stable
+            if rel in hashed:
+                immutable = Asset(body, stable.content_type, IMMUTABLE)
+                immutable.variants = stable.variants
+                assets["/" + hashed[rel]] = immutable
+        if "/index.html" in assets:
+            assets["/"] = assets["/index.html"]
+
+        self.assets = assets
+        logger.info(f"Frontend: {len(files)} files, {sum(len(a.body) for a in assets.values())} bytes "
+                    f"({', '.join(sorted({e for a in assets.values() for e in a.variants})) or 'uncompressed'})")
+
+    @staticmethod
+    def _rewrite(page, rel, hashed):
+        base = os.path.dirname(rel)
+
+        def replace(match):
+            path = match.group("path")
+            target = os.path.normpath(os.path.join(base, path)).replace(os.sep, "/")
+            if target not in hashed:
+                return match.group(0)
+            new = os.path.relpath(hashed[target], base or ".").replace(os.sep, "/")
+            return f'{match.group("attr")}{new}"'
+
+        return REFERENCE_RE.sub(replace, page.decode("utf-8")).encode("utf-8")
+
+    def stats(self):
+        return {
+            path: {"bytes": len(a.body), **{enc: len(data) for enc, data in a.variants.items()},
+                   "immutable": a.cache_control == IMMUTABLE}
+            for path, a in sorted(self.assets.items())
+        }
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return
+        method = scope["method"]
+        asset = self.assets.get(scope["path"])
+        if asset is None or method not in ("GET", "HEAD"):
+            status = 404 if asset is None else 405
+            await send({"type": "http.response.start", "status": status,
+                        "headers": [(b"content-type", b"text/plain; charset=utf-8")]})
+            await send({"type": "http.response.body", "body": b"Not Found" if status == 404 else b"Method Not Allowed"})
+            return
+
+        request_headers = scope.get("headers", ())
+        encoding = next((e for e in accepted_encodings(request_headers) if e in asset.variants), None)
+        etag = asset.etag_for(encoding)
+        headers = [
+            (b"etag", etag),
+            (b"cache-control", asset.cache_control),
+            (b"vary", b"Accept-Encoding"),
+        ]
+        if_none_match = next((v for k, v in request_headers if k == b"if-none-match"), None)
+        if if_none_match is not None and etag in [t.strip().removeprefix(b"W/") for t in if_none_match.split(b",")]:
+            await send({"type": "http.response.start", "status": 304, "headers": headers})
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        body = asset.body
+        if encoding is not None:
+            body = asset.variants[encoding]
+            headers.append((b"content-encoding", encoding.encode()))
+        headers += [(b"content-type", asset.content_type), (b"content-length", str(len(body)).encode())]
+        await send({"type": "http.response.start", "status": 200, "headers": headers})
+        await send({"type": "http.response.body", "body": b"" if method == "HEAD" else body})
@@ -0,0 +1,146 @@
+"""Write-behind capture of basket negotiation steps into order_history.
+
+Handlers call `record()` after their transaction commits. It only appends a
+small diff (what changed, plus the resulting total) to a bounded in-memory
+queue; a background thread drains the queue and writes whole batches with a
+single multi-row INSERT. The request never waits on order_history.
+
+History is best effort: if the queue is full (the database is down or far
+behind) new entries are dropped and counted rather than slowing the
+endpoints down, and a batch that fails to insert is logged and dropped.
+stop() flushes whatever is still queued before the pool closes.
+"""
+import datetime
+import logging
+import queue
+import threading
+import time
+
+from psycopg2.extras import execute_values
+
+import rowjson
+
+logger = logging.getLogger(__name__)
+
+# Entries for orders deleted while they sat in the queue are skipped instead
+# of failing the batch on the foreign key
+INSERT_SQL = """
+    INSERT INTO order_history (order_id, user_id, snapshot, created_at)
+    SELECT v.order_id::uuid, v.user_id::uuid, v.snapshot::jsonb, v.created_at::timestamptz
+    FROM (VALUES %s) AS v(order_id, user_id, snapshot, created_at)
+    WHERE EXISTS (SELECT 1 FROM orders o WHERE o.id = v.order_id::uuid)
+    RETURNING 1
+"""
+
+
+class HistoryWriter:
+    def __init__(self, get_conn, max_queue=10000, batch_size=500, flush_interval=1.0):
+        self.get_conn = get_conn
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._stop = threading.Event()
+        self._thread = None
+        self._queued = 0
+        self._written = 0
+        self._skipped = 0
+        self._dropped = 0
+        self._failed = 0
+        self._batches = 0
+        self._last_flush_seconds = None
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="order-history", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=10.0):
+        """Stop the writer after flushing everything queued so far."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+            if self._thread.is_alive():
+                logger.error(f"order_history writer did not drain in {timeout}s; "
+                             f"{self._queue.qsize()} entries lost")
+            self._thread = None
+
+    def record(self, order_id, event, user_id=None, **changes):
+        """Queue one history entry; never blocks and never raises.
+
+        A no-op while the writer is not running (ORDER_HISTORY off): nothing
+        would ever drain the queue.
+        """
+        if self._thread is None:
+            return
+        entry = (
+            str(order_id),
+            str(user_id) if user_id else None,
+            dict(changes, event=event),
+            datetime.datetime.now(datetime.timezone.utc),
+        )
+        try:
+            self._queue.put_nowait(entry)
+            self._queued += 1
+        except queue.Full:
+            self._dropped += 1
+
+    # -- writer thread -------------------------------------------------------
+
+    def _run(self):
+        while not self._stop.is_set():
+            batch = self._take(block=True)
+            if batch:
+                self._flush(batch)
+        # Shutting down: drain what is left
+        while True:
+            batch = self._take(block=False)
+            if not batch:
+                return
+            self._flush(batch)
+
+    def _take(self, block):
+        """Up to batch_size entries; waits up to flush_interval for the first one."""
+        batch = []
+        try:
+            if block:
+                batch.append(self._queue.get(timeout=self.flush_interval))
+            while len(batch) < self.batch_size:
+                batch.append(self._queue.get_nowait())
+        except queue.Empty:
+            pass
+        return batch
+
+    def _flush(self, batch):
+        started = time.monotonic()
+        rows = [
+            (order_id, user_id, rowjson.dumps(snapshot).decode(), created_at)
+            for order_id, user_id, snapshot, created_at in batch
+        ]
+        try:
+            with self.get_conn() as conn:
+                with conn.cursor() as cur:
+                    # Rows actually inserted: entries of deleted orders are skipped
+                    inserted = len(execute_values(cur, INSERT_SQL, rows, page_size=self.batch_size, fetch=True))
+                conn.commit()
+            self._written += inserted
+            self._skipped += len(rows) - inserted
+            self._batches += 1
+        except Exception as e:
+            self._failed += len(rows)
+            logger.error(f"order_history flush of {len(rows)} entries failed: {e}")
+        self._last_flush_seconds = round(time.monotonic() - started, 4)
+
+    def stats(self):
+        return {
+            "running": self._thread is not None,
+            "pending": self._queue.qsize(),
+            "capacity": self._queue.maxsize,
+            "queued": self._queued,
+            "written": self._written,
+            "skipped": self._skipped,
+            "dropped": self._dropped,
+            "failed": self._failed,
+            "batches": self._batches,
+            "last_flush_seconds": self._last_flush_seconds,
+        }
@@ -0,0 +1,282 @@
+"""Per-request database instrumentation and Prometheus metrics.
+
+QueryCursor is the pool's cursor factory (QueryTupleCursor its tuple-row
+twin): every execute() is timed and counted (with the rows it returned)
+against the current request, and statements slower than the slow-query
+threshold are logged with a fingerprint of the SQL and of the bound
+parameters (their types and sizes, never their values). QueryMetricsMiddleware opens the per-request scope,
+adds a Server-Timing header and feeds the /metrics histograms.
+
+The cost per query is two perf_counter() calls and a context variable
+lookup, so this stays on in production.
+"""
+import contextvars
+import hashlib
+import logging
+import re
+import threading
+import time
+from functools import lru_cache
+
+from psycopg2 import extensions
+from psycopg2.extras import RealDictCursor
+
+logger = logging.getLogger("slow_query")
+
+# Request latency buckets, in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+SLOW_QUERY_SECONDS = 0.2
+
+
+class RequestStats:
+    __slots__ = ("path", "route", "queries", "db_seconds", "rows")
+
+    def __init__(self, path=None):
+        self.path = path
+        self.route = None
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.rows = 0
+
+
+_current = contextvars.ContextVar("request_db_stats", default=None)
+
+
+def current_stats():
+    """The RequestStats of the request being handled, or None outside a request."""
+    return _current.get()
+
+
+@lru_cache(maxsize=1024)
+def fingerprint_sql(query):
+    """(short hash, normalized text) of a statement; literals are replaced by '?'."""
+    if isinstance(query, bytes):
+        query = query.decode(errors="replace")
+    text = " ".join(str(query).split())
+    text = re.sub(r"'(?:[^']|'')*'", "?", text)
+    text = re.sub(r"\b\d+(?:\.\d+)?\b", "?", text)
+    return hashlib.sha1(text.encode()).hexdigest()[:12], text
+
+
+def fingerprint_params(params):
+    """Shape of the bound parameters, e.g. {order_id: str, ids: list[40]}."""
+    def shape(value):
+        if isinstance(value, (list, tuple)):
+            return f"{type(value).__name__}[{len(value)}]"
+        return type(value).__name__
+
+    if params is None:
+        return "-"
+    if isinstance(params, dict):
+        return "{" + ", ".join(f"{k}: {shape(v)}" for k, v in params.items()) + "}"
+    return "(" + ", ".join(shape(v) for v in params) + ")"
+
+
+def _record(query, params, elapsed, rows):
+    stats = _current.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.db_seconds += elapsed
+        stats.rows += rows
+    if elapsed >= SLOW_QUERY_SECONDS:
+        metrics.slow_query()
+        fp, text = fingerprint_sql(query)
+        logger.warning(
+            f"slow query {elapsed * 1000:.0f}ms rows={rows} fp={fp} "
+            f"path={stats.path if stats else '-'} params={fingerprint_params(params)} sql={text[:300]}"
+        )
+
+
+class _Instrumented:
+    """Cursor mixin that reports each statement to the current request."""
+
+    def execute(self, query, vars=None):
+        started = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        finally:
+            # rowcount is -1 for named cursors (rows are counted as they are fetched)
+            _record(query, vars, time.perf_counter() - started, max(self.rowcount, 0) if self.name is None else 0)
+
+    def executemany(self, query, vars_list):
+        started = time.perf_counter()
+        try:
+            return super().executemany(query, vars_list)
+        finally:
+            _record(query, None, time.perf_counter() - started, 0)
+
+    def copy_expert(self, sql, file, size=8192):
+        started = time.perf_counter()
+        try:
+            return super().copy_expert(sql, file, size)
+        finally:
+            _record(sql, None, time.perf_counter() - started, max(self.rowcount, 0))
+
+    def fetchmany(self, size=None):
+        if self.name is None:
+            return super().fetchmany(size)
+        # Server-side cursor: each fetch is a round trip
+        started = time.perf_counter()
+        rows = super().fetchmany(size)
+        stats = _current.get()
+        if stats is not None:
+            stats.db_seconds += time.perf_counter() - started
+            stats.rows += len(rows)
+        return rows
+
+
+class QueryCursor(_Instrumented, RealDictCursor):
+    """The pool's default cursor: dict rows."""
+
+
+class QueryTupleCursor(_Instrumented, extensions.cursor):
+    """Plain tuple rows, for the list endpoints' fast JSON path (see rowjson.py)."""
+
+
+class _Histogram:
+    __slots__ = ("counts", "total", "count")
+
+    def __init__(self):
+        self.counts = [0] * len(LATENCY_BUCKETS)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.total += value
+        self.count += 1
+
+
+class Metrics:
+    """Per-route counters and latency histograms, rendered in Prometheus text format."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._latency = {}       # (method, route) -> _Histogram
+        self._responses = {}     # (method, route, status) -> count
+        self._db = {}            # (method, route) -> [queries, db_seconds, rows]
+        self._slow_queries = 0
+
+    def observe(self, method, route, status, seconds, stats):
+        key = (method, route)
+        with self._lock:
+            hist = self._latency.get(key)
+            if hist is None:
+                hist = self._latency[key] = _Histogram()
+            hist.observe(seconds)
+            rkey = (method, route, status)
+            self._responses[rkey] = self._responses.get(rkey, 0) + 1
+            db = self._db.get(key)
+            if db is None:
+                db = self._db[key] = [0, 0.0, 0]
+            db[0] += stats.queries
+            db[1] += stats.db_seconds
+            db[2] += stats.rows
+
+    def slow_query(self):
+        with self._lock:
+            self._slow_queries += 1
+
+    def render(self, gauges=None):
+        """Prometheus exposition text; `gauges` adds {name: value} gauges (e.g. pool stats)."""
+        def labels(method, route, **extra):
+            pairs = [("method", method), ("route", route)] + list(extra.items())
+            return ",".join('%s="%s"' % (k, str(v).replace("\\", "\\\\").replace('"', '\\"')) for k, v in pairs)
+
+        with self._lock:
+            latency = {k: (list(h.counts), h.total, h.count) for k, h in self._latency.items()}
+            responses = dict(self._responses)
+            db = {k: list(v) for k, v in self._db.items()}
+            slow = self._slow_queries
+
+        out = [
+            "# HELP http_request_duration_seconds Request latency by route.",
+            "# TYPE http_request_duration_seconds histogram",
+        ]
+        for (method, route), (counts, total, count) in sorted(latency.items()):
+            cumulative = 0
+            for bound, n in zip(LATENCY_BUCKETS, counts):
+                cumulative += n
+                out.append(f"http_request_duration_seconds_bucket{{{labels(method, route, le=bound)}}} {cumulative}")
+            out.append(f"http_request_duration_seconds_bucket{{{labels(method, route, le='+Inf')}}} {count}")
+            out.append(f"http_request_duration_seconds_sum{{{labels(method, route)}}} {total:.6f}")
+            out.append(f"http_request_duration_seconds_count{{{labels(method, route)}}} {count}")
+
+        out += ["# HELP http_responses_total Responses by route and status.", "# TYPE http_responses_total counter"]
+        for (method, route, status), n in sorted(responses.items()):
+            out.append(f"http_responses_total{{{labels(method, route, status=status)}}} {n}")
+
+        for i, (name, help_text) in enumerate((
+            ("db_queries_total", "SQL statements executed, by route."),
+            ("db_query_seconds_total", "Time spent in the database, by route."),
+            ("db_rows_total", "Rows returned by the database, by route."),
+        )):
+            out += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+            for (method, route), values in sorted(db.items()):
+                value = f"{values[i]:.6f}" if isinstance(values[i], float) else values[i]
+                out.append(f"{name}{{{labels(method, route)}}} {value}")
+
+        out += ["# HELP db_slow_queries_total Statements slower than the slow-query threshold.",
+                "# TYPE db_slow_queries_total counter", f"db_slow_queries_total {slow}"]
+        for name, value in (gauges or {}).items():
+            out += [f"# TYPE {name} gauge", f"{name} {value}"]
+        return "\n".join(out) + "\n"
+
+
+metrics = Metrics()
+
+
+class QueryMetricsMiddleware:
+    """ASGI middleware: per-request DB stats, Server-Timing header and route metrics."""
+
+    def __init__(self, app, server_timing=True):
+        self.app = app
+        self.server_timing = server_timing
+        self._routes = None      # endpoint -> path template, built on first request
+
+    def _route(self, scope):
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return "unmatched"
+        if self._routes is None:
+            # Mounts (the frontend) have no endpoint: their app is labelled with
+            # the mount's name, so arbitrary paths never become new series
+            self._routes = {}
+            for r in scope["app"].routes:
+                if hasattr(r, "endpoint"):
+                    self._routes[r.endpoint] = r.path
+                elif hasattr(r, "app"):
+                    self._routes[r.app] = r.name or r.path or "mount"
+        return self._routes.get(endpoint, "unmatched")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        stats = RequestStats(scope.get("path"))
+        token = _current.set(stats)
+        started = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                stats.route = self._route(scope)
+                if self.server_timing:
+                    total = (time.perf_counter() - started) * 1000
+                    value = (f"db;dur={stats.db_seconds * 1000:.1f};desc=\"{stats.queries} queries, {stats.rows} rows\", "
+                             f"app;dur={total:.1f}")
+                    message["headers"] = list(message.get("headers", [])) + [(b"server-timing", value.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+            metrics.observe(scope["method"], stats.route or self._route(scope), status,
+                            time.perf_counter() - started, stats)
@@ -0,0 +1,95 @@
+"""Query building for the paginated /inventory/{shop_id} listing."""
+from ledger import DISPLAY_SQL, GODOWN_SQL, PENDING_JOIN
+from paging import decode_cursor
+from rowjson import money_sql
+
+# Public field name -> SQL expression
+FIELDS = {
+    "id": "p.id",
+    "item_code": "p.item_code",
+    "selling_price": "p.selling_price",
+    "vendor_name": "p.vendor_name",
+    "photo_url": "p.photo_url",
+    # Live balances: compacted snapshot + pending ledger movements (needs PENDING_JOIN)
+    "qty_display": DISPLAY_SQL,
+    "qty_godown": GODOWN_SQL,
+    "category_id": "p.category_id",
+    "category_name": "c.name",
+    "remark": "p.remark",
+    "created_at": "p.created_at",
+    "updated_at": "p.updated_at",
+}
+
+MONEY_FIELDS = {"selling_price"}
+
+DEFAULT_FIELDS = [
+    "id", "item_code", "selling_price", "vendor_name", "photo_url",
+    "qty_display", "qty_godown", "category_name", "created_at",
+]
+
+STOCK_FILTERS = ("in", "out", "low")
+
+
+def parse_fields(fields):
+    """Turn `fields=a,b,c` into a column list; id and created_at are always kept for the cursor."""
+    if not fields:
+        return list(DEFAULT_FIELDS)
+    names = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in names if f not in FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown field(s): {', '.join(unknown)}")
+    for key in ("created_at", "id"):
+        if key not in names:
+            names.insert(0, key)
+    return names
+
+
+def build_query(shop_id, fields, category_id=None, stock=None, low_stock=5, cursor=None, limit=None,
+                money="float"):
+    """Return (sql, params) listing a shop's products newest first.
+
+    Rows are ordered by (created_at, id) descending so `cursor` (from
+    next_cursor) resumes strictly after the last row of the previous page,
+    using the products(shop_id, created_at, id) index. Columns come back in
+    `fields` order, money columns rendered as `money` (see rowjson.py).
+    """
+    columns = ", ".join(
+        f"{money_sql(FIELDS[f], money) if f in MONEY_FIELDS else FIELDS[f]} AS {f}" for f in fields
+    )
+    where = ["p.shop_id = %(shop_id)s"]
+    params = {"shop_id": shop_id}
+
+    if category_id:
+        where.append("p.category_id = %(category_id)s")
+        params["category_id"] = category_id
+
+    if stock:
+        if stock not in STOCK_FILTERS:
+            raise ValueError(f"stock must be one of: {', '.join(STOCK_FILTERS)}")
+        total = f"({GODOWN_SQL} + {DISPLAY_SQL})"
+        if stock == "in":
+            where.append(f"{total} > 0")
+        elif stock == "out":
+            where.append(f"{total} <= 0")
+        else:
+            where.append(f"{total} > 0 AND {total} <= %(low_stock)s")
+            params["low_stock"] = low_stock
+
+    if cursor:
+        created_at, last_id = decode_cursor(cursor, 2)
+        where.append("(p.created_at, p.id) < (%(cursor_ts)s::timestamptz, %(cursor_id)s::uuid)")
+        params["cursor_ts"] = created_at
+        params["cursor_id"] = last_id
+
+    sql = f"""
+        SELECT {columns}
+        FROM products p
+        LEFT JOIN categories c ON p.category_id = c.id
+        {PENDING_JOIN}
+        WHERE {' AND '.join(where)}
+        ORDER BY p.created_at DESC, p.id DESC
+    """
+    if limit is not None:
+        sql += " LIMIT %(limit)s"
+        params["limit"] = limit
+    return sql, params
@@ -0,0 +1,241 @@
+"""Stock movement ledger: balances, history and compaction.
+
+Every stock change is a row in stock_movements (see migrations/
+007_stock_ledger.sql and stock.py for the writers). products.qty_display /
+qty_godown hold a compacted snapshot; the live balance is that snapshot plus
+the deltas of movements not yet compacted, which PENDING_JOIN adds to any
+query over `products p`.
+
+compact() folds committed movements into the snapshot in batches. It flags
+the movements it folded (instead of keeping a movement-id watermark) so a
+movement whose transaction commits late is never skipped.
+
+    python ledger.py compact
+"""
+import argparse
+import logging
+import threading
+import time
+
+from paging import decode_cursor, encode_cursor
+
+logger = logging.getLogger(__name__)
+
+KINDS = ("opening", "sale", "transfer", "restock", "adjust")
+
+# Appended after `FROM products p`; exposes pending.qty_display / pending.qty_godown
+PENDING_JOIN = """
+    CROSS JOIN LATERAL (
+        SELECT COALESCE(SUM(m.delta_display), 0)::int AS qty_display,
+               COALESCE(SUM(m.delta_godown), 0)::int AS qty_godown
+        FROM stock_movements m
+        WHERE m.product_id = p.id AND NOT m.compacted
+    ) pending
+"""
+DISPLAY_SQL = "(COALESCE(p.qty_display, 0) + pending.qty_display)"
+GODOWN_SQL = "(COALESCE(p.qty_godown, 0) + pending.qty_godown)"
+
+# Serializes stock writers per product (sorted, so they cannot deadlock).
+# Only writers take it: readers, catalog edits and other SKUs never wait.
+# Run it as its own statement, before reading balances, so the balance
+# query's snapshot is taken after the lock is held.
+LOCK_PRODUCTS_SQL = """
+    SELECT pg_advisory_xact_lock(hashtextextended(l.product_id::text, 0))
+    FROM (SELECT DISTINCT unnest(%(product_ids)s::uuid[]) AS product_id ORDER BY 1) l;
+"""
+
+# Only one compactor at a time across workers (it updates many product rows)
+COMPACTOR_LOCK_KEY = 0x5354434B  # "STCK"
+
+COMPACT_SQL = """
+    SET LOCAL invt.stock_compaction = 'on';
+    WITH batch AS (
+        SELECT id FROM stock_movements
+        WHERE NOT compacted
+        ORDER BY id
+        LIMIT %(batch_size)s
+        FOR UPDATE SKIP LOCKED
+    ),
+    folded AS (
+        UPDATE stock_movements m SET compacted = true
+        FROM batch b
+        WHERE m.id = b.id
+        RETURNING m.product_id, m.delta_display, m.delta_godown
+    ),
+    sums AS (
+        SELECT product_id, SUM(delta_display)::int AS display, SUM(delta_godown)::int AS godown, COUNT(*) AS n
+        FROM folded
+        GROUP BY product_id
+    ),
+    applied AS (
+        UPDATE products p
+        SET qty_display = COALESCE(p.qty_display, 0) + s.display,
+            qty_godown = COALESCE(p.qty_godown, 0) + s.godown
+        FROM sums s
+        WHERE p.id = s.product_id
+        RETURNING s.n
+    )
+    SELECT COALESCE(SUM(n), 0)::int AS folded FROM applied
+"""
+
+
+def lock_products(cur, product_ids):
+    cur.execute(LOCK_PRODUCTS_SQL, {"product_ids": [str(p) for p in product_ids]})
+
+
+def balances(cur, product_ids):
+    """{product_id: {"item_code", "shop_id", "qty_display", "qty_godown"}} at this moment."""
+    cur.execute(f"""
+        SELECT p.id, p.shop_id, p.item_code,
+               {DISPLAY_SQL} AS qty_display, {GODOWN_SQL} AS qty_godown
+        FROM products p
+        {PENDING_JOIN}
+        WHERE p.id = ANY(%s::uuid[])
+    """, ([str(p) for p in product_ids],))
+    return {str(r["id"]): r for r in cur.fetchall()}
+
+
+def history(cur, product_id, cursor=None, limit=100):
+    """Movements of one product, newest first, each with the balance right after it.
+
+    Returns (movements, next_cursor); next_cursor is None on the last page.
+    """
+    params = {"product_id": str(product_id), "limit": limit + 1, "before": None}
+    if cursor:
+        (before,) = decode_cursor(cursor, 1)
+        try:
+            params["before"] = int(before)
+        except ValueError:
+            raise ValueError("Invalid cursor")
+
+    # balance after a movement = live balance - everything recorded after it
+    cur.execute(f"""
+        WITH live AS (
+            SELECT {DISPLAY_SQL} AS qty_display, {GODOWN_SQL} AS qty_godown
+            FROM products p
+            {PENDING_JOIN}
+            WHERE p.id = %(product_id)s
+        ),
+        later AS (
+            SELECT COALESCE(SUM(delta_display), 0)::int AS display, COALESCE(SUM(delta_godown), 0)::int AS godown
+            FROM stock_movements
+            WHERE product_id = %(product_id)s AND %(before)s::bigint IS NOT NULL AND id >= %(before)s
+        ),
+        page AS (
+            SELECT id, kind, delta_display, delta_godown, order_id, user_id, note, created_at
+            FROM stock_movements
+            WHERE product_id = %(product_id)s
+              AND (%(before)s::bigint IS NULL OR id < %(before)s)
+            ORDER BY id DESC
+            LIMIT %(limit)s
+        )
+        SELECT page.*,
+               live.qty_display - later.display
+                 - COALESCE(SUM(page.delta_display) OVER w, 0) + page.delta_display AS qty_display,
+               live.qty_godown - later.godown
+                 - COALESCE(SUM(page.delta_godown) OVER w, 0) + page.delta_godown AS qty_godown
+        FROM page, live, later
+        WINDOW w AS (ORDER BY page.id DESC ROWS UNBOUNDED PRECEDING)
+        ORDER BY page.id DESC
+    """, params)
+    rows = cur.fetchall()
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(rows[-1]["id"])
+
+
+def compact(cur, batch_size=5000):
+    """Fold up to `batch_size` committed movements into products.qty_*; returns how many.
+
+    Returns 0 without doing anything if another compactor holds the lock.
+    Runs in the caller's transaction.
+    """
+    cur.execute("SELECT pg_try_advisory_xact_lock(%s) AS locked", (COMPACTOR_LOCK_KEY,))
+    if not cur.fetchone()["locked"]:
+        return 0
+    cur.execute(COMPACT_SQL, {"batch_size": batch_size})
+    return cur.fetchone()["folded"]
+
+
+def compact_all(get_conn, batch_size=5000, stop=None):
+    """Compact in committed batches until nothing (or only a partial batch) is left.
+
+    Also returns between batches once the `stop` event is set.
+    """
+    total = 0
+    while stop is None or not stop.is_set():
+        with get_conn() as conn:
+            with conn.cursor() as cur:
+                folded = compact(cur, batch_size)
+            conn.commit()
+        total += folded
+        if folded < batch_size:
+            return total
+    return total
+
+
+class Compactor:
+    """Background thread running compact_all() every `interval` seconds."""
+
+    def __init__(self, get_conn, interval=30, batch_size=5000):
+        self.get_conn = get_conn
+        self.interval = interval
+        self.batch_size = batch_size
+        self._stop = threading.Event()
+        self._thread = None
+        self._runs = 0
+        self._folded = 0
+        self._errors = 0
+        self._last_run = None
+        self._last_seconds = None
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="stock-compactor", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            started = time.monotonic()
+            try:
+                self._folded += compact_all(self.get_conn, self.batch_size, self._stop)
+            except Exception as e:
+                self._errors += 1
+                logger.error(f"Stock compaction failed: {e}")
+            self._runs += 1
+            self._last_run = time.time()
+            self._last_seconds = round(time.monotonic() - started, 3)
+
+    def stats(self):
+        return {
+            "interval": self.interval,
+            "runs": self._runs,
+            "folded": self._folded,
+            "errors": self._errors,
+            "last_run": self._last_run,
+            "last_seconds": self._last_seconds,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stock ledger maintenance")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("compact", help="fold pending movements into products.qty_*")
+    p.add_argument("--batch-size", type=int, default=5000)
+    args = parser.parse_args()
+
+    from config import get_db_conn
+    folded = compact_all(get_db_conn, args.batch_size)
+    print(f"compacted {folded} movement(s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+"""Per-shop push of stock, order and basket changes for GET /events/{shop_id}.
+
+Triggers from migrations/006_live_events.sql NOTIFY on the shop_events
+channel. Each worker keeps one dedicated LISTEN connection (outside the
+pool, in autocommit), read by a background thread, and fans every event out
+to the asyncio queues of the clients subscribed to that shop.
+
+Notifications raised while the listener is disconnected are lost, so after
+a reconnect every client gets a "resync" event and reloads what it shows.
+A client that falls `queue_size` events behind gets the same treatment
+instead of an unbounded backlog.
+
+Event types with a handler registered through on() are consumed by the
+worker itself (e.g. "reference": drop cached categories/shops) and never
+reach the clients. After a reconnect each handler is called with just
+{"type": ...}, since its events may have been missed.
+"""
+import asyncio
+import json
+import logging
+import select
+import threading
+
+import psycopg2
+from psycopg2 import extensions
+
+CHANNEL = "shop_events"
+
+logger = logging.getLogger(__name__)
+
+
+class EventHub:
+    def __init__(self, dsn, queue_size=100, ping_interval=15.0, reconnect_delay=2.0):
+        self.dsn = dsn
+        self.queue_size = queue_size
+        self.ping_interval = ping_interval
+        self.reconnect_delay = reconnect_delay
+        self._subscribers = {}           # shop_id -> set of asyncio.Queue
+        self._handlers = {}              # event type -> callback(event), run on the listener thread
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._loop = None
+        self._thread = None
+        self._connected = False
+        self._received = 0
+        self._delivered = 0
+        self._overflows = 0
+        self._reconnects = 0
+
+    def start(self, loop):
+        """Start the listener thread; events are delivered on `loop`."""
+        if self._thread is not None:
+            return
+        self._loop = loop
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="shop-events", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.ping_interval + 1)
+            self._thread = None
+
+    def on(self, event_type, callback):
+        """Consume `event_type` events in this process with callback(event)."""
+        self._handlers[event_type] = callback
+
+    def subscribe(self, shop_id):
+        """Register a client; returns the queue its events arrive on."""
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        with self._lock:
+            self._subscribers.setdefault(str(shop_id), set()).add(queue)
+        return queue
+
+    def unsubscribe(self, shop_id, queue):
+        with self._lock:
+            queues = self._subscribers.get(str(shop_id))
+            if queues is not None:
+                queues.discard(queue)
+                if not queues:
+                    del self._subscribers[str(shop_id)]
+
+    # -- listener thread ---------------------------------------------------
+
+    def _run(self):
+        first = True
+        while not self._stop.is_set():
+            conn = None
+            try:
+                conn = psycopg2.connect(self.dsn, connect_timeout=10)
+                conn.set_isolation_level(extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+                with conn.cursor() as cur:
+                    cur.execute(f"LISTEN {CHANNEL}")
+                self._connected = True
+                if not first:
+                    self._reconnects += 1
+                    for event_type in list(self._handlers):
+                        self._handle({"type": event_type})
+                    self._publish(None, {"type": "resync"})
+                first = False
+                self._listen(conn)
+            except Exception as e:
+                logger.error(f"Event listener error: {e}")
+            finally:
+                self._connected = False
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
+            self._stop.wait(self.reconnect_delay)
+
+    def _listen(self, conn):
+        while not self._stop.is_set():
+            if select.select([conn], [], [], self.ping_interval) == ([], [], []):
+                # Quiet: make sure the connection is still alive
+                with conn.cursor() as cur:
+                    cur.execute("SELECT 1")
+            conn.poll()
+            while conn.notifies:
+                notify = conn.notifies.pop(0)
+                try:
+                    event = json.loads(notify.payload)
+                except ValueError:
+                    logger.error(f"Bad {CHANNEL} payload: {notify.payload[:200]}")
+                    continue
+                self._received += 1
+                if event.get("type") in self._handlers:
+                    self._handle(event)
+                    continue
+                self._publish(event.get("shop_id"), event)
+
+    def _handle(self, event):
+        try:
+            self._handlers[event["type"]](event)
+        except Exception as e:
+            logger.error(f"{event['type']} event handler failed: {e}")
+
+    def _publish(self, shop_id, event):
+        """Hand `event` to the loop for one shop's clients (or everyone's, shop_id=None)."""
+        with self._lock:
+            if shop_id is None:
+                queues = [q for qs in self._subscribers.values() for q in qs]
+            else:
+                queues = list(self._subscribers.get(str(shop_id), ()))
+        if queues and self._loop is not None:
+            self._loop.call_soon_threadsafe(self._deliver, queues, event)
+
+    # -- event loop ----------------------------------------------------------
+
+    def _deliver(self, queues, event):
+        for queue in queues:
+            try:
+                queue.put_nowait(event)
+                self._delivered += 1
+            except asyncio.QueueFull:
+                # Too far behind: drop the backlog and tell the client to reload
+                self._overflows += 1
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait({"type": "resync"})
+
+    def stats(self):
+        with self._lock:
+            shops = len(self._subscribers)
+            clients = sum(len(qs) for qs in self._subscribers.values())
+        return {
+            "connected": self._connected,
+            "shops": shops,
+            "clients": clients,
+            "received": self._received,
+            "delivered": self._delivered,
+            "overflows": self._overflows,
+            "reconnects": self._reconnects,
+        }
+
+
+async def sse_stream(hub, shop_id, heartbeat=15.0):
+    """Server-sent events for one client of `shop_id`, until it disconnects."""
+    queue = hub.subscribe(shop_id)
+    try:
+        yield "retry: 3000\n\n"
+        while True:
+            try:
+                event = await asyncio.wait_for(queue.get(), heartbeat)
+            except asyncio.TimeoutError:
+                # Comment line: keeps proxies from closing an idle stream
+                yield ": ping\n\n"
+                continue
+            yield f"event: {event.get('type', 'message')}\ndata: {json.dumps(event)}\n\n"
+    finally:
+        hub.unsubscribe(shop_id, queue)
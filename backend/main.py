@@ -4,17 +4,46 @@ from fastapi import FastAPI, Query
 from fastapi import Body
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, Field
+from typing import List, Literal, Optional
 import psycopg2  # <--- This is the missing line
 from psycopg2.extras import RealDictCursor
 import urllib.parse
 from fastapi.staticfiles import StaticFiles
 import mimetypes
 from pydantic_settings import BaseSettings, SettingsConfigDict
-from fastapi import HTTPException
+from fastapi import HTTPException, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+import asyncio
+import datetime
 import logging
-from config import get_db_conn
+import sys
+import uuid
+import anyio
+import config
+from config import get_db_conn, get_read_conn, get_pool, get_replicas, close_pool
+import basket
+import bulk_import
+import compression
+import export
+import frontend_assets
+import history
+import instrumentation
+import inventory
+import ledger
+import live
+import orders
+import product_index
+import ref_cache
+import reorder
+import replicas
+import rollups
+import rowjson
+import search
+import streaming
+import sync
+import stock
 
 load_dotenv()
 
@@ -54,8 +83,20 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag", "Last-Modified", "Server-Timing", "X-Read-Primary-Until"],
 )
 
+# Query count / DB time per request, Server-Timing and /metrics (see instrumentation.py)
+instrumentation.SLOW_QUERY_SECONDS = config.settings.SLOW_QUERY_MS / 1000
+app.add_middleware(instrumentation.QueryMetricsMiddleware, server_timing=config.settings.SERVER_TIMING)
+
+# JSON / NDJSON / CSV bodies from COMPRESS_MIN_BYTES up go out gzip- or brotli-compressed
+app.add_middleware(compression.CompressionMiddleware, minimum_size=config.settings.COMPRESS_MIN_BYTES)
+
+# Read-only endpoints use get_read_conn(); a client that just wrote keeps
+# reading from the primary for a few seconds (see replicas.py)
+app.add_middleware(replicas.ReadYourWritesMiddleware, pin_seconds=config.settings.READ_YOUR_WRITES_SECONDS)
+
 # def get_db_conn():
 #     # You must access them from the 'settings' object you created above
 #     encoded_pass = urllib.parse.quote_plus(settings.DB_PASS)
@@ -74,54 +115,235 @@ app.add_middleware(
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+@app.on_event("startup")
+def size_db_threadpool():
+    # Handlers that touch the database are plain `def` so FastAPI runs them in
+    # its worker threadpool instead of blocking the event loop. Bound that pool
+    # to the connection pool so threads never queue on a connection.
+    limiter = anyio.to_thread.current_default_thread_limiter()
+    limiter.total_tokens = config.settings.DB_THREADPOOL_SIZE or config.settings.DB_POOL_MAX
+
+# Basket negotiation steps queued for order_history (see history.py). Its
+# shutdown hook is registered before shutdown_db_pool: the drain needs the pool.
+order_history = history.HistoryWriter(
+    get_db_conn,
+    max_queue=config.settings.ORDER_HISTORY_QUEUE,
+    batch_size=config.settings.ORDER_HISTORY_BATCH,
+    flush_interval=config.settings.ORDER_HISTORY_FLUSH_SECONDS,
+)
+
+@app.on_event("startup")
+def start_order_history():
+    if config.settings.ORDER_HISTORY:
+        order_history.start()
+
+@app.on_event("shutdown")
+def stop_order_history():
+    order_history.stop()
+
+# Folds the stock ledger into the products.qty_* snapshot (see ledger.py).
+# Stopped before shutdown_db_pool, so a fold in flight can finish.
+stock_compactor = ledger.Compactor(
+    get_db_conn,
+    interval=config.settings.STOCK_COMPACT_SECONDS,
+    batch_size=config.settings.STOCK_COMPACT_BATCH,
+)
+
+@app.on_event("startup")
+def start_stock_compactor():
+    if config.settings.STOCK_COMPACT_SECONDS > 0:
+        stock_compactor.start()
+
+@app.on_event("shutdown")
+def stop_stock_compactor():
+    stock_compactor.stop()
+
+# Periodic reorder computation per shop (see reorder.py). Stopped before
+# shutdown_db_pool; a run in progress stops after its current shop.
+reorder_job = reorder.ReorderJob(
+    get_db_conn,
+    interval=config.settings.REORDER_INTERVAL_SECONDS,
+    window_days=config.settings.REORDER_WINDOW_DAYS,
+    lead_days=config.settings.REORDER_LEAD_DAYS,
+    cover_days=config.settings.REORDER_COVER_DAYS,
+)
+
+@app.on_event("startup")
+def start_reorder_job():
+    if config.settings.REORDER_INTERVAL_SECONDS > 0:
+        reorder_job.start()
+
+@app.on_event("shutdown")
+def stop_reorder_job():
+    reorder_job.stop()
+
+@app.on_event("startup")
+def open_db_pool():
+    try:
+        get_pool().warm()
+    except Exception as e:
+        # The pool opens connections lazily, so a cold start still serves requests
+        logger.error(f"Could not pre-open database connections: {e}")
+
+@app.on_event("startup")
+def start_replica_checks():
+    # First health check runs here, so healthy replicas serve from the start
+    get_replicas().start()
+
+@app.on_event("shutdown")
+def shutdown_db_pool():
+    close_pool()
+
+# One LISTEN connection per worker fans shop events out to SSE clients
+live_events = live.EventHub(config.settings.LIVE_EVENTS_DSN or config.get_dsn())
+
+@app.on_event("startup")
+async def start_live_events():
+    if config.settings.LIVE_EVENTS:
+        live_events.start(asyncio.get_running_loop())
+
+@app.on_event("shutdown")
+def stop_live_events():
+    live_events.stop()
+
+# item_code -> product cache for barcode scans; invalidated by product writes below
+product_codes = product_index.ProductCodeIndex(
+    max_entries=config.settings.PRODUCT_INDEX_MAX_ENTRIES,
+    ttl=config.settings.PRODUCT_INDEX_TTL,
+)
+
+# Categories and shop lookups; see ref_cache.py. Writes to either table are
+# announced by triggers (migrations/011_reference_events.sql) and drop the
+# cached copies here; without live events only REF_CACHE_TTL applies.
+ref_data = ref_cache.ReferenceCache(ttl=config.settings.REF_CACHE_TTL)
+live_events.on("reference", lambda event: ref_data.invalidate(event.get("scope")))
+
+# Encoded /reorder responses, keyed by the run they come from, so they stay
+# valid until the next run (see reorder.py)
+reorder_responses = ref_cache.ReferenceCache(ttl=max(config.settings.REORDER_INTERVAL_SECONDS, 60), max_entries=500)
+
+@app.get("/stats/pool")
+async def pool_stats():
+    return get_pool().stats()
+
+@app.get("/stats/replicas")
+async def replica_stats():
+    return get_replicas().stats()
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    pool = get_pool().stats()
+    gauges = {f"db_pool_{k}": v for k, v in pool.items() if isinstance(v, (int, float))}
+    return Response(content=instrumentation.metrics.render(gauges), media_type="text/plain; version=0.0.4")
+
+def _query_rows(sql, params=None, get_conn=get_db_conn):
+    with get_conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute(sql, params)
+            return cur.fetchall()
+
+def json_page(body, next_cursor):
+    # Pre-encoded list page; the next page's cursor goes in X-Next-Cursor
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else None
+    return Response(content=body, media_type="application/json", headers=headers)
+
+def cached_response(request: Request, key, loader, cache=None):
+    """Serve reference data from ref_data (or `cache`), answering 304 when the client's copy is current."""
+    entry = (cache or ref_data).get(key, loader)
+    if entry.not_modified(request.headers.get("if-none-match"), request.headers.get("if-modified-since")):
+        return Response(status_code=304, headers=entry.headers())
+    return Response(content=entry.body, media_type="application/json", headers=entry.headers())
+
 @app.get("/search")
-async def search_shops(name: str):
+def search_shops(request: Request, name: str, limit: int = Query(20, ge=1, le=100)):
     # 1. Validation
     if not name or len(name.strip()) < 2:
         raise HTTPException(status_code=400, detail="Search term too short")
 
-    query = "SELECT id, name FROM shops WHERE name ILIKE %s"
-    
-    conn = None
-    try:
-        # 2. Get the connection
-        conn = get_db_conn()
-        # 3. Use the cursor within the connection context
-        with conn.cursor() as cur:
-            logger.info(f"Searching for: {name}")
-            cur.execute(query, (f"%{name}%",))
-            
-            # Since you are using RealDictCursor, cur.fetchall() 
-            # already returns a list of dictionaries!
-            results = cur.fetchall()
-            
-            return {"results": results, "count": len(results)}
+    def load():
+        # 2. Borrow a pooled connection (a replica's when one is healthy); it
+        # goes back to the pool on exit, which keeps us well under the
+        # Supabase connection limit
+        with get_read_conn() as conn:
+            with conn.cursor() as cur:
+                logger.info(f"Searching for: {name}")
+                # Trigram-indexed, ranked and typo tolerant (see search.py)
+                results = search.search_shops(cur, name, limit, config.settings.SEARCH_SIMILARITY)
+                return {"results": results, "count": len(results)}
 
+    try:
+        return cached_response(request, ("shops", name.strip().lower(), limit), load)
     except Exception as e:
         logger.error(f"Database error during search: {e}")
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
-    
-    finally:
-        # 4. CRITICAL: Always close the connection on Render
-        # to prevent "Too many connections" errors in Supabase
-        if conn:
-            conn.close()
 
-@app.get("/inventory/{shop_id}")
-async def get_inventory(shop_id: str):
+@app.get("/search/products/{shop_id}")
+def search_products(shop_id: str, q: str, limit: int = Query(20, ge=1, le=100)):
+    # Matches item_code, vendor_name and category name
+    if not q or len(q.strip()) < 2:
+        raise HTTPException(status_code=400, detail="Search term too short")
+
+    try:
+        with get_read_conn() as conn:
+            with conn.cursor() as cur:
+                results = search.search_products(cur, shop_id, q, limit, config.settings.SEARCH_SIMILARITY)
+                return {"results": results, "count": len(results)}
+    except Exception as e:
+        logger.error(f"Database error during product search: {e}")
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+# Declared before /inventory/{shop_id} so "changes" is not taken for a shop id
+@app.get("/inventory/changes")
+def get_inventory_changes(
+    shop_id: str,
+    since: Optional[str] = None,
+    limit: int = Query(500, ge=1, le=5000),
+):
+    # Products inserted/updated or whose stock moved since the sync token, plus ids
+    # deleted since then.
+    # Omit `since` for the initial full pull; see sync.py for the token contract.
     try:
         with get_db_conn() as conn:
             with conn.cursor() as cur:
-                cur.execute("""
-                    SELECT 
-                        p.id, p.item_code, p.selling_price, p.vendor_name, p.photo_url,
-                        p.qty_display, p.qty_godown, c.name as category_name, p.created_at
-                    FROM products p
-                    LEFT JOIN categories c ON p.category_id = c.id
-                    WHERE p.shop_id = %s
-                    ORDER BY p.created_at DESC
-                """, (shop_id,))
-                return cur.fetchall()
+                return sync.fetch_changes(cur, shop_id, since, limit, config.settings.SYNC_OVERLAP_SECONDS)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error fetching inventory changes: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/inventory/{shop_id}")
+def get_inventory(
+    shop_id: str,
+    cursor: Optional[str] = None,
+    limit: int = Query(200, ge=1, le=1000),
+    fields: Optional[str] = None,
+    category_id: Optional[str] = None,
+    stock: Optional[str] = None,
+    low_stock: int = Query(5, ge=0),
+    format: str = Query("json", pattern="^(json|ndjson)$"),
+):
+    # Newest first, one page at a time. The cursor for the next page is sent in
+    # the X-Next-Cursor header so the body stays a plain list of products.
+    try:
+        columns = inventory.parse_fields(fields)
+        if format == "ndjson":
+            # Full pull through a server-side cursor: constant memory on our side
+            sql, params = inventory.build_query(shop_id, columns, category_id, stock, low_stock, cursor,
+                                                money=config.settings.MONEY_FORMAT)
+            return StreamingResponse(streaming.stream_ndjson(sql, params, get_conn=get_read_conn),
+                                     media_type="application/x-ndjson")
+        sql, params = inventory.build_query(shop_id, columns, category_id, stock, low_stock, cursor, limit + 1,
+                                            config.settings.MONEY_FORMAT)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    try:
+        with get_read_conn() as conn:
+            # Tuple rows straight to JSON bytes (see rowjson.py)
+            with conn.cursor(cursor_factory=instrumentation.QueryTupleCursor) as cur:
+                body, next_cursor = rowjson.fetch_page(cur, sql, params, columns, limit)
+        return json_page(body, next_cursor)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -132,35 +354,70 @@ class BasketItem(BaseModel):
     qty: int = 1
 
 @app.post("/basket/add")
-async def add_to_basket(item: BasketItem):
+def add_to_basket(item: BasketItem):
     try:
         with get_db_conn() as conn:
             with conn.cursor() as cur:
-                # 1. Get Product Price
-                cur.execute("SELECT selling_price FROM products WHERE id = %s", (item.product_id,))
-                res = cur.fetchone()
-                if not res: 
-                    raise HTTPException(status_code=404, detail="Product not found")
-                price = res['selling_price']
-
-                # 2. Add or Update the item in the specific basket (order_id)
-                # We use ON CONFLICT to increase quantity if the item is already in the basket
+                # Add or Update the item in the specific basket (order_id), taking the
+                # price straight from products. ON CONFLICT increases the quantity
+                # if the item is already in the basket.
                 cur.execute("""
                     INSERT INTO order_items (order_id, product_id, quantity, unit_price)
-                    VALUES (%s, %s, %s, %s)
+                    SELECT %s, p.id, %s, p.selling_price FROM products p WHERE p.id = %s
                     ON CONFLICT (order_id, product_id) DO UPDATE 
                     SET quantity = order_items.quantity + EXCLUDED.quantity
-                """, (item.order_id, item.product_id, item.qty, price))
+                    RETURNING quantity
+                """, (item.order_id, item.qty, item.product_id))
+                res = cur.fetchone()
+                if not res: 
+                    raise HTTPException(status_code=404, detail="Product not found")
                 # Recalculate after adding new item
-                update_order_total(cur, item.order_id)
+                final_total = update_order_total(cur, item.order_id)
                 conn.commit()
-                return {"status": "success", "message": "Item added to session"}
+                order_history.record(item.order_id, "add", product_id=item.product_id,
+                                     quantity=[res['quantity'] - item.qty, res['quantity']],
+                                     final_total=final_total)
+                return {"status": "success", "message": "Item added to session",
+                        "quantity": res['quantity'], "final_total": final_total}
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error adding to basket: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+class BasketOp(BaseModel):
+    op: Literal["add", "set_qty", "remove"]
+    product_id: uuid.UUID
+    qty: int = 1
+
+class BasketOps(BaseModel):
+    ops: List[BasketOp] = Field(..., min_length=1, max_length=500)
+
+@app.post("/basket/{order_id}/ops")
+def apply_basket_ops(order_id: uuid.UUID, req: BasketOps):
+    # Many scans/taps in one request: applied in order, atomically, with a
+    # single total recalculation. Returns the whole basket.
+    try:
+        with get_db_conn() as conn:
+            with conn.cursor() as cur:
+                result = basket.apply_ops(cur, str(order_id), req.ops, ORDER_TOTAL_SQL)
+                conn.commit()
+                if result["changes"]:
+                    order_history.record(order_id, "ops", changes=result["changes"],
+                                         final_total=result["final_total"])
+                return result
+    except basket.OrderNotFound:
+        raise HTTPException(status_code=404, detail="Order not found")
+    except basket.OrderNotEditable as e:
+        raise HTTPException(status_code=409, detail=f"Order is {e} and can no longer be edited.")
+    except basket.UnknownProducts as e:
+        raise HTTPException(status_code=404, detail={"message": "Product not found", "product_ids": e.product_ids})
+    except Exception as e:
+        logger.error(f"Basket ops error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.get("/basket/{shop_id}")
-async def get_active_basket(shop_id: str):
+def get_active_basket(shop_id: str):
     query_order = """
         SELECT id, status FROM orders 
         WHERE shop_id = %s AND status = 'bucket' 
@@ -186,18 +443,59 @@ async def get_active_basket(shop_id: str):
         return {"error": str(e)}
     
 @app.get("/product/by-code")
-async def get_product_by_code(item_code: str):
-    with get_db_conn() as conn:
-        with conn.cursor() as cur:
-            cur.execute("SELECT * FROM products WHERE item_code = %s", (item_code,))
-            return cur.fetchone() 
+def get_product_by_code(item_code: str, shop_id: Optional[uuid.UUID] = None):
+    if shop_id is None:
+        # Legacy clients that do not send the shop: codes are only unique per shop
+        with get_db_conn() as conn:
+            with conn.cursor() as cur:
+                cur.execute(f"SELECT {product_index.PRODUCT_FIELDS} FROM products WHERE item_code = %s LIMIT 1", (item_code,))
+                return cur.fetchone()
+    return product_codes.lookup(get_db_conn, shop_id, [item_code])[item_code]
+
+class CodeLookup(BaseModel):
+    shop_id: uuid.UUID
+    item_codes: List[str] = Field(..., min_length=1, max_length=1000)
+
+@app.post("/product/by-codes")
+def get_products_by_codes(req: CodeLookup):
+    # Batch lookup for scanner bursts: cached codes never reach the database,
+    # the rest are fetched together in one query
+    try:
+        results = product_codes.lookup(get_db_conn, req.shop_id, list(dict.fromkeys(req.item_codes)))
+        return {
+            "results": results,
+            "missing": [code for code, product in results.items() if product is None],
+        }
+    except Exception as e:
+        logger.error(f"Batch code lookup error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/events/{shop_id}")
+async def shop_events(shop_id: uuid.UUID):
+    # Server-sent events: stock, order status and basket changes for this shop,
+    # so the counters update without re-polling (see live.py for the payloads)
+    if not config.settings.LIVE_EVENTS:
+        raise HTTPException(status_code=404, detail="Live events are disabled.")
+    return StreamingResponse(
+        live.sse_stream(live_events, shop_id, config.settings.SSE_HEARTBEAT_SECONDS),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.get("/stats/live-events")
+async def live_events_stats():
+    return live_events.stats()
+
+@app.get("/stats/product-index")
+async def product_index_stats():
+    return product_codes.stats()
             
 class BasketCreate(BaseModel):
     shop_id: str
     client_name: str
 
 @app.post("/basket/create")
-async def create_basket(req: BasketCreate = Body(...)):
+def create_basket(req: BasketCreate = Body(...)):
     try:
         with get_db_conn() as conn:
             with conn.cursor() as cur:
@@ -227,76 +525,45 @@ async def create_basket(req: BasketCreate = Body(...)):
 
 
 @app.post("/order/finalize")
-async def finalize_order(order_id: str):
+def finalize_order(order_id: str):
     # This logic moves status from 'pi' or 'bucket' to 'sold'
     # and executes the Godown -> Display waterfall deduction directly on the products table.
-    query_items = "SELECT product_id, quantity FROM order_items WHERE order_id = %s"
-    
-    # We use get_db_conn from config.py
-    with get_db_conn() as conn:
-        with conn.cursor() as cur:
-            cur.execute(query_items, (order_id,))
-            items = cur.fetchall()
-            
-            for item in items:
-                # Waterfall Deduction Logic updated for unified 'products' table
-                cur.execute("SELECT qty_godown, qty_display FROM products WHERE id = %s", (item['product_id'],))
-                stock = cur.fetchone()
-                
-                if not stock:
-                    continue
-
-                qty_needed = item['quantity']
-                
-                if stock['qty_godown'] >= qty_needed:
-                    # Deduct entirely from Godown
-                    cur.execute("UPDATE products SET qty_godown = qty_godown - %s WHERE id = %s", 
-                                (qty_needed, item['product_id']))
-                else:
-                    # Deduct what's left in Godown, then the rest from Display
-                    remainder = qty_needed - stock['qty_godown']
-                    cur.execute("UPDATE products SET qty_godown = 0, qty_display = qty_display - %s WHERE id = %s", 
-                                (remainder, item['product_id']))
-            
-            # Finalize the order status
-            cur.execute("UPDATE orders SET status = 'sold', updated_at = NOW() WHERE id = %s", (order_id,))
-            conn.commit()
-            
-    return {"status": "success"}
+    return finalize_sale(order_id)
 
 class PIRequest(BaseModel):
     order_id: str
     discount_percent: float
 
 @app.post("/order/convert-to-pi")
-async def convert_to_pi(req: PIRequest):
+def convert_to_pi(req: PIRequest):
     try:
         with get_db_conn() as conn:
             with conn.cursor() as cur:
-                # 1. Calculate the subtotal from order_items
-                cur.execute("SELECT SUM(total_price) as subtotal FROM order_items WHERE order_id = %s", (req.order_id,))
-                subtotal = cur.fetchone()['subtotal'] or 0
-                
-                # 2. Apply discount
-                final_total = float(subtotal) * (1 - (req.discount_percent / 100))
-                
-                # 3. Update Order status to 'pi' and save totals
+                # Set status 'pi' and the discount, and recompute the total from the
+                # items in the same statement
                 cur.execute("""
-                    UPDATE orders 
-                    SET status = 'pi', 
-                        discount_percent = %s, 
-                        final_total = %s 
-                    WHERE id = %s
-                """, (req.discount_percent, final_total, req.order_id))
-                # Recalculate total with the new discount
-                update_order_total(cur, req.order_id)
+                    UPDATE orders o
+                    SET status = 'pi',
+                        discount_percent = %(discount)s,
+                        final_total = ROUND(COALESCE(s.subtotal, 0) * (1 - %(discount)s::numeric / 100), 2)
+                    FROM (SELECT SUM(total_price) AS subtotal FROM order_items WHERE order_id = %(order_id)s) s
+                    WHERE o.id = %(order_id)s
+                    RETURNING o.final_total
+                """, {"order_id": req.order_id, "discount": req.discount_percent})
+                res = cur.fetchone()
+                if not res:
+                    raise HTTPException(status_code=404, detail="Order not found")
                 conn.commit()
-                return {"status": "success", "final_total": final_total}
+                order_history.record(req.order_id, "pi", discount_percent=req.discount_percent,
+                                     final_total=res['final_total'])
+                return {"status": "success", "final_total": float(res['final_total'])}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/basket/details/{order_id}")
-async def get_basket_details(order_id: str):
+def get_basket_details(order_id: str):
     # CRITICAL: Added oi.product_id to the SELECT statement
     query_items = """
         SELECT 
@@ -327,7 +594,7 @@ async def get_basket_details(order_id: str):
         logger.error(f"Error fetching basket details: {e}")
         raise HTTPException(status_code=500, detail=str(e))
     
-async def get_basket_details(order_id: str):
+def get_basket_details(order_id: str):
     # Query to get items specifically for the requested order/basket
     query_items = """
         SELECT oi.quantity, oi.unit_price, p.item_code, o.discount_percent
@@ -349,25 +616,49 @@ async def get_basket_details(order_id: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/orders/list/{shop_id}")
-async def list_orders(shop_id: str):
-    # This query joins orders with clients to show names in the list
-    query = """
-        SELECT o.id, o.status, o.final_total, o.created_at, o.discount_percent,
-               c.name as client_name
-        FROM orders o
-        LEFT JOIN clients c ON o.client_id = c.id
-        WHERE o.shop_id = %s
-        ORDER BY o.created_at DESC
-    """
+def list_orders(
+    shop_id: str,
+    status: Optional[List[str]] = Query(None),
+    date_from: Optional[datetime.date] = None,
+    date_to: Optional[datetime.date] = None,
+    client: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=500),
+):
+    # This query joins orders with clients to show names in the list.
+    # Newest first, one page at a time; the next page's cursor is sent in the
+    # X-Next-Cursor header.
     try:
-        with get_db_conn() as conn:
-            with conn.cursor() as cur:
-                cur.execute(query, (shop_id,))
-                return cur.fetchall()
+        query, params = orders.build_list_query(shop_id, status, date_from, date_to, client, cursor, limit,
+                                                config.settings.MONEY_FORMAT, config.settings.REPORT_TIMEZONE)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    try:
+        with get_read_conn() as conn:
+            with conn.cursor(cursor_factory=instrumentation.QueryTupleCursor) as cur:
+                body, next_cursor = rowjson.fetch_page(cur, query, params, orders.LIST_COLUMNS, limit)
+        return json_page(body, next_cursor)
     except Exception as e:
         logger.error(f"Error listing orders: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/orders/summary/{shop_id}")
+def orders_summary(
+    shop_id: str,
+    date_from: Optional[datetime.date] = None,
+    date_to: Optional[datetime.date] = None,
+):
+    # Count and total per status for the orders screen header
+    query, params = orders.build_summary_query(shop_id, date_from, date_to, config.settings.REPORT_TIMEZONE)
+    try:
+        with get_read_conn() as conn:
+            with conn.cursor() as cur:
+                cur.execute(query, params)
+                return orders.summary_from_rows(cur.fetchall())
+    except Exception as e:
+        logger.error(f"Error summarizing orders: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 
 class QtyUpdate(BaseModel):
     order_id: str
@@ -375,88 +666,186 @@ class QtyUpdate(BaseModel):
     change: int
 
 @app.post("/order/update-qty")
-async def update_order_item_qty(req: QtyUpdate):
+def update_order_item_qty(req: QtyUpdate):
     try:
         with get_db_conn() as conn:
             with conn.cursor() as cur:
                 # REMOVED manual update of total_price because it is a GENERATED column
+                # Change the quantity, remove the item if it hits 0 and recompute
+                # the total, all in one round trip
                 cur.execute("""
                     UPDATE order_items 
-                    SET quantity = quantity + %s
-                    WHERE order_id = %s AND product_id = %s
-                    RETURNING quantity
-                """, (req.change, req.order_id, req.product_id))
-                
+                    SET quantity = quantity + %(change)s
+                    WHERE order_id = %(order_id)s AND product_id = %(product_id)s;
+                    DELETE FROM order_items
+                    WHERE order_id = %(order_id)s AND product_id = %(product_id)s AND quantity <= 0;
+                """ + ORDER_TOTAL_SQL, {"change": req.change, "order_id": req.order_id, "product_id": req.product_id})
                 res = cur.fetchone()
-                
-                # Logic: Remove item if qty hits 0
-                if res and res['quantity'] <= 0:
-                    cur.execute("DELETE FROM order_items WHERE order_id = %s AND product_id = %s", 
-                                (req.order_id, req.product_id))
-                # Recalculate after adding new item
-                update_order_total(cur, req.order_id)
                 conn.commit()
-                return {"status": "success"}
+                if res:
+                    order_history.record(req.order_id, "update_qty", product_id=req.product_id,
+                                         change=req.change, final_total=res['final_total'])
+                return {"status": "success", "final_total": float(res['final_total']) if res else 0}
     except Exception as e:
         logger.error(f"Update Qty Error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.delete("/order/remove-item")
-async def remove_order_item(order_id: str, product_id: str):
+def remove_order_item(order_id: str, product_id: str):
     try:
         with get_db_conn() as conn:
             with conn.cursor() as cur:
-                cur.execute(
-                    "DELETE FROM order_items WHERE order_id = %s AND product_id = %s",
-                    (order_id, product_id)
-                )
-                # Recalculate after item removal
-                update_order_total(cur, order_id)
+                # Remove the item and recompute the total in one round trip
+                cur.execute("""
+                    DELETE FROM order_items WHERE order_id = %(order_id)s AND product_id = %(product_id)s;
+                """ + ORDER_TOTAL_SQL, {"order_id": order_id, "product_id": product_id})
+                res = cur.fetchone()
                 conn.commit()
-                return {"status": "success"}
+                if res:
+                    order_history.record(order_id, "remove", product_id=product_id,
+                                         final_total=res['final_total'])
+                return {"status": "success", "final_total": float(res['final_total']) if res else 0}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e)) 
     
+@app.get("/order/history/{order_id}")
+def get_order_history(order_id: uuid.UUID, limit: int = Query(500, ge=1, le=5000)):
+    # Negotiation steps in the order they happened. Written behind the
+    # request (see history.py), so the last second or so may not be here yet.
+    try:
+        rows = _query_rows("""
+            SELECT user_id, snapshot, created_at
+            FROM order_history
+            WHERE order_id = %s
+            ORDER BY created_at
+            LIMIT %s
+        """, (str(order_id), limit))
+        return {"order_id": order_id, "history": rows}
+    except Exception as e:
+        logger.error(f"Order history error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/stats/order-history")
+async def order_history_stats():
+    return order_history.stats()
+
 @app.post("/order/finalize-sale")
-async def finalize_sale(order_id: str):
+def finalize_sale(order_id: str):
     try:
         with get_db_conn() as conn:
             with conn.cursor() as cur:
-                cur.execute("SELECT product_id, quantity FROM order_items WHERE order_id = %s", (order_id,))
-                items = cur.fetchall()
-                for item in items:
-                    # Stock deduction logic now targets 'products' table directly
-                    cur.execute("SELECT qty_godown, qty_display FROM products WHERE id = %s", (item['product_id'],))
-                    stock = cur.fetchone()
-                    if stock['qty_godown'] >= item['quantity']:
-                        cur.execute("UPDATE products SET qty_godown = qty_godown - %s WHERE id = %s", (item['quantity'], item['product_id']))
-                    else:
-                        remaining = item['quantity'] - stock['qty_godown']
-                        cur.execute("UPDATE products SET qty_godown = 0, qty_display = qty_display - %s WHERE id = %s", (remaining, item['product_id']))
-                cur.execute("UPDATE orders SET status = 'sold', updated_at = NOW() WHERE id = %s", (order_id,))
+                # One locked, set-based deduction for the whole order (see stock.py)
+                lines = stock.finalize_sale(cur, order_id)
+                # Daily sales rollups move in the same transaction as the sale
+                rollups.record_sale(cur, order_id, config.settings.REPORT_TIMEZONE)
                 conn.commit()
-                return {"status": "success"}
+                return {"status": "success", "lines": lines}
+    except stock.OrderNotOpen:
+        raise HTTPException(status_code=409, detail="Order not found or already finalized.")
+    except stock.InsufficientStock as e:
+        raise HTTPException(status_code=409, detail={"message": "Insufficient stock", "lines": e.lines})
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))   
-    
+        logger.error(f"Finalize sale error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+class StockTransfer(BaseModel):
+    product_id: uuid.UUID
+    qty: int = Field(..., gt=0)
+    to: Literal["display", "godown"]
+    user_id: Optional[uuid.UUID] = None
+    note: Optional[str] = None
+
+@app.post("/stock/transfer")
+def transfer_stock(req: StockTransfer):
+    # Godown <-> display moves are ledger entries too (see stock.py)
+    try:
+        with get_db_conn() as conn:
+            with conn.cursor() as cur:
+                result = stock.transfer(cur, req.product_id, req.qty, req.to, req.user_id, req.note)
+                conn.commit()
+                return result
+    except stock.ProductNotFound:
+        raise HTTPException(status_code=404, detail="Product not found.")
+    except stock.InsufficientStock as e:
+        raise HTTPException(status_code=409, detail={"message": "Insufficient stock", "lines": e.lines})
+    except Exception as e:
+        logger.error(f"Stock transfer error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+class StockRestock(BaseModel):
+    product_id: uuid.UUID
+    godown_qty: int = Field(0, ge=0)
+    display_qty: int = Field(0, ge=0)
+    user_id: Optional[uuid.UUID] = None
+    note: Optional[str] = None
+
+@app.post("/stock/restock")
+def restock(req: StockRestock):
+    if not req.godown_qty and not req.display_qty:
+        raise HTTPException(status_code=400, detail="Nothing to restock.")
+    try:
+        with get_db_conn() as conn:
+            with conn.cursor() as cur:
+                result = stock.restock(cur, req.product_id, req.godown_qty, req.display_qty, req.user_id, req.note)
+                conn.commit()
+                return result
+    except stock.ProductNotFound:
+        raise HTTPException(status_code=404, detail="Product not found.")
+    except Exception as e:
+        logger.error(f"Restock error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/stock/history/{product_id}")
+def stock_history(
+    product_id: uuid.UUID,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+):
+    # Current balance plus the movements behind it, newest first; the next
+    # page's cursor is sent in the X-Next-Cursor header
+    try:
+        with get_db_conn() as conn:
+            with conn.cursor() as cur:
+                product = ledger.balances(cur, [product_id]).get(str(product_id))
+                if product is None:
+                    raise HTTPException(status_code=404, detail="Product not found.")
+                movements, next_cursor = ledger.history(cur, product_id, cursor, limit)
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Stock history error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return {"product": product, "movements": movements}
+
+@app.get("/stats/stock-ledger")
+def stock_ledger_stats():
+    stats = stock_compactor.stats()
+    stats["pending"] = _query_rows("SELECT COUNT(*) AS n FROM stock_movements WHERE NOT compacted")[0]["n"]
+    return stats
+
+# Recomputes orders.final_total from its items and discount in a single
+# statement. Takes %(order_id)s so it can be appended to other statements.
+ORDER_TOTAL_SQL = """
+    UPDATE orders o
+    SET final_total = ROUND(COALESCE(s.subtotal, 0) * (1 - COALESCE(o.discount_percent, 0) / 100), 2)
+    FROM (SELECT SUM(total_price) AS subtotal FROM order_items WHERE order_id = %(order_id)s) s
+    WHERE o.id = %(order_id)s
+    RETURNING o.final_total
+"""
+
 def update_order_total(cur, order_id):
-    """Recalculates and persists the order total based on items and discount."""
-    # 1. Sum up all individual item totals (generated columns)
-    cur.execute("SELECT SUM(total_price) as subtotal FROM order_items WHERE order_id = %s", (order_id,))
+    """Recalculates and persists the order total based on items and discount; returns it."""
+    cur.execute(ORDER_TOTAL_SQL, {"order_id": order_id})
     res = cur.fetchone()
-    subtotal = res['subtotal'] if res and res['subtotal'] else 0
-    
-    # 2. Fetch the current discount percentage for this specific order
-    cur.execute("SELECT discount_percent FROM orders WHERE id = %s", (order_id,))
-    order_res = cur.fetchone()
-    discount = order_res['discount_percent'] if order_res else 0
-    
-    # 3. Calculate final amount and persist it to the orders table
-    final_total = float(subtotal) * (1 - (float(discount) / 100))
-    cur.execute("UPDATE orders SET final_total = %s WHERE id = %s", (final_total, order_id))    
+    return float(res['final_total']) if res else 0
 
 @app.delete("/order/delete/{order_id}")
-async def delete_order(order_id: str):
+def delete_order(order_id: str):
     try:
         with get_db_conn() as conn:
             with conn.cursor() as cur:
@@ -491,31 +880,51 @@ class ProductAdd(BaseModel):
     image_url: str
 
 @app.get("/categories")
-async def get_categories():
+def get_categories(request: Request, shop_id: Optional[uuid.UUID] = None):
+    # Served from the reference cache with ETag / Last-Modified validators
+    if shop_id is None:
+        load = lambda: _query_rows("SELECT id,name FROM categories ORDER BY name ASC", get_conn=get_read_conn)
+    else:
+        load = lambda: _query_rows("SELECT id,name FROM categories WHERE shop_id = %s ORDER BY name ASC",
+                                   (str(shop_id),), get_conn=get_read_conn)
     try:
-        with get_db_conn() as conn:
-            with conn.cursor() as cur:
-                cur.execute("SELECT id,name FROM categories ORDER BY name ASC")
-                return cur.fetchall()
+        return cached_response(request, ("categories", str(shop_id) if shop_id else "*"), load)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))    
 
+@app.post("/cache/invalidate")
+async def invalidate_reference_cache(scope: Optional[str] = Query(None, pattern="^(categories|shops)$")):
+    # Normally done by the reference triggers; for when live events are off
+    ref_data.invalidate(scope)
+    return {"status": "success"}
+
+@app.get("/stats/reference-cache")
+async def reference_cache_stats():
+    return ref_data.stats()
+
 @app.post("/inventory/add")
-async def add_inventory(req: ProductAdd):
+def add_inventory(req: ProductAdd):
     try:
         with get_db_conn() as conn:
             with conn.cursor() as cur:
+                # The opening stock goes into the ledger too, already compacted
                 cur.execute("""
-                    INSERT INTO products (
-                        item_code, category, vendor_name, display_qty, godown_qty, 
-                        cost_price, overhead, unit_price, remark, shop_id, image_url, created_at
-                    ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, NOW())
+                    WITH p AS (
+                        INSERT INTO products (
+                            item_code, category_id, vendor_name, qty_display, qty_godown, 
+                            cost_price, overhead_expense, selling_price, remark, shop_id, photo_url, created_at
+                        ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, NOW())
+                        RETURNING id, shop_id, qty_display, qty_godown
+                    )
+                    INSERT INTO stock_movements (shop_id, product_id, kind, delta_display, delta_godown, compacted)
+                    SELECT shop_id, id, 'opening', COALESCE(qty_display, 0), COALESCE(qty_godown, 0), true FROM p
                 """, (
-                    req.item_code, req.category, req.vendor_name, req.display_qty, 
+                    req.item_code, req.category_id, req.vendor_name, req.display_qty, 
                     req.godown_qty, req.cost_price, req.overhead, req.unit_price, 
                     req.remark, req.shop_id, req.image_url
                 ))
                 conn.commit()
+                product_codes.invalidate(req.shop_id)
                 return {"status": "success"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -536,35 +945,178 @@ class BulkProductAdd(BaseModel):
 
 # 1. Unified Bulk Insert
 @app.post("/inventory/bulk-add")
-async def bulk_add_inventory(items: List[BulkProductAdd]):
+def bulk_add_inventory(items: List[BulkProductAdd]):
+    # Goes through the COPY import pipeline: existing or invalid item codes are
+    # reported per row instead of failing the whole batch
+    try:
+        with get_db_conn() as conn:
+            with conn.cursor() as cur:
+                importer = bulk_import.ProductImporter(cur, on_conflict="skip")
+                importer.load([(n, i.model_dump()) for n, i in enumerate(items, 1)])
+                report = importer.finish()
+                conn.commit()
+                for shop_id in {i.shop_id for i in items}:
+                    product_codes.invalidate(shop_id)
+                report["count"] = report["inserted"]
+                return report
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+# 2. Streamed CSV / NDJSON catalog import
+@app.post("/inventory/import/{shop_id}")
+async def import_inventory(
+    shop_id: str,
+    request: Request,
+    format: Optional[str] = Query(None, pattern="^(csv|ndjson)$"),
+    on_conflict: str = Query("update", pattern="^(update|skip)$"),
+):
+    # The body is staged first (bounded in size and time), so a slow client
+    # never holds a pooled connection; it is then parsed and loaded chunk by
+    # chunk, so a 50k-row file never sits in memory as rows. CSV needs a
+    # header row with the column names.
+    fmt = format or ("ndjson" if "json" in request.headers.get("content-type", "") else "csv")
+    try:
+        uuid.UUID(shop_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid shop_id")
+
+    try:
+        upload = await bulk_import.stage_upload(request.stream(), config.settings.IMPORT_MAX_BYTES,
+                                                config.settings.IMPORT_READ_SECONDS)
+    except bulk_import.UploadLimitError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+
+    try:
+        with upload:
+            ctx = get_db_conn()
+            conn = await run_in_threadpool(ctx.__enter__)
+            try:
+                cur = conn.cursor()
+                importer = await run_in_threadpool(bulk_import.ProductImporter, cur, shop_id, on_conflict)
+                async for rows in bulk_import.iter_upload_rows(bulk_import.iter_file(upload), fmt):
+                    await run_in_threadpool(importer.load, rows)
+                report = await run_in_threadpool(importer.finish)
+            except BaseException:
+                # Rolls back and returns the connection to the pool
+                await run_in_threadpool(ctx.__exit__, *sys.exc_info())
+                raise
+            # Commits and returns the connection to the pool
+            await run_in_threadpool(ctx.__exit__, None, None, None)
+        product_codes.invalidate(shop_id)
+        return report
+    except bulk_import.ImportFormatError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Inventory import failed: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/analytics/{shop_id}")
+def get_analytics(
+    shop_id: str,
+    date_from: datetime.date,
+    date_to: datetime.date,
+    group_by: str = Query("day", pattern="^(day|category|vendor)$"),
+):
+    # Units, revenue, cost, margin and discount for a date range, answered
+    # from the sales_daily rollups rather than by scanning orders
+    if date_to < date_from:
+        raise HTTPException(status_code=400, detail="date_to is before date_from")
+    try:
+        with get_read_conn() as conn:
+            with conn.cursor() as cur:
+                return rollups.analytics(cur, shop_id, date_from, date_to, group_by)
+    except Exception as e:
+        logger.error(f"Analytics error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/reorder/{shop_id}")
+def get_reorder(request: Request, shop_id: uuid.UUID, vendor: Optional[str] = None):
+    # Precomputed by the reorder job: one primary-key lookup for the run's
+    # version, then the encoded response from memory
+    try:
+        with get_read_conn() as conn:
+            with conn.cursor() as cur:
+                version = reorder.run_version(cur, shop_id)
+                if version is None:
+                    raise HTTPException(status_code=404,
+                                        detail="Reorder suggestions have not been computed for this shop yet.")
+                return cached_response(request, ("reorder", str(shop_id), version, vendor),
+                                       lambda: reorder.load(cur, shop_id, vendor), reorder_responses)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Reorder error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/reorder/{shop_id}/refresh")
+def refresh_reorder(shop_id: uuid.UUID):
+    # Recompute now instead of waiting for the next scheduled run
     try:
         with get_db_conn() as conn:
             with conn.cursor() as cur:
-                query = """
-                    INSERT INTO products (
-                        shop_id, category_id, item_code, photo_url, 
-                        cost_price, overhead_expense, selling_price, 
-                        vendor_name, qty_display, qty_godown, created_at
-                    ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, NOW())
-                """
-                values = [
-                    (
-                        i.shop_id, i.category_id, i.item_code, i.image_url, 
-                        i.cost_price, i.overhead, i.unit_price, 
-                        i.vendor_name, i.display_qty, i.godown_qty
-                    ) for i in items
-                ]
-                cur.executemany(query, values)
+                run = reorder.compute_shop(cur, shop_id, config.settings.REORDER_WINDOW_DAYS,
+                                           config.settings.REORDER_LEAD_DAYS, config.settings.REORDER_COVER_DAYS)
                 conn.commit()
-                return {"status": "success", "count": len(items)}
     except Exception as e:
+        logger.error(f"Reorder refresh error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+    if run is None:
+        raise HTTPException(status_code=409, detail="A reorder computation for this shop is already running.")
+    return run
+
+@app.get("/stats/reorder")
+async def reorder_stats():
+    return {"job": reorder_job.stats(), "cache": reorder_responses.stats()}
+
+def export_response(kind, shop_id, date_from, date_to, format):
+    # Streamed in windows of orders through a named cursor (see export.py)
+    if date_to < date_from:
+        raise HTTPException(status_code=400, detail="date_to is before date_from")
+    body = export.stream(get_read_conn, kind, str(shop_id), date_from, date_to, config.settings.REPORT_TIMEZONE,
+                         format, config.settings.MONEY_FORMAT)
+    media_type = "text/csv; charset=utf-8" if format == "csv" else "application/x-ndjson"
+    filename = f"{kind}_{shop_id}_{date_from}_{date_to}.{format}"
+    return StreamingResponse(body, media_type=media_type,
+                             headers={"Content-Disposition": f'attachment; filename="{filename}"'})
+
+@app.get("/export/{shop_id}/sales")
+def export_sales(
+    shop_id: uuid.UUID,
+    date_from: datetime.date,
+    date_to: datetime.date,
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+):
+    # Sold orders by sold_at (report time zone), one row per line
+    return export_response("sales", shop_id, date_from, date_to, format)
+
+@app.get("/export/{shop_id}/pi")
+def export_pi(
+    shop_id: uuid.UUID,
+    date_from: datetime.date,
+    date_to: datetime.date,
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+):
+    # Open PIs by created_at, one row per line
+    return export_response("pi", shop_id, date_from, date_to, format)
 
 # 4. Mount the frontend LAST
 # This is a "catch-all". If you put it at the top, it might block your API routes.
 mimetypes.add_type('application/javascript', '.js')
 mimetypes.add_type('application/manifest+json', '.json')
-# app.mount("/", StaticFiles(directory="../frontend", html=True), name="frontend")        
+# Read and precompressed once at startup, assets under content-hashed names (see frontend_assets.py)
+frontend = frontend_assets.FrontendAssets(
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), config.settings.FRONTEND_DIR))
+
+@app.on_event("startup")
+def load_frontend():
+    if config.settings.SERVE_FRONTEND:
+        frontend.load()
+
+@app.get("/stats/frontend")
+async def frontend_stats():
+    return frontend.stats()
+
+app.mount("/", frontend, name="frontend")
 
 
 
@@ -0,0 +1,19 @@
+-- Schema that the live database has but data-create.sql does not describe:
+-- the order_items table and the stock columns main.py reads from products.
+-- Idempotent, so it is safe to run against the existing database too.
+
+CREATE EXTENSION IF NOT EXISTS "uuid-ossp";
+
+ALTER TABLE products ADD COLUMN IF NOT EXISTS qty_display INT DEFAULT 0;
+ALTER TABLE products ADD COLUMN IF NOT EXISTS qty_godown INT DEFAULT 0;
+
+CREATE TABLE IF NOT EXISTS order_items (
+  id UUID DEFAULT uuid_generate_v4() PRIMARY KEY,
+  order_id UUID NOT NULL REFERENCES orders(id) ON DELETE CASCADE,
+  product_id UUID REFERENCES products(id) ON DELETE SET NULL,
+  quantity INT NOT NULL DEFAULT 1,
+  unit_price NUMERIC(12, 2) NOT NULL DEFAULT 0,
+  total_price NUMERIC(12, 2) GENERATED ALWAYS AS (quantity * unit_price) STORED,
+  created_at TIMESTAMPTZ DEFAULT NOW(),
+  UNIQUE(order_id, product_id)
+);
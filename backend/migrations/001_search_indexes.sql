@@ -0,0 +1,23 @@
+-- Trigram indexes backing /search and /search/products/{shop_id}.
+-- They serve both the fuzzy word-similarity operator (<%) and ILIKE '%term%',
+-- so neither needs a sequential scan.
+-- CONCURRENTLY cannot run inside a transaction: run this file statement by
+-- statement (e.g. psql without --single-transaction).
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS shops_name_trgm_idx
+    ON shops USING gin (name gin_trgm_ops);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS categories_name_trgm_idx
+    ON categories USING gin (name gin_trgm_ops);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS products_item_code_trgm_idx
+    ON products USING gin (item_code gin_trgm_ops);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS products_vendor_name_trgm_idx
+    ON products USING gin (vendor_name gin_trgm_ops);
+
+-- Category matches are resolved to products through this one
+CREATE INDEX CONCURRENTLY IF NOT EXISTS products_category_id_idx
+    ON products (category_id);
@@ -0,0 +1,4 @@
+-- Keyset pagination for /inventory/{shop_id}: ORDER BY created_at DESC, id DESC
+-- within a shop reads straight off this index.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS products_shop_created_idx
+    ON products (shop_id, created_at DESC, id DESC);
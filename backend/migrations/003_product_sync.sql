@@ -0,0 +1,29 @@
+-- Delta sync for /inventory/changes.
+-- products.updated_at is already maintained by update_products_modtime (and
+-- defaults to NOW() on insert); deletions leave a tombstone behind.
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS products_shop_updated_idx
+    ON products (shop_id, updated_at, id);
+
+CREATE TABLE IF NOT EXISTS product_tombstones (
+  product_id UUID PRIMARY KEY,
+  shop_id UUID NOT NULL,
+  deleted_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS product_tombstones_shop_deleted_idx
+    ON product_tombstones (shop_id, deleted_at);
+
+CREATE OR REPLACE FUNCTION record_product_tombstone()
+RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO product_tombstones (product_id, shop_id)
+    VALUES (OLD.id, OLD.shop_id)
+    ON CONFLICT (product_id) DO UPDATE SET deleted_at = NOW();
+    RETURN OLD;
+END;
+$$ LANGUAGE 'plpgsql';
+
+DROP TRIGGER IF EXISTS products_tombstone ON products;
+CREATE TRIGGER products_tombstone AFTER DELETE ON products
+    FOR EACH ROW EXECUTE PROCEDURE record_product_tombstone();
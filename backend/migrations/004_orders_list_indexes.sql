@@ -0,0 +1,13 @@
+-- /orders/list and /orders/summary.
+-- Status-filtered pages and the per-status summary read this index; the
+-- INCLUDE lets the summary be an index-only scan.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS orders_shop_status_created_idx
+    ON orders (shop_id, status, created_at DESC, id DESC) INCLUDE (final_total);
+
+-- Unfiltered pages (all statuses), newest first
+CREATE INDEX CONCURRENTLY IF NOT EXISTS orders_shop_created_idx
+    ON orders (shop_id, created_at DESC, id DESC);
+
+-- Client-name search (ILIKE '%name%'); pg_trgm comes from 001
+CREATE INDEX CONCURRENTLY IF NOT EXISTS clients_name_trgm_idx
+    ON clients USING gin (name gin_trgm_ops);
@@ -0,0 +1,36 @@
+-- Daily sales rollups behind /analytics/{shop_id}.
+-- Filled incrementally by /order/finalize-sale and by `python rollups.py backfill`.
+
+-- When the order was sold; updated_at moves on any later edit so it cannot
+-- be used to place a sale on a day
+ALTER TABLE orders ADD COLUMN IF NOT EXISTS sold_at TIMESTAMPTZ;
+UPDATE orders SET sold_at = updated_at WHERE status = 'sold' AND sold_at IS NULL;
+
+CREATE TABLE IF NOT EXISTS sales_daily (
+  shop_id UUID NOT NULL REFERENCES shops(id) ON DELETE CASCADE,
+  day DATE NOT NULL,
+  -- Uncategorized sales use the nil UUID; no FK so deleting a category keeps history
+  category_id UUID NOT NULL,
+  vendor_name TEXT NOT NULL DEFAULT '',
+  units BIGINT NOT NULL DEFAULT 0,
+  gross NUMERIC(14, 2) NOT NULL DEFAULT 0,     -- line totals before the order discount
+  discount NUMERIC(14, 2) NOT NULL DEFAULT 0,  -- discount given
+  revenue NUMERIC(14, 2) NOT NULL DEFAULT 0,   -- gross - discount
+  cost NUMERIC(14, 2) NOT NULL DEFAULT 0,      -- units * (cost_price + overhead_expense)
+  updated_at TIMESTAMPTZ DEFAULT NOW(),
+  PRIMARY KEY (shop_id, day, category_id, vendor_name)
+);
+
+-- Orders already counted in sales_daily, so live updates and backfills never double count
+CREATE TABLE IF NOT EXISTS sales_rollup_orders (
+  order_id UUID PRIMARY KEY REFERENCES orders(id) ON DELETE CASCADE,
+  shop_id UUID NOT NULL,
+  day DATE NOT NULL,
+  rolled_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS sales_rollup_orders_shop_day_idx
+    ON sales_rollup_orders (shop_id, day);
+
+CREATE INDEX IF NOT EXISTS orders_shop_sold_at_idx
+    ON orders (shop_id, sold_at) WHERE status = 'sold';
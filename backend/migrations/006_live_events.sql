@@ -0,0 +1,79 @@
+-- Push channel for GET /events/{shop_id} (see live.py).
+-- Stock changes, order status changes and basket edits are announced on the
+-- shop_events channel as JSON. NOTIFY is delivered at commit, and identical
+-- payloads raised in one transaction are delivered once.
+
+CREATE OR REPLACE FUNCTION notify_stock_change()
+RETURNS TRIGGER AS $$
+DECLARE
+    r RECORD;
+BEGIN
+    FOR r IN
+        SELECT n.shop_id, COUNT(*) AS changed,
+               json_agg(json_build_object('id', n.id, 'qty_display', n.qty_display,
+                                          'qty_godown', n.qty_godown)) AS products
+        FROM new_rows n
+        JOIN old_rows o ON o.id = n.id
+        WHERE n.qty_display IS DISTINCT FROM o.qty_display
+           OR n.qty_godown IS DISTINCT FROM o.qty_godown
+        GROUP BY n.shop_id
+    LOOP
+        -- Payloads are capped at 8000 bytes: large batches (imports) only say "reload"
+        IF r.changed <= 50 THEN
+            PERFORM pg_notify('shop_events', json_build_object(
+                'type', 'stock', 'shop_id', r.shop_id, 'products', r.products)::text);
+        ELSE
+            PERFORM pg_notify('shop_events', json_build_object(
+                'type', 'stock', 'shop_id', r.shop_id, 'bulk', true)::text);
+        END IF;
+    END LOOP;
+    RETURN NULL;
+END;
+$$ LANGUAGE 'plpgsql';
+
+-- Statement level, so a finalize or an import sends one message per shop
+DROP TRIGGER IF EXISTS products_notify_stock ON products;
+CREATE TRIGGER products_notify_stock AFTER UPDATE ON products
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE PROCEDURE notify_stock_change();
+
+CREATE OR REPLACE FUNCTION notify_order_change()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        PERFORM pg_notify('shop_events', json_build_object(
+            'type', 'order', 'shop_id', OLD.shop_id, 'order_id', OLD.id, 'status', 'deleted')::text);
+    ELSIF TG_OP = 'INSERT' OR NEW.status IS DISTINCT FROM OLD.status THEN
+        PERFORM pg_notify('shop_events', json_build_object(
+            'type', 'order', 'shop_id', NEW.shop_id, 'order_id', NEW.id, 'status', NEW.status)::text);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE 'plpgsql';
+
+DROP TRIGGER IF EXISTS orders_notify ON orders;
+CREATE TRIGGER orders_notify AFTER INSERT OR UPDATE OF status OR DELETE ON orders
+    FOR EACH ROW EXECUTE PROCEDURE notify_order_change();
+
+CREATE OR REPLACE FUNCTION notify_basket_change()
+RETURNS TRIGGER AS $$
+DECLARE
+    changed_order UUID;
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        changed_order := OLD.order_id;
+    ELSE
+        changed_order := NEW.order_id;
+    END IF;
+    -- Same payload for every line of the order, so a batch of edits is one message
+    PERFORM pg_notify('shop_events', json_build_object(
+        'type', 'basket', 'shop_id', o.shop_id, 'order_id', o.id)::text)
+    FROM orders o
+    WHERE o.id = changed_order;
+    RETURN NULL;
+END;
+$$ LANGUAGE 'plpgsql';
+
+DROP TRIGGER IF EXISTS order_items_notify ON order_items;
+CREATE TRIGGER order_items_notify AFTER INSERT OR UPDATE OR DELETE ON order_items
+    FOR EACH ROW EXECUTE PROCEDURE notify_basket_change();
@@ -0,0 +1,111 @@
+-- Append-only stock movement ledger (see ledger.py and stock.py).
+-- Sales, godown/display transfers, restocks and import adjustments each add
+-- a row; nothing updates products.qty_* on the hot path any more. Those
+-- columns are now the compacted snapshot: balance = snapshot + the deltas
+-- of movements not yet compacted. `python ledger.py compact` (also run
+-- periodically by the app) folds movements into the snapshot.
+
+CREATE TABLE IF NOT EXISTS stock_movements (
+  id BIGSERIAL PRIMARY KEY,
+  shop_id UUID NOT NULL REFERENCES shops(id) ON DELETE CASCADE,
+  product_id UUID NOT NULL REFERENCES products(id) ON DELETE CASCADE,
+  kind TEXT NOT NULL CHECK (kind IN ('opening', 'sale', 'transfer', 'restock', 'adjust')),
+  delta_display INT NOT NULL DEFAULT 0,
+  delta_godown INT NOT NULL DEFAULT 0,
+  order_id UUID REFERENCES orders(id) ON DELETE SET NULL,
+  user_id UUID REFERENCES auth.users(id),  -- who moved the stock, when known
+  note TEXT,
+  -- Already included in products.qty_*; the only column ever updated
+  compacted BOOLEAN NOT NULL DEFAULT false,
+  created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+-- Pending deltas per product, read by every balance (index-only)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS stock_movements_pending_idx
+    ON stock_movements (product_id) INCLUDE (delta_display, delta_godown)
+    WHERE NOT compacted;
+
+-- Compaction picks the oldest pending movements
+CREATE INDEX CONCURRENTLY IF NOT EXISTS stock_movements_uncompacted_idx
+    ON stock_movements (id) WHERE NOT compacted;
+
+-- GET /stock/history/{product_id}
+CREATE INDEX CONCURRENTLY IF NOT EXISTS stock_movements_product_idx
+    ON stock_movements (product_id, id);
+
+-- Opening balance for products that existed before the ledger
+INSERT INTO stock_movements (shop_id, product_id, kind, delta_display, delta_godown, note, compacted)
+SELECT p.shop_id, p.id, 'opening', COALESCE(p.qty_display, 0), COALESCE(p.qty_godown, 0), 'ledger start', true
+FROM products p
+WHERE p.shop_id IS NOT NULL
+  AND NOT EXISTS (SELECT 1 FROM stock_movements m WHERE m.product_id = p.id);
+
+-- Live events: stock changes now come from movements, with the live balance
+CREATE OR REPLACE FUNCTION notify_stock_movement()
+RETURNS TRIGGER AS $$
+DECLARE
+    r RECORD;
+BEGIN
+    FOR r IN
+        SELECT p.shop_id, COUNT(*) AS changed,
+               json_agg(json_build_object(
+                   'id', p.id,
+                   'qty_display', COALESCE(p.qty_display, 0) + d.qty_display,
+                   'qty_godown', COALESCE(p.qty_godown, 0) + d.qty_godown)) AS products
+        FROM products p
+        CROSS JOIN LATERAL (
+            SELECT COALESCE(SUM(m.delta_display), 0) AS qty_display,
+                   COALESCE(SUM(m.delta_godown), 0) AS qty_godown
+            FROM stock_movements m
+            WHERE m.product_id = p.id AND NOT m.compacted
+        ) d
+        WHERE p.id IN (SELECT product_id FROM new_rows WHERE NOT compacted)
+        GROUP BY p.shop_id
+    LOOP
+        IF r.changed <= 50 THEN
+            PERFORM pg_notify('shop_events', json_build_object(
+                'type', 'stock', 'shop_id', r.shop_id, 'products', r.products)::text);
+        ELSE
+            PERFORM pg_notify('shop_events', json_build_object(
+                'type', 'stock', 'shop_id', r.shop_id, 'bulk', true)::text);
+        END IF;
+    END LOOP;
+    RETURN NULL;
+END;
+$$ LANGUAGE 'plpgsql';
+
+DROP TRIGGER IF EXISTS stock_movements_notify ON stock_movements;
+CREATE TRIGGER stock_movements_notify AFTER INSERT ON stock_movements
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE PROCEDURE notify_stock_movement();
+
+-- Compaction rewrites products.qty_* without changing any balance: stay quiet
+CREATE OR REPLACE FUNCTION notify_stock_change()
+RETURNS TRIGGER AS $$
+DECLARE
+    r RECORD;
+BEGIN
+    IF current_setting('invt.stock_compaction', true) = 'on' THEN
+        RETURN NULL;
+    END IF;
+    FOR r IN
+        SELECT n.shop_id, COUNT(*) AS changed,
+               json_agg(json_build_object('id', n.id, 'qty_display', n.qty_display,
+                                          'qty_godown', n.qty_godown)) AS products
+        FROM new_rows n
+        JOIN old_rows o ON o.id = n.id
+        WHERE n.qty_display IS DISTINCT FROM o.qty_display
+           OR n.qty_godown IS DISTINCT FROM o.qty_godown
+        GROUP BY n.shop_id
+    LOOP
+        IF r.changed <= 50 THEN
+            PERFORM pg_notify('shop_events', json_build_object(
+                'type', 'stock', 'shop_id', r.shop_id, 'products', r.products)::text);
+        ELSE
+            PERFORM pg_notify('shop_events', json_build_object(
+                'type', 'stock', 'shop_id', r.shop_id, 'bulk', true)::text);
+        END IF;
+    END LOOP;
+    RETURN NULL;
+END;
+$$ LANGUAGE 'plpgsql';
@@ -0,0 +1,6 @@
+-- Negotiation history written behind the basket endpoints (see history.py).
+-- One row per basket change / PI conversion; GET /order/history/{order_id}
+-- reads an order's rows in time order, and ON DELETE CASCADE from orders
+-- uses the same index.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS order_history_order_created_idx
+    ON order_history (order_id, created_at);
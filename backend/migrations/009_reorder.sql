@@ -0,0 +1,31 @@
+-- Precomputed reorder suggestions (see reorder.py). A periodic batch replaces
+-- a shop's rows in one transaction; GET /reorder/{shop_id} only reads them.
+
+CREATE TABLE IF NOT EXISTS reorder_suggestions (
+  shop_id UUID NOT NULL REFERENCES shops(id) ON DELETE CASCADE,
+  product_id UUID NOT NULL REFERENCES products(id) ON DELETE CASCADE,
+  vendor_name TEXT,
+  item_code TEXT NOT NULL,
+  units_sold INT NOT NULL,             -- over the run's window
+  velocity NUMERIC(12, 3) NOT NULL,    -- units sold per day
+  on_hand INT NOT NULL,                -- godown + display when computed
+  days_of_cover NUMERIC(12, 1),        -- NULL when nothing sold in the window
+  suggested_qty INT NOT NULL,
+  PRIMARY KEY (shop_id, product_id)
+);
+
+-- One shop's suggestions by vendor, most urgent first
+CREATE INDEX CONCURRENTLY IF NOT EXISTS reorder_suggestions_vendor_idx
+    ON reorder_suggestions (shop_id, vendor_name, days_of_cover);
+
+-- Last completed run per shop; its computed_at versions the cached response
+CREATE TABLE IF NOT EXISTS reorder_runs (
+  shop_id UUID PRIMARY KEY REFERENCES shops(id) ON DELETE CASCADE,
+  computed_at TIMESTAMPTZ NOT NULL,
+  window_days INT NOT NULL,
+  lead_days INT NOT NULL,
+  cover_days INT NOT NULL,
+  products INT NOT NULL,
+  suggestions INT NOT NULL,
+  seconds NUMERIC(10, 3)
+);
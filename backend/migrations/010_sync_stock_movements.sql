@@ -0,0 +1,6 @@
+-- /inventory/changes also reports products whose stock moved (see sync.py):
+-- movements never touch products.updated_at, so the sync query reads the
+-- shop's recent movements alongside the products index.
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS stock_movements_shop_created_idx
+    ON stock_movements (shop_id, created_at) INCLUDE (product_id);
@@ -0,0 +1,20 @@
+-- Categories and shops are edited outside the API (e.g. the Supabase
+-- dashboard). Every write announces itself on shop_events so each worker
+-- drops its cached copy (ref_cache.py, wired up in main.py) right away
+-- instead of serving it until REF_CACHE_TTL runs out.
+
+CREATE OR REPLACE FUNCTION notify_reference_change()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM pg_notify('shop_events', json_build_object('type', 'reference', 'scope', TG_ARGV[0])::text);
+    RETURN NULL;
+END;
+$$ LANGUAGE 'plpgsql';
+
+DROP TRIGGER IF EXISTS categories_notify_reference ON categories;
+CREATE TRIGGER categories_notify_reference AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON categories
+    FOR EACH STATEMENT EXECUTE PROCEDURE notify_reference_change('categories');
+
+DROP TRIGGER IF EXISTS shops_notify_reference ON shops;
+CREATE TRIGGER shops_notify_reference AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON shops
+    FOR EACH STATEMENT EXECUTE PROCEDURE notify_reference_change('shops');
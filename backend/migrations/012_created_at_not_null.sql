@@ -0,0 +1,10 @@
+-- Keyset pages of /inventory/{shop_id} and /orders/list are keyed on
+-- (created_at, id) and the cursor carries created_at (paging.py), so the
+-- column must never be NULL. Rows inserted with an explicit NULL get their
+-- updated_at (or the epoch) and the column becomes NOT NULL.
+
+UPDATE products SET created_at = COALESCE(updated_at, 'epoch') WHERE created_at IS NULL;
+ALTER TABLE products ALTER COLUMN created_at SET DEFAULT NOW(), ALTER COLUMN created_at SET NOT NULL;
+
+UPDATE orders SET created_at = COALESCE(updated_at, 'epoch') WHERE created_at IS NULL;
+ALTER TABLE orders ALTER COLUMN created_at SET DEFAULT NOW(), ALTER COLUMN created_at SET NOT NULL;
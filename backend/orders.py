@@ -0,0 +1,82 @@
+"""Query building for the paginated /orders/list and /orders/summary endpoints."""
+from paging import decode_cursor
+from rowjson import money_sql, number_sql
+
+STATUSES = ("bucket", "pi", "sold", "cancelled")
+
+# Column order of build_list_query's rows
+LIST_COLUMNS = ("id", "status", "final_total", "created_at", "discount_percent", "client_name")
+
+
+def _filters(shop_id, statuses=None, date_from=None, date_to=None, tz="UTC"):
+    where = ["o.shop_id = %(shop_id)s"]
+    params = {"shop_id": shop_id, "tz": tz}
+    if statuses:
+        unknown = [s for s in statuses if s not in STATUSES]
+        if unknown:
+            raise ValueError(f"Unknown status: {', '.join(unknown)}")
+        where.append("o.status = ANY(%(statuses)s)")
+        params["statuses"] = list(statuses)
+    # Days are the report time zone's, as in rollups, analytics and exports
+    if date_from:
+        where.append("o.created_at >= (%(date_from)s::date)::timestamp AT TIME ZONE %(tz)s")
+        params["date_from"] = date_from
+    if date_to:
+        # date_to is inclusive of the whole day
+        where.append("o.created_at < (%(date_to)s::date + 1)::timestamp AT TIME ZONE %(tz)s")
+        params["date_to"] = date_to
+    return where, params
+
+
+def build_list_query(shop_id, statuses=None, date_from=None, date_to=None, client=None, cursor=None, limit=50,
+                     money="float", tz="UTC"):
+    """Return (sql, params) for one page of a shop's orders, newest first.
+
+    Pages are keyed on (created_at, id) so they come straight off the
+    orders(shop_id, status, created_at, id) / orders(shop_id, created_at, id)
+    indexes; `limit + 1` rows are fetched to detect a following page.
+    Columns are LIST_COLUMNS, final_total rendered as `money`; dates are
+    days in the `tz` time zone.
+    """
+    where, params = _filters(shop_id, statuses, date_from, date_to, tz)
+    if client:
+        escaped = client.strip().replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        where.append("c.name ILIKE %(client)s")
+        params["client"] = f"%{escaped}%"
+    if cursor:
+        created_at, last_id = decode_cursor(cursor, 2)
+        where.append("(o.created_at, o.id) < (%(cursor_ts)s::timestamptz, %(cursor_id)s::uuid)")
+        params["cursor_ts"] = created_at
+        params["cursor_id"] = last_id
+    params["limit"] = limit + 1
+    sql = f"""
+        SELECT o.id, o.status, {money_sql("o.final_total", money)} AS final_total, o.created_at,
+               {number_sql("o.discount_percent")} AS discount_percent, c.name as client_name
+        FROM orders o
+        LEFT JOIN clients c ON o.client_id = c.id
+        WHERE {' AND '.join(where)}
+        ORDER BY o.created_at DESC, o.id DESC
+        LIMIT %(limit)s
+    """
+    return sql, params
+
+
+def build_summary_query(shop_id, date_from=None, date_to=None, tz="UTC"):
+    """Count and total per status; an index-only scan of orders_shop_status_created_idx."""
+    where, params = _filters(shop_id, None, date_from, date_to, tz)
+    sql = f"""
+        SELECT o.status, COUNT(*) AS count, COALESCE(SUM(o.final_total), 0) AS total
+        FROM orders o
+        WHERE {' AND '.join(where)}
+        GROUP BY o.status
+    """
+    return sql, params
+
+
+def summary_from_rows(rows):
+    by_status = {r["status"]: r for r in rows}
+    return [
+        {"status": s, "count": by_status[s]["count"] if s in by_status else 0,
+         "total": by_status[s]["total"] if s in by_status else 0}
+        for s in STATUSES
+    ]
@@ -0,0 +1,35 @@
+"""Opaque keyset cursors for paginated list endpoints."""
+import base64
+import json
+
+
+def encode_cursor(*values):
+    """Pack the sort key of the last row returned into an opaque token."""
+    raw = json.dumps([str(v) for v in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token, size):
+    """Unpack a token from encode_cursor; raises ValueError if it is malformed."""
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if not isinstance(values, list) or len(values) != size:
+        raise ValueError("Invalid cursor")
+    return values
+
+
+def paginate(rows, limit):
+    """Split a `limit + 1` row fetch ordered by (created_at, id) into (page, next_cursor).
+
+    created_at is NOT NULL on the paged tables (migrations/012_created_at_not_null.sql).
+
+    next_cursor is None when this was the last page.
+    """
+    if len(rows) <= limit:
+        return rows, None
+    page = rows[:limit]
+    last = page[-1]
+    return page, encode_cursor(last["created_at"].isoformat(), last["id"])
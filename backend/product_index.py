@@ -0,0 +1,110 @@
+"""In-process item_code -> product index for barcode lookups.
+
+Entries are keyed by (shop_id, item_code), filled lazily from the database
+in batches, evicted least-recently-used beyond `max_entries` and expire after
+`ttl` seconds (covering writes made by other workers). Writes in this process
+call invalidate(shop_id), which bumps the shop's generation so every entry
+cached for it is treated as a miss.
+
+Only catalog fields are cached, not stock counts or cost price, so sales do
+not need to invalidate anything.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+PRODUCT_FIELDS = "id, item_code, selling_price, vendor_name, photo_url, category_id"
+
+_MISSING = object()
+
+
+class ProductCodeIndex:
+    def __init__(self, max_entries=50000, ttl=300):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()    # (shop_id, code) -> (generation, loaded_at, product or None)
+        self._generations = {}           # shop_id -> int
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._loads = 0
+        self._evictions = 0
+        self._invalidations = 0
+
+    def _get(self, shop_id, code, now):
+        key = (shop_id, code)
+        entry = self._entries.get(key)
+        if entry is None:
+            return _MISSING
+        generation, loaded_at, product = entry
+        if generation != self._generations.get(shop_id, 0) or now - loaded_at > self.ttl:
+            del self._entries[key]
+            return _MISSING
+        self._entries.move_to_end(key)
+        return product
+
+    def lookup(self, get_conn, shop_id, codes):
+        """Return {code: product dict or None} for every code, loading misses in one query.
+
+        A connection is borrowed from `get_conn` only when something missed.
+        """
+        shop_id = str(shop_id)
+        now = time.monotonic()
+        found, missing = {}, []
+        with self._lock:
+            for code in codes:
+                product = self._get(shop_id, code, now)
+                if product is _MISSING:
+                    missing.append(code)
+                else:
+                    found[code] = product
+            self._hits += len(found)
+            self._misses += len(missing)
+            generation = self._generations.get(shop_id, 0)
+
+        if missing:
+            with get_conn() as conn:
+                with conn.cursor() as cur:
+                    cur.execute(f"""
+                        SELECT {PRODUCT_FIELDS} FROM products
+                        WHERE shop_id = %s AND item_code = ANY(%s)
+                    """, (shop_id, missing))
+                    loaded = {r["item_code"]: dict(r) for r in cur.fetchall()}
+            with self._lock:
+                self._loads += 1
+                for code in missing:
+                    # Codes that do not exist are cached too (as None), so a
+                    # scanner repeating an unknown label stays off the database
+                    product = loaded.get(code)
+                    found[code] = product
+                    self._entries[(shop_id, code)] = (generation, now, product)
+                    self._entries.move_to_end((shop_id, code))
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                    self._evictions += 1
+        return found
+
+    def invalidate(self, shop_id=None):
+        """Drop cached products of one shop (or of every shop)."""
+        with self._lock:
+            self._invalidations += 1
+            if shop_id is None:
+                self._entries.clear()
+                self._generations.clear()
+            else:
+                shop_id = str(shop_id)
+                self._generations[shop_id] = self._generations.get(shop_id, 0) + 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / lookups, 4) if lookups else 0.0,
+                "loads": self._loads,
+                "evictions": self._evictions,
+                "invalidations": self._invalidations,
+            }
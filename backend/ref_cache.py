@@ -0,0 +1,106 @@
+"""Cache for small, rarely-changing reference data (categories, shop lookups).
+
+Values are stored already serialized, together with an ETag and
+Last-Modified, so a hit costs no database work and no JSON encoding, and
+clients that revalidate get a 304. Writes to categories and shops (made
+outside the API, e.g. in the Supabase dashboard) raise a "reference" event
+that calls invalidate() in every worker (see live.py); entries also expire
+after `ttl` seconds, for when that event is missed.
+"""
+import datetime
+import hashlib
+import json
+import threading
+import time
+from email.utils import format_datetime, parsedate_to_datetime
+
+from rowjson import json_default
+
+
+class CachedValue:
+    __slots__ = ("body", "etag", "last_modified", "loaded_at")
+
+    def __init__(self, body, etag, last_modified, loaded_at):
+        self.body = body
+        self.etag = etag
+        self.last_modified = last_modified
+        self.loaded_at = loaded_at
+
+    def headers(self):
+        return {
+            "ETag": self.etag,
+            "Last-Modified": format_datetime(self.last_modified, usegmt=True),
+            # Always revalidate; the ETag makes that a cheap 304
+            "Cache-Control": "no-cache",
+        }
+
+    def not_modified(self, if_none_match, if_modified_since):
+        """True when the client's validators say it already has this version."""
+        if if_none_match:
+            tags = [t.strip() for t in if_none_match.split(",")]
+            return "*" in tags or self.etag in tags or f"W/{self.etag}" in tags
+        if if_modified_since:
+            try:
+                since = parsedate_to_datetime(if_modified_since)
+            except (TypeError, ValueError):
+                return False
+            return since is not None and self.last_modified <= since
+        return False
+
+
+class ReferenceCache:
+    def __init__(self, ttl=600, max_entries=1000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._invalidations = 0
+
+    def get(self, key, loader):
+        """Return the CachedValue for `key`, calling loader() to (re)build it when missing or expired."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry.loaded_at <= self.ttl:
+                self._hits += 1
+                return entry
+            self._misses += 1
+
+        body = json.dumps(loader(), default=json_default, separators=(",", ":")).encode()
+        etag = '"%s"' % hashlib.sha1(body).hexdigest()
+        if entry is not None and entry.etag == etag:
+            # Reloaded but unchanged: keep the original Last-Modified
+            last_modified = entry.last_modified
+        else:
+            last_modified = datetime.datetime.now(datetime.timezone.utc).replace(microsecond=0)
+        fresh = CachedValue(body, etag, last_modified, now)
+        with self._lock:
+            # Re-insert so dict order stays oldest-loaded first, then trim
+            self._entries.pop(key, None)
+            self._entries[key] = fresh
+            while len(self._entries) > self.max_entries:
+                del self._entries[next(iter(self._entries))]
+        return fresh
+
+    def invalidate(self, namespace=None):
+        """Drop every entry whose key starts with `namespace` (or everything)."""
+        with self._lock:
+            self._invalidations += 1
+            if namespace is None:
+                self._entries.clear()
+            else:
+                for key in [k for k in self._entries if k[0] == namespace]:
+                    del self._entries[key]
+
+    def stats(self):
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "entries": len(self._entries),
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / lookups, 4) if lookups else 0.0,
+                "invalidations": self._invalidations,
+            }
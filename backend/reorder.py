@@ -0,0 +1,250 @@
+"""Reorder suggestions: sales velocity, days of cover and quantities per vendor.
+
+For every product of a shop:
+
+    velocity       units sold in the last `window_days` / window_days
+    on_hand        godown + display (live ledger balance)
+    days_of_cover  on_hand / velocity (NULL when nothing sold)
+    suggested_qty  ceil(velocity * (lead_days + cover_days)) - on_hand
+
+i.e. enough to last the supplier's lead time plus `cover_days` after the
+stock arrives. Only products with a positive suggestion are stored.
+
+Scanning a 100k-SKU catalog and its sales is too slow for a request, so
+ReorderJob recomputes every shop periodically, each shop in one transaction
+that replaces its reorder_suggestions rows and stamps reorder_runs
+(migrations/009_reorder.sql). GET /reorder/{shop_id} reads the stored rows,
+cached per run. One-off runs:
+
+    python reorder.py compute [--shop-id <uuid>]
+"""
+import argparse
+import logging
+import threading
+import time
+
+from ledger import DISPLAY_SQL, GODOWN_SQL, PENDING_JOIN
+
+logger = logging.getLogger(__name__)
+
+COMPUTE_SQL = f"""
+    DELETE FROM reorder_suggestions WHERE shop_id = %(shop_id)s;
+    WITH sold AS (
+        SELECT oi.product_id, SUM(oi.quantity)::int AS units
+        FROM orders o
+        JOIN order_items oi ON oi.order_id = o.id
+        WHERE o.shop_id = %(shop_id)s
+          AND o.status = 'sold'
+          AND o.sold_at >= NOW() - make_interval(days => %(window_days)s)
+          AND oi.product_id IS NOT NULL
+        GROUP BY oi.product_id
+    ),
+    stock AS (
+        SELECT p.id, p.shop_id, p.item_code, p.vendor_name,
+               COALESCE(s.units, 0) AS units,
+               COALESCE(s.units, 0)::numeric / %(window_days)s AS velocity,
+               {DISPLAY_SQL} + {GODOWN_SQL} AS on_hand
+        FROM products p
+        {PENDING_JOIN}
+        LEFT JOIN sold s ON s.product_id = p.id
+        WHERE p.shop_id = %(shop_id)s
+    ),
+    suggested AS (
+        INSERT INTO reorder_suggestions (shop_id, product_id, vendor_name, item_code, units_sold, velocity,
+                                         on_hand, days_of_cover, suggested_qty)
+        SELECT shop_id, id, vendor_name, item_code, units, ROUND(velocity, 3), on_hand,
+               CASE WHEN velocity > 0 THEN ROUND(GREATEST(on_hand, 0) / velocity, 1) END,
+               CEIL(velocity * (%(lead_days)s + %(cover_days)s))::int - on_hand
+        FROM stock
+        WHERE CEIL(velocity * (%(lead_days)s + %(cover_days)s))::int > on_hand
+          AND velocity > 0
+        RETURNING 1
+    )
+    SELECT (SELECT COUNT(*) FROM stock)::int AS products, (SELECT COUNT(*) FROM suggested)::int AS suggestions
+"""
+
+RUN_SQL = """
+    INSERT INTO reorder_runs (shop_id, computed_at, window_days, lead_days, cover_days, products, suggestions, seconds)
+    VALUES (%(shop_id)s, NOW(), %(window_days)s, %(lead_days)s, %(cover_days)s, %(products)s, %(suggestions)s,
+            %(seconds)s)
+    ON CONFLICT (shop_id) DO UPDATE SET
+        computed_at = EXCLUDED.computed_at, window_days = EXCLUDED.window_days,
+        lead_days = EXCLUDED.lead_days, cover_days = EXCLUDED.cover_days,
+        products = EXCLUDED.products, suggestions = EXCLUDED.suggestions, seconds = EXCLUDED.seconds
+"""
+
+
+def compute_shop(cur, shop_id, window_days=30, lead_days=7, cover_days=14, min_age=None):
+    """Recompute one shop's suggestions in the caller's transaction.
+
+    Returns the run's {"products", "suggestions", "seconds"}, or None when
+    another worker is computing this shop or (with `min_age` seconds) did so
+    recently enough.
+    """
+    cur.execute("SELECT pg_try_advisory_xact_lock(hashtextextended('reorder:' || %s, 0)) AS locked", (str(shop_id),))
+    if not cur.fetchone()["locked"]:
+        return None
+    if min_age:
+        cur.execute("""
+            SELECT 1 FROM reorder_runs
+            WHERE shop_id = %s AND computed_at > NOW() - make_interval(secs => %s)
+        """, (str(shop_id), min_age))
+        if cur.fetchone():
+            return None
+
+    params = {"shop_id": str(shop_id), "window_days": window_days, "lead_days": lead_days, "cover_days": cover_days}
+    started = time.monotonic()
+    cur.execute(COMPUTE_SQL, params)
+    run = dict(cur.fetchone())
+    run["seconds"] = round(time.monotonic() - started, 3)
+    cur.execute(RUN_SQL, dict(params, **run))
+    return run
+
+
+def compute_all(get_conn, window_days=30, lead_days=7, cover_days=14, min_age=None, shop_ids=None, stop=None):
+    """Recompute every shop (or `shop_ids`), one transaction each; returns {shop_id: run}.
+
+    Returns early, between shops, once the `stop` event is set.
+    """
+    if shop_ids is None:
+        with get_conn() as conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT id FROM shops")
+                shop_ids = [str(r["id"]) for r in cur.fetchall()]
+    runs = {}
+    for shop_id in shop_ids:
+        if stop is not None and stop.is_set():
+            break
+        with get_conn() as conn:
+            with conn.cursor() as cur:
+                run = compute_shop(cur, shop_id, window_days, lead_days, cover_days, min_age)
+            conn.commit()
+        if run is not None:
+            runs[str(shop_id)] = run
+    return runs
+
+
+def load(cur, shop_id, vendor=None):
+    """The stored run for a shop, grouped by vendor; None when it was never computed."""
+    cur.execute("""
+        SELECT computed_at, window_days, lead_days, cover_days, products, suggestions
+        FROM reorder_runs WHERE shop_id = %s
+    """, (str(shop_id),))
+    run = cur.fetchone()
+    if run is None:
+        return None
+    cur.execute("""
+        SELECT product_id, vendor_name, item_code, units_sold, velocity::float8 AS velocity, on_hand,
+               days_of_cover::float8 AS days_of_cover, suggested_qty
+        FROM reorder_suggestions
+        WHERE shop_id = %(shop_id)s
+          AND (%(vendor)s::text IS NULL OR vendor_name = %(vendor)s)
+        ORDER BY vendor_name NULLS LAST, days_of_cover NULLS FIRST, suggested_qty DESC
+    """, {"shop_id": str(shop_id), "vendor": vendor})
+
+    vendors = []
+    for row in cur.fetchall():
+        name = row.pop("vendor_name")
+        if not vendors or vendors[-1]["vendor_name"] != name:
+            vendors.append({"vendor_name": name, "products": 0, "suggested_units": 0, "items": []})
+        group = vendors[-1]
+        group["products"] += 1
+        group["suggested_units"] += row["suggested_qty"]
+        group["items"].append(row)
+    return dict(run, shop_id=str(shop_id), vendors=vendors)
+
+
+def run_version(cur, shop_id):
+    """computed_at of the shop's last run (a primary-key lookup), or None."""
+    cur.execute("SELECT computed_at FROM reorder_runs WHERE shop_id = %s", (str(shop_id),))
+    row = cur.fetchone()
+    return row["computed_at"] if row else None
+
+
+class ReorderJob:
+    """Background thread running compute_all() now and then every `interval` seconds."""
+
+    def __init__(self, get_conn, interval=900, window_days=30, lead_days=7, cover_days=14):
+        self.get_conn = get_conn
+        self.interval = interval
+        self.window_days = window_days
+        self.lead_days = lead_days
+        self.cover_days = cover_days
+        self._stop = threading.Event()
+        self._thread = None
+        self._runs = 0
+        self._shops = 0
+        self._errors = 0
+        self._last_run = None
+        self._last_seconds = None
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="reorder", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=60.0):
+        """Stop after the shop being computed, if any, has committed."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+            if self._thread.is_alive():
+                logger.error(f"Reorder computation still running after {timeout}s at shutdown")
+            self._thread = None
+
+    def _run(self):
+        while True:
+            started = time.monotonic()
+            try:
+                # Workers share the schedule: a shop another worker computed
+                # within the last half interval is skipped
+                runs = compute_all(self.get_conn, self.window_days, self.lead_days, self.cover_days,
+                                   min_age=self.interval / 2, stop=self._stop)
+                self._shops += len(runs)
+            except Exception as e:
+                self._errors += 1
+                logger.error(f"Reorder computation failed: {e}")
+            self._runs += 1
+            self._last_run = time.time()
+            self._last_seconds = round(time.monotonic() - started, 3)
+            if self._stop.wait(self.interval):
+                return
+
+    def stats(self):
+        return {
+            "interval": self.interval,
+            "window_days": self.window_days,
+            "lead_days": self.lead_days,
+            "cover_days": self.cover_days,
+            "runs": self._runs,
+            "shops_computed": self._shops,
+            "errors": self._errors,
+            "last_run": self._last_run,
+            "last_seconds": self._last_seconds,
+        }
+
+
+def main():
+    from config import close_pool, get_db_conn, settings
+
+    parser = argparse.ArgumentParser(description="Reorder suggestions")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("compute", help="recompute reorder suggestions now")
+    p.add_argument("--shop-id", action="append", dest="shop_ids", help="only this shop (repeatable)")
+    p.add_argument("--window-days", type=int, default=settings.REORDER_WINDOW_DAYS)
+    p.add_argument("--lead-days", type=int, default=settings.REORDER_LEAD_DAYS)
+    p.add_argument("--cover-days", type=int, default=settings.REORDER_COVER_DAYS)
+    args = parser.parse_args()
+
+    try:
+        runs = compute_all(get_db_conn, args.window_days, args.lead_days, args.cover_days, shop_ids=args.shop_ids)
+        for shop_id, run in runs.items():
+            print(f"{shop_id}: {run['suggestions']} suggestion(s) over {run['products']} product(s) "
+                  f"in {run['seconds']}s")
+    finally:
+        close_pool()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+"""Read-replica routing for the read-only endpoints.
+
+Handlers that only read borrow their connection from `config.get_read_conn()`
+instead of `get_db_conn()`. With DB_REPLICA_DSNS set, ReplicaRouter hands
+those out round-robin from one pool per replica. Every other connection,
+including every write, still goes to the primary.
+
+A background thread checks each replica every `check_interval` seconds. A
+replica leaves the rotation when it is unreachable, is not in recovery (a
+promoted replica is not a follower any more) or its replay lags more than
+`max_lag` seconds. A replica that fails to hand out a connection also leaves
+the rotation until the next check passes. With no replica in the rotation,
+reads go to the primary.
+
+Read-your-writes: after a client's own successful POST/PUT/PATCH/DELETE,
+ReadYourWritesMiddleware pins that client's reads to the primary for
+`pin_seconds` (longer than the replicas are allowed to lag). The pin
+travels as a `X-Read-Primary-Until` response header, which the frontend
+echoes on later requests, and as a cookie for same-site clients.
+
+Trying it with two local Postgres instances (primary on 5432):
+
+    pg_basebackup -h localhost -p 5432 -U postgres -D /tmp/replica -R
+    pg_ctl -D /tmp/replica -o "-p 5433" start
+    DB_REPLICA_DSNS=postgresql://postgres@localhost:5433/invt_bench?sslmode=disable
+
+GET /stats/replicas shows each replica's health, lag and reads served;
+stopping the replica moves reads back to the primary within one check.
+"""
+import contextvars
+import itertools
+import logging
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+from http.cookies import SimpleCookie
+
+from psycopg2 import extensions
+
+logger = logging.getLogger(__name__)
+
+PIN_HEADER = "x-read-primary-until"
+PIN_COOKIE = "invt_read_primary_until"
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+# Lag is 0 while the replica has replayed everything it received, so an idle
+# primary does not make a caught-up replica look stale
+HEALTH_SQL = """
+    SELECT pg_is_in_recovery() AS in_recovery,
+           CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+                ELSE COALESCE(EXTRACT(EPOCH FROM NOW() - pg_last_xact_replay_timestamp()), 0)
+           END AS lag
+"""
+
+_pinned = contextvars.ContextVar("read_primary", default=False)
+
+
+def pinned_to_primary():
+    """True while handling a request whose client wrote within the pin window."""
+    return _pinned.get()
+
+
+class Replica:
+    def __init__(self, name, pool):
+        self.name = name
+        self.pool = pool
+        self.healthy = False     # joins the rotation after its first passing check
+        self.lag = None
+        self.error = None
+        self.checked_at = None
+        self.served = 0
+        self.failures = 0
+
+
+class ReplicaRouter:
+    def __init__(self, primary, pools, check_interval=5.0, max_lag=2.0):
+        """`primary` is the get_db_conn-style fallback; `pools` maps a name to a ConnectionPool."""
+        self.primary = primary
+        self.replicas = [Replica(name, pool) for name, pool in pools.items()]
+        self.check_interval = check_interval
+        self.max_lag = max_lag
+        self._next = itertools.count()
+        self._stop = threading.Event()
+        self._thread = None
+        self._primary_reads = 0
+        self._pinned_reads = 0
+        self._fallbacks = 0
+
+    def start(self):
+        if self.replicas and self._thread is None:
+            self.check()
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="replica-health", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.check_interval + 1)
+            self._thread = None
+
+    def close(self):
+        self.stop()
+        for replica in self.replicas:
+            replica.pool.close()
+
+    # -- health ----------------------------------------------------------------
+
+    def _run(self):
+        while not self._stop.wait(self.check_interval):
+            self.check()
+
+    def check(self):
+        for replica in self.replicas:
+            try:
+                with replica.pool.connection() as conn:
+                    # Plain cursor: health checks are not part of any request
+                    with conn.cursor(cursor_factory=extensions.cursor) as cur:
+                        cur.execute(HEALTH_SQL)
+                        in_recovery, lag = cur.fetchone()
+                lag = float(lag)
+                if not in_recovery:
+                    error = "not in recovery"
+                elif lag > self.max_lag:
+                    error = f"lagging {lag:.1f}s"
+                else:
+                    error = None
+                replica.lag = lag
+            except Exception as e:
+                error = str(e).strip() or type(e).__name__
+            if error and (replica.healthy or error != replica.error):
+                logger.warning(f"Replica {replica.name} out of rotation: {error}")
+            elif not error and not replica.healthy:
+                logger.info(f"Replica {replica.name} back in rotation")
+            replica.healthy = error is None
+            replica.error = error
+            replica.checked_at = time.time()
+
+    # -- routing ---------------------------------------------------------------
+
+    def _pick(self):
+        healthy = [r for r in self.replicas if r.healthy]
+        if not healthy:
+            return None
+        return healthy[next(self._next) % len(healthy)]
+
+    @contextmanager
+    def connection(self):
+        """Borrow a read connection: a healthy replica, else the primary."""
+        if _pinned.get():
+            self._pinned_reads += 1
+        else:
+            replica = self._pick()
+            if replica is not None:
+                stack = ExitStack()
+                try:
+                    conn = stack.enter_context(replica.pool.connection())
+                except Exception as e:
+                    # Only a failure to connect falls back; errors in the
+                    # caller's queries propagate as they would on the primary
+                    replica.healthy = False
+                    replica.failures += 1
+                    replica.error = str(e).strip() or type(e).__name__
+                    self._fallbacks += 1
+                    logger.warning(f"Replica {replica.name} unavailable, reading from primary: {replica.error}")
+                else:
+                    replica.served += 1
+                    with stack:
+                        yield conn
+                    return
+            self._primary_reads += 1
+        with self.primary() as conn:
+            yield conn
+
+    def stats(self):
+        return {
+            "replicas": [
+                {"name": r.name, "healthy": r.healthy, "lag_seconds": r.lag, "error": r.error,
+                 "checked_at": r.checked_at, "served": r.served, "failures": r.failures,
+                 "pool": r.pool.stats()}
+                for r in self.replicas
+            ],
+            "primary_reads": self._primary_reads,
+            "pinned_reads": self._pinned_reads,
+            "fallbacks": self._fallbacks,
+        }
+
+
+class ReadYourWritesMiddleware:
+    """ASGI middleware: pins a client's reads to the primary for a while after its writes."""
+
+    def __init__(self, app, pin_seconds=5.0):
+        self.app = app
+        self.pin_seconds = pin_seconds
+
+    @staticmethod
+    def _pinned_until(scope):
+        until = 0.0
+        for name, value in scope.get("headers", ()):
+            try:
+                if name == PIN_HEADER.encode():
+                    until = max(until, float(value))
+                elif name == b"cookie":
+                    morsel = SimpleCookie(value.decode("latin-1")).get(PIN_COOKIE)
+                    if morsel is not None:
+                        until = max(until, float(morsel.value))
+            except ValueError:
+                continue
+        return until
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or self.pin_seconds <= 0:
+            return await self.app(scope, receive, send)
+
+        token = _pinned.set(self._pinned_until(scope) > time.time())
+        writes = scope["method"] not in SAFE_METHODS
+
+        async def send_wrapper(message):
+            if writes and message["type"] == "http.response.start" and message["status"] < 400:
+                until = f"{time.time() + self.pin_seconds:.3f}"
+                max_age = int(self.pin_seconds) + 1
+                message["headers"] = list(message.get("headers", [])) + [
+                    (PIN_HEADER.encode(), until.encode()),
+                    (b"set-cookie",
+                     f"{PIN_COOKIE}={until}; Max-Age={max_age}; Path=/; SameSite=Lax".encode()),
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _pinned.reset(token)
@@ -0,0 +1,135 @@
+"""Daily sales rollups (sales_daily) and the queries behind /analytics.
+
+record_sale() runs inside the finalize transaction and folds one sold
+order into its shop/day/category/vendor rows. backfill() does the same for
+historical orders, one day per transaction:
+
+    python rollups.py backfill --shop-id <uuid> --from 2025-04-01 --to 2026-03-31 [--rebuild]
+
+Orders are claimed in sales_rollup_orders first, so each is counted once no
+matter how often either path runs. Cost uses the product's current
+cost_price + overhead_expense (there is no historical cost), which for a
+backfill means today's cost.
+"""
+import argparse
+import datetime
+
+NIL_UUID = "00000000-0000-0000-0000-000000000000"
+
+# {order_filter} selects the sold orders (alias o) to fold in
+ROLLUP_SQL = """
+    WITH claimed AS (
+        INSERT INTO sales_rollup_orders (order_id, shop_id, day)
+        SELECT o.id, o.shop_id, (COALESCE(o.sold_at, o.updated_at) AT TIME ZONE %(tz)s)::date
+        FROM orders o
+        WHERE o.status = 'sold' AND {order_filter}
+        ON CONFLICT (order_id) DO NOTHING
+        RETURNING order_id, shop_id, day
+    ),
+    lines AS (
+        SELECT c.shop_id, c.day,
+               COALESCE(p.category_id, '""" + NIL_UUID + """'::uuid) AS category_id,
+               COALESCE(p.vendor_name, '') AS vendor_name,
+               oi.quantity,
+               oi.total_price AS gross,
+               oi.total_price * COALESCE(o.discount_percent, 0) / 100 AS discount,
+               oi.quantity * (COALESCE(p.cost_price, 0) + COALESCE(p.overhead_expense, 0)) AS cost
+        FROM claimed c
+        JOIN orders o ON o.id = c.order_id
+        JOIN order_items oi ON oi.order_id = c.order_id
+        LEFT JOIN products p ON p.id = oi.product_id
+    )
+    INSERT INTO sales_daily AS s (shop_id, day, category_id, vendor_name, units, gross, discount, revenue, cost)
+    SELECT shop_id, day, category_id, vendor_name,
+           SUM(quantity), ROUND(SUM(gross), 2), ROUND(SUM(discount), 2),
+           ROUND(SUM(gross - discount), 2), ROUND(SUM(cost), 2)
+    FROM lines
+    GROUP BY shop_id, day, category_id, vendor_name
+    ON CONFLICT (shop_id, day, category_id, vendor_name) DO UPDATE SET
+        units = s.units + EXCLUDED.units,
+        gross = s.gross + EXCLUDED.gross,
+        discount = s.discount + EXCLUDED.discount,
+        revenue = s.revenue + EXCLUDED.revenue,
+        cost = s.cost + EXCLUDED.cost,
+        updated_at = NOW()
+"""
+
+GROUPINGS = {
+    "day": ("s.day", "s.day AS day"),
+    "category": ("s.category_id, c.name", "NULLIF(s.category_id, '" + NIL_UUID + "'::uuid) AS category_id, c.name AS category_name"),
+    "vendor": ("s.vendor_name", "NULLIF(s.vendor_name, '') AS vendor_name"),
+}
+
+
+def record_sale(cur, order_id, tz):
+    """Fold one just-sold order into sales_daily (no-op if it was already counted)."""
+    cur.execute(ROLLUP_SQL.format(order_filter="o.id = %(order_id)s"), {"order_id": order_id, "tz": tz})
+
+
+def backfill(cur, shop_id, day, tz):
+    """Fold every not-yet-counted order sold on `day` (shop-local) into sales_daily.
+
+    Returns the number of sales_daily rows touched.
+    """
+    cur.execute(ROLLUP_SQL.format(order_filter="""
+            o.shop_id = %(shop_id)s
+            AND o.sold_at >= (%(day)s::date)::timestamp AT TIME ZONE %(tz)s
+            AND o.sold_at < (%(day)s::date + 1)::timestamp AT TIME ZONE %(tz)s
+        """), {"shop_id": shop_id, "day": day, "tz": tz})
+    return cur.rowcount
+
+
+def clear_day(cur, shop_id, day):
+    cur.execute("DELETE FROM sales_daily WHERE shop_id = %s AND day = %s", (shop_id, day))
+    cur.execute("DELETE FROM sales_rollup_orders WHERE shop_id = %s AND day = %s", (shop_id, day))
+
+
+def analytics(cur, shop_id, date_from, date_to, group_by):
+    """Range query over sales_daily grouped by day, category or vendor."""
+    group_cols, select_cols = GROUPINGS[group_by]
+    join = "LEFT JOIN categories c ON c.id = s.category_id" if group_by == "category" else ""
+    cur.execute(f"""
+        SELECT {select_cols},
+               SUM(s.units) AS units, SUM(s.gross) AS gross, SUM(s.discount) AS discount,
+               SUM(s.revenue) AS revenue, SUM(s.cost) AS cost,
+               SUM(s.revenue) - SUM(s.cost) AS margin
+        FROM sales_daily s
+        {join}
+        WHERE s.shop_id = %(shop_id)s AND s.day BETWEEN %(date_from)s AND %(date_to)s
+        GROUP BY {group_cols}
+        ORDER BY {"s.day" if group_by == "day" else "revenue DESC"}
+    """, {"shop_id": shop_id, "date_from": date_from, "date_to": date_to})
+    rows = cur.fetchall()
+    totals = {k: sum(r[k] for r in rows) for k in ("units", "gross", "discount", "revenue", "cost", "margin")}
+    return {"group_by": group_by, "from": date_from, "to": date_to, "rows": rows, "totals": totals}
+
+
+def main():
+    from config import close_pool, get_db_conn, settings
+
+    parser = argparse.ArgumentParser(description="Sales rollup maintenance")
+    sub = parser.add_subparsers(dest="command", required=True)
+    fill = sub.add_parser("backfill", help="fold historical sold orders into sales_daily")
+    fill.add_argument("--shop-id", required=True)
+    fill.add_argument("--from", dest="date_from", required=True, type=datetime.date.fromisoformat)
+    fill.add_argument("--to", dest="date_to", required=True, type=datetime.date.fromisoformat)
+    fill.add_argument("--rebuild", action="store_true", help="recompute the range from scratch")
+    args = parser.parse_args()
+
+    day = args.date_from
+    try:
+        while day <= args.date_to:
+            # One short transaction per day keeps locks on sales_daily brief
+            with get_db_conn() as conn:
+                with conn.cursor() as cur:
+                    if args.rebuild:
+                        clear_day(cur, args.shop_id, day)
+                    groups = backfill(cur, args.shop_id, day, settings.REPORT_TIMEZONE)
+            print(f"{day}: {groups} rollup rows updated")
+            day += datetime.timedelta(days=1)
+    finally:
+        close_pool()
+
+
+if __name__ == "__main__":
+    main()
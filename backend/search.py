@@ -0,0 +1,81 @@
+"""Ranked, typo-tolerant search over shops and products.
+
+Backed by the trigram indexes in migrations/001_search_indexes.sql. A term
+matches when it is a substring of a field (ILIKE) or close enough to one of
+its words (pg_trgm word similarity), and results are ranked by similarity.
+"""
+from ledger import DISPLAY_SQL, GODOWN_SQL, PENDING_JOIN
+
+# Applied with SET LOCAL in the same round trip as the query
+THRESHOLD_SQL = "SET LOCAL pg_trgm.word_similarity_threshold = %(threshold)s;"
+
+SHOPS_SQL = THRESHOLD_SQL + """
+    SELECT id, name, word_similarity(%(q)s, name) AS score
+    FROM shops
+    WHERE name ILIKE %(like)s OR %(q)s <%% name
+    ORDER BY name ILIKE %(prefix)s DESC, score DESC, name
+    LIMIT %(limit)s
+"""
+
+# Each branch of the UNION can use its own trigram index; OR-ing a category
+# subquery into one WHERE would force a scan of the shop's products instead.
+PRODUCTS_SQL = THRESHOLD_SQL + """
+    WITH hits AS (
+        SELECT id FROM products
+        WHERE shop_id = %(shop_id)s
+          AND (item_code ILIKE %(like)s OR %(q)s <%% item_code
+               OR vendor_name ILIKE %(like)s OR %(q)s <%% vendor_name)
+        UNION
+        SELECT p.id FROM products p
+        JOIN categories c ON c.id = p.category_id
+        WHERE p.shop_id = %(shop_id)s
+          AND (c.name ILIKE %(like)s OR %(q)s <%% c.name)
+    ),
+    ranked AS (
+        SELECT p.id, p.item_code ILIKE %(prefix)s AS prefix_match, c.name AS category_name,
+               GREATEST(word_similarity(%(q)s, p.item_code),
+                        word_similarity(%(q)s, COALESCE(p.vendor_name, '')),
+                        word_similarity(%(q)s, COALESCE(c.name, ''))) AS score
+        FROM hits h
+        JOIN products p ON p.id = h.id
+        LEFT JOIN categories c ON c.id = p.category_id
+        ORDER BY prefix_match DESC, score DESC, p.item_code
+        LIMIT %(limit)s
+    )
+    -- Live stock only for the rows returned
+    SELECT p.id, p.item_code, p.selling_price, p.vendor_name, p.photo_url,
+           """ + DISPLAY_SQL + """ AS qty_display, """ + GODOWN_SQL + """ AS qty_godown,
+           r.category_name, r.score
+    FROM ranked r
+    JOIN products p ON p.id = r.id
+    """ + PENDING_JOIN + """
+    ORDER BY r.prefix_match DESC, r.score DESC, p.item_code
+"""
+
+
+def _escape_like(term):
+    return term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _params(term, limit, threshold):
+    term = term.strip()
+    escaped = _escape_like(term)
+    return {
+        "q": term,
+        "like": f"%{escaped}%",
+        "prefix": f"{escaped}%",
+        "limit": limit,
+        "threshold": float(threshold),
+    }
+
+
+def search_shops(cur, term, limit, threshold):
+    cur.execute(SHOPS_SQL, _params(term, limit, threshold))
+    return cur.fetchall()
+
+
+def search_products(cur, shop_id, term, limit, threshold):
+    params = _params(term, limit, threshold)
+    params["shop_id"] = shop_id
+    cur.execute(PRODUCTS_SQL, params)
+    return cur.fetchall()
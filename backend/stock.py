@@ -0,0 +1,140 @@
+"""Stock operations: sales, godown/display transfers and restocks.
+
+Each one appends to the stock_movements ledger (see ledger.py) instead of
+updating products in place. Writers that could take stock below zero lock
+the products involved first; that lock lives outside the products rows, so
+it only ever queues stock writers of the same SKU, for the length of a
+balance check and an INSERT.
+"""
+from ledger import DISPLAY_SQL, GODOWN_SQL, PENDING_JOIN, balances, lock_products
+
+
+class OrderNotOpen(Exception):
+    """The order does not exist or has already been sold/cancelled."""
+
+
+class InsufficientStock(Exception):
+    """One or more lines ask for more than godown + display holds."""
+
+    def __init__(self, lines):
+        super().__init__(f"Insufficient stock for {len(lines)} line(s)")
+        self.lines = lines
+
+
+class ProductNotFound(Exception):
+    pass
+
+
+# Locks every product on the order (sorted, as ledger.LOCK_PRODUCTS_SQL),
+# then records the Godown -> Display waterfall for all lines with one
+# INSERT. Nothing is recorded if any line is short. Two statements: the
+# balances must be read after the locks are held.
+DEDUCT_STOCK_SQL = f"""
+    SELECT pg_advisory_xact_lock(hashtextextended(l.product_id::text, 0))
+    FROM (
+        SELECT DISTINCT product_id FROM order_items
+        WHERE order_id = %(order_id)s AND product_id IS NOT NULL
+        ORDER BY 1
+    ) l;
+    WITH need AS (
+        SELECT product_id, SUM(quantity)::int AS qty
+        FROM order_items
+        WHERE order_id = %(order_id)s
+        GROUP BY product_id
+    ),
+    current AS (
+        SELECT p.id, p.shop_id, p.item_code, n.qty,
+               {GODOWN_SQL} AS qty_godown,
+               {DISPLAY_SQL} AS qty_display
+        FROM need n
+        JOIN products p ON p.id = n.product_id
+        {PENDING_JOIN}
+    ),
+    plan AS (
+        SELECT c.*, LEAST(c.qty, GREATEST(c.qty_godown, 0)) AS from_godown
+        FROM current c
+    ),
+    moved AS (
+        INSERT INTO stock_movements (shop_id, product_id, kind, delta_godown, delta_display, order_id)
+        SELECT shop_id, id, 'sale', -from_godown, -(qty - from_godown), %(order_id)s
+        FROM plan
+        WHERE NOT EXISTS (SELECT 1 FROM plan s WHERE s.qty > s.qty_godown + s.qty_display)
+        RETURNING product_id
+    )
+    SELECT p.id AS product_id, p.item_code, p.qty AS requested,
+           p.qty_godown + p.qty_display AS available,
+           p.qty_godown - p.from_godown AS qty_godown,
+           p.qty_display - (p.qty - p.from_godown) AS qty_display
+    FROM plan p
+"""
+
+
+def finalize_sale(cur, order_id):
+    """Mark an open order as sold and deduct its lines from stock.
+
+    Runs in the caller's transaction: the order row is locked first so a
+    double-submitted finalize cannot deduct twice. Raises OrderNotOpen or
+    InsufficientStock (with the short lines) and leaves the rollback to the
+    caller. Returns the per-line stock left after the deduction.
+    """
+    cur.execute("""
+        UPDATE orders SET status = 'sold', sold_at = NOW(), updated_at = NOW()
+        WHERE id = %s AND status IN ('bucket', 'pi')
+        RETURNING id
+    """, (order_id,))
+    if not cur.fetchone():
+        raise OrderNotOpen(order_id)
+
+    cur.execute(DEDUCT_STOCK_SQL, {"order_id": order_id})
+    lines = cur.fetchall()
+    short = [
+        {"product_id": l["product_id"], "item_code": l["item_code"],
+         "requested": l["requested"], "available": l["available"]}
+        for l in lines if l["requested"] > l["available"]
+    ]
+    if short:
+        raise InsufficientStock(short)
+    return [
+        {"product_id": l["product_id"], "item_code": l["item_code"], "qty": l["requested"],
+         "qty_godown": l["qty_godown"], "qty_display": l["qty_display"]}
+        for l in lines
+    ]
+
+
+def _record(cur, product, kind, delta_display, delta_godown, user_id=None, note=None):
+    cur.execute("""
+        INSERT INTO stock_movements (shop_id, product_id, kind, delta_display, delta_godown, user_id, note)
+        VALUES (%s, %s, %s, %s, %s, %s, %s)
+        RETURNING id, created_at
+    """, (product["shop_id"], product["id"], kind, delta_display, delta_godown, user_id, note))
+    movement = cur.fetchone()
+    return {
+        "movement_id": movement["id"],
+        "created_at": movement["created_at"],
+        "product_id": product["id"],
+        "item_code": product["item_code"],
+        "qty_display": product["qty_display"] + delta_display,
+        "qty_godown": product["qty_godown"] + delta_godown,
+    }
+
+
+def transfer(cur, product_id, qty, to, user_id=None, note=None):
+    """Move `qty` units between godown and display (`to` is "display" or "godown")."""
+    lock_products(cur, [product_id])
+    product = balances(cur, [product_id]).get(str(product_id))
+    if product is None:
+        raise ProductNotFound(product_id)
+    source = "qty_godown" if to == "display" else "qty_display"
+    if product[source] < qty:
+        raise InsufficientStock([{"product_id": product["id"], "item_code": product["item_code"],
+                                  "requested": qty, "available": product[source]}])
+    sign = 1 if to == "display" else -1
+    return _record(cur, product, "transfer", sign * qty, -sign * qty, user_id, note)
+
+
+def restock(cur, product_id, godown=0, display=0, user_id=None, note=None):
+    """Receive new stock; never reduces stock, so no lock is needed."""
+    product = balances(cur, [product_id]).get(str(product_id))
+    if product is None:
+        raise ProductNotFound(product_id)
+    return _record(cur, product, "restock", display, godown, user_id, note)
@@ -0,0 +1,25 @@
+"""Constant-memory streaming of large query results."""
+import uuid
+
+from config import get_db_conn
+from rowjson import dumps
+
+STREAM_CHUNK_ROWS = 2000
+
+
+def stream_ndjson(sql, params, chunk_rows=STREAM_CHUNK_ROWS, get_conn=get_db_conn):
+    """Yield query results as NDJSON, one chunk of rows at a time.
+
+    Uses a server-side (named) cursor so only `chunk_rows` rows are ever held
+    in memory. The pooled connection is kept until the generator finishes or
+    is closed. `get_conn` picks where it reads from (e.g. config.get_read_conn).
+    """
+    with get_conn() as conn:
+        with conn.cursor(name=f"stream_{uuid.uuid4().hex}") as cur:
+            cur.itersize = chunk_rows
+            cur.execute(sql, params)
+            while True:
+                rows = cur.fetchmany(chunk_rows)
+                if not rows:
+                    break
+                yield b"".join(dumps(row) + b"\n" for row in rows)
@@ -0,0 +1,119 @@
+"""Delta sync of a shop's products for /inventory/changes.
+
+A sync *round* starts from a token (or from nothing, for a first full pull)
+and returns every product changed since then, plus tombstones for deleted
+products, in pages keyed on (changed_at, id). A product's changed_at is the
+later of its updated_at and its newest stock movement: sales, transfers and
+restocks only append to stock_movements (see ledger.py) and do not touch
+updated_at until compaction, if ever. Clients keep calling with next_token
+while has_more is true, then store the token for the next round.
+
+Rounds overlap the previous one by SYNC_OVERLAP_SECONDS so rows written by
+transactions that were still open when the previous round ran are not
+missed. Clients must therefore apply changes idempotently (upsert by id).
+"""
+import datetime
+
+from inventory import FIELDS
+from ledger import PENDING_JOIN
+from paging import decode_cursor, encode_cursor
+
+SYNC_FIELDS = [
+    "id", "item_code", "selling_price", "vendor_name", "photo_url",
+    "qty_display", "qty_godown", "category_id", "category_name",
+    "created_at", "updated_at",
+]
+
+NIL_UUID = "00000000-0000-0000-0000-000000000000"
+
+
+def _round_lower_bound(since, overlap_seconds):
+    return datetime.datetime.fromisoformat(since) - datetime.timedelta(seconds=overlap_seconds)
+
+
+def fetch_changes(cur, shop_id, token, limit, overlap_seconds):
+    """Return one page of changes as a dict ready to send to the client."""
+    since = moved_since = ts = last_id = ""
+    if token:
+        since, moved_since, ts, last_id = decode_cursor(token, 4)
+        if since:
+            datetime.datetime.fromisoformat(since)  # ValueError for a forged token
+
+    deleted = []
+    if ts:
+        # Continuing a round: resume strictly after the last row sent
+        round_start = since
+        bound_ts, bound_id = ts, last_id
+    else:
+        # New round: remember when it started, so the next one begins there
+        cur.execute("SELECT now() AS now")
+        round_start = cur.fetchone()["now"].isoformat()
+        if since:
+            bound_ts = _round_lower_bound(since, overlap_seconds)
+            moved_since = bound_ts.isoformat()
+            cur.execute("""
+                SELECT product_id FROM product_tombstones
+                WHERE shop_id = %s AND deleted_at > %s
+            """, (shop_id, bound_ts))
+            deleted = [r["product_id"] for r in cur.fetchall()]
+        else:
+            # A full pull sends every product with its live balance, so it
+            # reads no movements (moved_since stays empty for the round)
+            bound_ts = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+        bound_id = NIL_UUID
+
+    columns = ", ".join(f"{FIELDS[f]} AS {f}" for f in SYNC_FIELDS)
+    params = {"shop_id": shop_id, "bound_ts": bound_ts, "bound_id": bound_id, "moved_since": moved_since,
+              "limit": limit + 1}
+    if not moved_since:
+        # Full pull: every product, straight off products_shop_updated_idx
+        cur.execute(f"""
+            SELECT {columns}, p.updated_at AS changed_at
+            FROM products p
+            LEFT JOIN categories c ON p.category_id = c.id
+            {PENDING_JOIN}
+            WHERE p.shop_id = %(shop_id)s
+              AND (p.updated_at, p.id) > (%(bound_ts)s::timestamptz, %(bound_id)s::uuid)
+            ORDER BY p.updated_at, p.id
+            LIMIT %(limit)s
+        """, params)
+    else:
+        cur.execute(f"""
+            WITH changed AS (
+                SELECT id, updated_at AS changed_at
+                FROM products
+                WHERE shop_id = %(shop_id)s AND updated_at >= %(bound_ts)s::timestamptz
+                UNION ALL
+                SELECT product_id, created_at
+                FROM stock_movements
+                WHERE shop_id = %(shop_id)s
+                  AND created_at >= GREATEST(%(bound_ts)s::timestamptz, %(moved_since)s::timestamptz)
+            ),
+            keyed AS (
+                SELECT id, MAX(changed_at) AS changed_at
+                FROM changed
+                GROUP BY id
+                HAVING (MAX(changed_at), id) > (%(bound_ts)s::timestamptz, %(bound_id)s::uuid)
+                ORDER BY 2, 1
+                LIMIT %(limit)s
+            )
+            SELECT {columns}, k.changed_at
+            FROM keyed k
+            JOIN products p ON p.id = k.id
+            LEFT JOIN categories c ON p.category_id = c.id
+            {PENDING_JOIN}
+            ORDER BY k.changed_at, p.id
+        """, params)
+    rows = cur.fetchall()
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if has_more:
+        last = rows[-1]
+        next_token = encode_cursor(round_start, moved_since, last["changed_at"].isoformat(), last["id"])
+    else:
+        next_token = encode_cursor(round_start, "", "", "")
+
+    for row in rows:
+        del row["changed_at"]
+    return {"changes": rows, "deleted": deleted, "next_token": next_token, "has_more": has_more}